@@ -1,24 +1,27 @@
 from discord.ext import commands
+from logconfig import logger
 import db
+import anomaly
+import backup
+import collusion
+import storage
 import discord
-from datetime import datetime, timedelta
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
 
 class Admin(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-    def add_points(self, user_id, pts):
-        conn = db.connect()
-        c = conn.cursor()
-        c.execute('INSERT OR IGNORE INTO users (user_id, points) VALUES (?, ?)', (user_id, 0))
-        c.execute('UPDATE users SET points = points + ? WHERE user_id = ?', (pts, user_id))
-        conn.commit()
-        conn.close()
+    async def add_points(self, user_id, pts):
+        self.bot.cache.totals[user_id] = await self.bot.storage.adjust_points(user_id, pts)
 
     @commands.command()
     @commands.has_permissions(administrator=True)
     async def addpoints(self, ctx, member: commands.MemberConverter, amount: int):
-        self.add_points(str(member.id), amount)
+        await self.add_points(str(member.id), amount)
+        logger.info(f"{ctx.author} added {amount} points to {member}", extra={"admin_id": str(ctx.author.id), "user_id": str(member.id)})
         embed = discord.Embed(
             title="✅ Points Added",
             description=f"Added {amount} points to {member.mention}",
@@ -29,7 +32,8 @@ class Admin(commands.Cog):
     @commands.command()
     @commands.has_permissions(administrator=True)
     async def removepoints(self, ctx, member: commands.MemberConverter, amount: int):
-        self.add_points(str(member.id), -amount)
+        await self.add_points(str(member.id), -amount)
+        logger.info(f"{ctx.author} removed {amount} points from {member}", extra={"admin_id": str(ctx.author.id), "user_id": str(member.id)})
         embed = discord.Embed(
             title="❌ Points Removed",
             description=f"Removed {amount} points from {member.mention}",
@@ -40,11 +44,10 @@ class Admin(commands.Cog):
     @commands.command()
     @commands.has_permissions(administrator=True)
     async def resetpoints(self, ctx, member: commands.MemberConverter):
-        conn = db.connect()
-        c = conn.cursor()
-        c.execute('UPDATE users SET points = 0 WHERE user_id = ?', (str(member.id),))
-        conn.commit()
-        conn.close()
+        await self.bot.storage.reset_points(str(member.id))
+        if str(member.id) in self.bot.cache.totals:
+            self.bot.cache.totals[str(member.id)] = 0
+        logger.info(f"{ctx.author} reset points for {member}", extra={"admin_id": str(ctx.author.id), "user_id": str(member.id)})
         embed = discord.Embed(
             title="🔄 Points Reset",
             description=f"Reset points for {member.mention}",
@@ -56,31 +59,10 @@ class Admin(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def stats(self, ctx):
         """Show bot statistics and activity"""
-        conn = db.connect()
-        c = conn.cursor()
-        
-        # Get total users
-        c.execute('SELECT COUNT(*) FROM users')
-        total_users = c.fetchone()[0]
-        
-        # Get total points distributed
-        c.execute('SELECT SUM(points) FROM points_log WHERE points > 0')
-        total_points = c.fetchone()[0] or 0
-        
-        # Get today's activity
-        today = datetime.now().strftime('%Y-%m-%d')
-        c.execute('SELECT COUNT(*) FROM points_log WHERE DATE(timestamp) = ?', (today,))
-        today_activity = c.fetchone()[0]
-        
-        # Get suspicious activity count
-        c.execute('SELECT COUNT(*) FROM suspicious_activity')
-        suspicious_count = c.fetchone()[0]
-        
-        # Get recent suspicious activity
-        c.execute('SELECT COUNT(*) FROM suspicious_activity WHERE DATE(timestamp) = ?', (today,))
-        today_suspicious = c.fetchone()[0]
-        
-        conn.close()
+        # Get total users, total points distributed and today's activity (UTC day)
+        total_users, total_points, today_activity = await self.bot.storage.ledger_stats()
+        # Suspicious activity in total and since UTC midnight
+        suspicious_count, today_suspicious = await self.bot.storage.suspicious_counts()
         
         embed = discord.Embed(
             title="📊 Bot Statistics",
@@ -100,11 +82,7 @@ class Admin(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def topusers(self, ctx, limit: int = 10):
         """Show top users by points"""
-        conn = db.connect()
-        c = conn.cursor()
-        c.execute('SELECT user_id, points FROM users ORDER BY points DESC LIMIT ?', (limit,))
-        rows = c.fetchall()
-        conn.close()
+        rows, _ = await self.bot.storage.top_all(limit)
         
         if not rows:
             await ctx.send("No users found.")
@@ -154,19 +132,26 @@ class Admin(commands.Cog):
         """Suspend a user's ability to earn points"""
         conn = db.connect()
         c = conn.cursor()
-        suspension_end = datetime.now() + timedelta(minutes=duration_minutes)
-        c.execute('''INSERT OR REPLACE INTO user_status 
+        # Naive UTC, like every other time the bot stores
+        suspension_end = datetime.utcnow() + timedelta(minutes=duration_minutes)
+        # Upsert so activity and streak columns survive the suspension
+        c.execute('''INSERT INTO user_status 
                      (user_id, warnings, points_suspended, suspension_end) 
-                     VALUES (?, 0, TRUE, ?)''', (str(member.id), suspension_end))
+                     VALUES (?, 0, TRUE, ?)
+                     ON CONFLICT(user_id) DO UPDATE SET warnings = 0, points_suspended = TRUE,
+                     suspension_end = excluded.suspension_end''',
+                  (str(member.id), suspension_end.strftime('%Y-%m-%d %H:%M:%S')))
         conn.commit()
         conn.close()
+        self.bot.cache.suspensions[str(member.id)] = suspension_end
+        logger.info(f"{ctx.author} suspended {member} for {duration_minutes} minutes", extra={"admin_id": str(ctx.author.id), "user_id": str(member.id)})
         
         embed = discord.Embed(
             title="⏸️ User Suspended",
             description=f"{member.mention} is suspended from earning points for {duration_minutes} minutes",
             color=0xffaa00
         )
-        embed.add_field(name="Suspension Ends", value=f"<t:{int(suspension_end.timestamp())}:R>", inline=True)
+        embed.add_field(name="Suspension Ends", value=f"<t:{int(suspension_end.replace(tzinfo=timezone.utc).timestamp())}:R>", inline=True)
         await ctx.send(embed=embed)
 
     @commands.command()
@@ -178,6 +163,8 @@ class Admin(commands.Cog):
         c.execute('UPDATE user_status SET points_suspended = FALSE WHERE user_id = ?', (str(member.id),))
         conn.commit()
         conn.close()
+        self.bot.cache.suspensions.pop(str(member.id), None)
+        logger.info(f"{ctx.author} unsuspended {member}", extra={"admin_id": str(ctx.author.id), "user_id": str(member.id)})
         
         embed = discord.Embed(
             title="✅ User Unsuspended",
@@ -190,16 +177,8 @@ class Admin(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def activitylog(self, ctx, hours: int = 24):
         """Show recent activity log"""
-        conn = db.connect()
-        c = conn.cursor()
-        time_threshold = datetime.now() - timedelta(hours=hours)
-        c.execute('''SELECT user_id, action, points, timestamp 
-                     FROM points_log 
-                     WHERE timestamp > ? 
-                     ORDER BY timestamp DESC 
-                     LIMIT 20''', (time_threshold,))
-        rows = c.fetchall()
-        conn.close()
+        time_threshold = int(time.time()) - hours * 3600
+        rows = await self.bot.storage.recent_awards(time_threshold, 20)
         
         if not rows:
             await ctx.send(f"No activity in the last {hours} hours.")
@@ -226,5 +205,134 @@ class Admin(commands.Cog):
         
         await ctx.send(embed=embed)
 
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def anomalyscan(self, ctx, days: int = anomaly.ANALYSIS_DAYS):
+        """Run the anomaly scan now and list the users it flagged"""
+        async with ctx.typing():
+            flags = await anomaly.run(self.bot.storage, days)
+        logger.info(f"{ctx.author} ran an anomaly scan over {days} days", extra={"admin_id": str(ctx.author.id)})
+        if not flags:
+            await ctx.send(f"✅ No new anomalies in the last {days} days.")
+            return
+
+        embed = discord.Embed(
+            title="🚨 Anomaly Scan",
+            description=f"{len(flags)} new flags over the last {days} days (recorded in suspicious activity)",
+            color=0xff0000
+        )
+        for user_id, kind, details in flags[:25]:
+            embed.add_field(name=kind.replace('_', ' ').title(), value=f"<@{user_id}>\n{details}", inline=True)
+        if len(flags) > 25:
+            embed.set_footer(text=f"Showing 25 of {len(flags)}")
+        await ctx.send(embed=embed)
+
+    @commands.command(name='collusion')
+    @commands.has_permissions(administrator=True)
+    async def collusion_report(self, ctx, days: int = collusion.COLLUSION_DAYS):
+        """Report groups of members who mostly react to each other"""
+        async with ctx.typing():
+            rings = await collusion.run(self.bot.storage, days)
+        logger.info(f"{ctx.author} ran a collusion scan over {days} days", extra={"admin_id": str(ctx.author.id)})
+        if not rings:
+            await ctx.send(f"✅ No reaction rings in the last {days} days.")
+            return
+
+        embed = discord.Embed(
+            title="🕸️ Reaction Rings",
+            description=f"{len(rings)} groups over the last {days} days (new ones recorded in suspicious activity)",
+            color=0xff0000
+        )
+        for i, ring in enumerate(rings[:10], 1):
+            members = ", ".join(f"<@{user_id}>" for user_id in ring.members)
+            embed.add_field(
+                name=f"#{i}: {len(ring.members)} members, {ring.reactions} reactions",
+                value=f"{members[:900]}\n{ring.inside_share:.0%} of their reactions stay in the group · density {ring.density:.2f}",
+                inline=False
+            )
+        if len(rings) > 10:
+            embed.set_footer(text=f"Showing 10 of {len(rings)}")
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def inactive(self, ctx, days: int = 14):
+        """List members with no activity in the last N days"""
+        rows, total = await self.bot.storage.inactive_users(days, 25)
+        if not rows:
+            await ctx.send(f"No members inactive for more than {days} days.")
+            return
+
+        embed = discord.Embed(
+            title=f"💤 Inactive for {days}+ Days",
+            description=f"{total} members, longest idle first",
+            color=0x808080
+        )
+        for user_id, last_activity in rows:
+            member = ctx.guild.get_member(int(user_id)) if user_id.isdigit() else None
+            name = member.display_name if member else f"User {user_id}"
+            embed.add_field(name=name, value=f"Last active {last_activity[:10]}", inline=True)
+        if total > len(rows):
+            embed.set_footer(text=f"Showing {len(rows)} of {total}")
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def newseason(self, ctx, *, name: str):
+        """Close the current season's leaderboard and start a new one"""
+        previous, ranked = await self.bot.storage.rollover_season(name)
+        logger.info(f"{ctx.author} started season {name}", extra={"admin_id": str(ctx.author.id)})
+
+        embed = discord.Embed(
+            title="🏁 New Season Started",
+            description=f"**{name}** is now live. Season points start from zero.",
+            color=0x00ff00
+        )
+        if previous:
+            embed.add_field(name="Archived", value=f"{previous} ({ranked} ranked users)", inline=True)
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def reloadrules(self, ctx):
+        """Recompile the points rules file now instead of waiting for the watcher"""
+        try:
+            await asyncio.to_thread(self.bot.rules.load)
+        except Exception as e:
+            # The previous rules stay active
+            await ctx.send(f"❌ Could not load points rules: {e}")
+            return
+        logger.info(f"{ctx.author} reloaded points rules", extra={"admin_id": str(ctx.author.id)})
+
+        embed = discord.Embed(
+            title="📐 Points Rules Reloaded",
+            description=f"Loaded {len(self.bot.rules.table.order)} actions from `{self.bot.rules.path}`",
+            color=0x00ff00
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command(name='backup')
+    @commands.has_permissions(administrator=True)
+    async def backup_now(self, ctx):
+        """Take an online database backup now (restore with backup.py while the bot is stopped)"""
+        await ctx.send("💾 Backing up the database...")
+        try:
+            result = await asyncio.to_thread(backup.create)
+        except Exception as e:
+            logger.error(f"Manual backup failed: {e}", extra={"admin_id": str(ctx.author.id)})
+            await ctx.send(f"❌ Backup failed: {e}")
+            return
+        logger.info(f"{ctx.author} took a database backup", extra={"admin_id": str(ctx.author.id)})
+
+        embed = discord.Embed(title="💾 Database Backed Up", description=f"`{result.path}`", color=0x00ff00)
+        embed.add_field(name="Size", value=f"{result.db_size / 2 ** 20:.1f} MiB → {result.size / 2 ** 20:.1f} MiB",
+                        inline=True)
+        embed.add_field(name="Time", value=f"{result.seconds:.1f}s", inline=True)
+        embed.add_field(name="SHA-256", value=f"`{result.sha256[:16]}…`", inline=False)
+        if not isinstance(self.bot.storage, storage.SQLiteStorage):
+            embed.add_field(name="⚠️ Ledger not included",
+                            value="Points live in Postgres (P2E_STORAGE); back them up with pg_dump.", inline=False)
+        await ctx.send(embed=embed)
+
 async def setup(bot):
     await bot.add_cog(Admin(bot))
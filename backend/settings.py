@@ -29,7 +29,7 @@ SECRET_KEY = env("SECRET_KEY")
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = env.bool("DEBUG", default=False)
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = env.list("ALLOWED_HOSTS", default=["localhost", "127.0.0.1"])
 
 
 # Application definition
@@ -97,6 +97,45 @@ WSGI_APPLICATION = "backend.wsgi.application"
 
 DATABASES = {"default": env.db("DATABASE_URL")}
 
+# Keep connections open between requests. Under ASGI the async ORM runs every
+# query on one shared executor thread, so a single warm connection per worker
+# serves all concurrent requests instead of reconnecting per request.
+DATABASES["default"]["CONN_MAX_AGE"] = env.int("DB_CONN_MAX_AGE", default=600)
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    # SQLite stand-in for local load tests: wait on the write lock rather
+    # than failing immediately when bulk ingests overlap.
+    DATABASES["default"].setdefault("OPTIONS", {})["timeout"] = env.int(
+        "DB_SQLITE_TIMEOUT", default=20
+    )
+else:
+    # Django 4.2 has no built-in pool; in production connections go through
+    # PgBouncer (see docker-compose.yml), which needs server-side cursors off
+    # in transaction pooling mode.
+    DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = env.bool(
+        "DB_USE_PGBOUNCER", default=False
+    )
+    DATABASES["default"].setdefault("OPTIONS", {})["connect_timeout"] = env.int(
+        "DB_CONNECT_TIMEOUT", default=5
+    )
+
+# The bot's SQLite ledger, read by `manage.py reconcile`
+P2E_LEDGER_PATH = env("P2E_LEDGER_PATH", default=str(BASE_DIR / "p2e.db"))
+# The bot's Postgres ledger (P2E_STORAGE=postgres): reconcile reads it through
+# the "ledger" database alias instead of P2E_LEDGER_PATH when this is set.
+if env("P2E_LEDGER_DATABASE_URL", default=""):
+    DATABASES["ledger"] = env.db("P2E_LEDGER_DATABASE_URL")
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Read endpoints (leaderboard, user points) are cached and invalidated on
+# ingest. Local memory is per-process; point CACHE_URL at a file cache
+# (filecache:///var/tmp/p2e-cache) when running several ASGI workers.
+
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://p2e")}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
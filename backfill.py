@@ -0,0 +1,172 @@
+from discord.ext import commands
+from logconfig import logger
+import db
+import discord
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+# Channels scanned at once during a backfill
+BACKFILL_CONCURRENCY = 3
+# Awards written per ledger transaction
+BACKFILL_BATCH_SIZE = 500
+# Never award messages older than this, however long the bot was offline
+BACKFILL_MAX_AGE_HOURS = 24
+# Pause after each page of history (Discord returns 100 messages per request)
+HISTORY_PAGE_SIZE = 100
+HISTORY_PAGE_PAUSE_SECONDS = 0.5
+# How often in-memory checkpoints are written to the database
+CHECKPOINT_FLUSH_SECONDS = 30
+
+class Backfill(commands.Cog):
+    """Recover points for messages sent while the bot was disconnected"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.checkpoints = {}  # channel_id -> last processed message ID
+        self.dirty = {}  # Checkpoints not yet flushed to the database
+        self.resume_from = None  # Checkpoints as of the last disconnect, pending a backfill
+        self.lock = asyncio.Lock()
+
+    async def cog_load(self):
+        self.checkpoints = await asyncio.to_thread(db.load_checkpoints)
+        # Catch up on downtime after a fresh start too
+        self.resume_from = dict(self.checkpoints)
+        self.flush_task = asyncio.create_task(self.flush_checkpoints_loop())
+
+    async def cog_unload(self):
+        self.flush_task.cancel()
+        await self.flush_checkpoints()
+
+    def mark(self, channel_id, message_id):
+        if message_id > self.checkpoints.get(channel_id, 0):
+            self.checkpoints[channel_id] = message_id
+            self.dirty[channel_id] = message_id
+
+    async def flush_checkpoints(self):
+        if not self.dirty:
+            return
+        dirty, self.dirty = self.dirty, {}
+        try:
+            await asyncio.to_thread(db.save_checkpoints, dirty)
+        except Exception as e:
+            # Keep them for the next flush
+            for channel_id, message_id in dirty.items():
+                self.dirty[channel_id] = max(message_id, self.dirty.get(channel_id, 0))
+            logger.error(f"Error saving channel checkpoints: {e}")
+
+    async def flush_checkpoints_loop(self):
+        while True:
+            await asyncio.sleep(CHECKPOINT_FLUSH_SECONDS)
+            await self.flush_checkpoints()
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if message.guild:
+            self.mark(message.channel.id, message.id)
+
+    def hold_back(self, positions):
+        """Make the next backfill start no later than ``positions`` (channel_id -> message ID)"""
+        resume_from = self.resume_from or {}
+        for channel_id, message_id in positions.items():
+            resume_from[channel_id] = min(message_id, resume_from.get(channel_id, message_id))
+        self.resume_from = resume_from
+
+    @commands.Cog.listener()
+    async def on_disconnect(self):
+        # Freeze checkpoints now: live messages after the reconnect would
+        # otherwise move them past the gap before the backfill starts
+        self.hold_back(self.checkpoints)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        await self.maybe_backfill()
+
+    @commands.Cog.listener()
+    async def on_resumed(self):
+        await self.maybe_backfill()
+
+    async def maybe_backfill(self):
+        if self.resume_from is not None and not self.lock.locked():
+            resume_from, self.resume_from = self.resume_from, None
+            asyncio.create_task(self.run_backfill(resume_from))
+
+    async def run_backfill(self, resume_from):
+        """Scan every checkpointed channel for messages after its checkpoint"""
+        async with self.lock:
+            points = self.bot.get_cog('Points')
+            if points is None:
+                return
+
+            channels = []
+            for guild in self.bot.guilds:
+                for channel in guild.text_channels:
+                    if channel.id in resume_from and channel.permissions_for(guild.me).read_message_history:
+                        channels.append(channel)
+            if not channels:
+                return
+
+            logger.info(f"Backfilling missed activity in {len(channels)} channels")
+            semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+
+            async def scan(channel):
+                async with semaphore:
+                    try:
+                        return await self.backfill_channel(channel, resume_from[channel.id], points)
+                    except Exception as e:
+                        # Discord or ledger errors stop this channel only; it resumes on the next backfill
+                        logger.error(f"Error backfilling #{channel.name}: {e}")
+                        return 0
+
+            scanned = await asyncio.gather(*(scan(channel) for channel in channels))
+            await self.flush_checkpoints()
+            logger.info(f"Backfill complete: {sum(scanned)} missed messages scanned")
+
+    async def backfill_channel(self, channel, last_message_id, points):
+        """Award missed messages in one channel in bulk batches; returns messages scanned
+
+        Awards are keyed by message ID, so anything already credited live is
+        ignored by the ledger. The checkpoint only moves past messages whose
+        batch committed; if scanning fails, the next backfill starts after
+        the last committed one.
+        """
+        cutoff = discord.utils.time_snowflake(datetime.now(timezone.utc) - timedelta(hours=BACKFILL_MAX_AGE_HOURS))
+        after = discord.Object(id=max(last_message_id, cutoff))
+
+        batch = []
+        seen = 0
+        committed = last_message_id  # Newest message whose award (if any) is in the ledger
+        scanned = None
+        try:
+            # discord.py paces requests against the route's rate-limit bucket; the
+            # semaphore and per-page pause keep a backfill from starving live traffic
+            async for message in channel.history(limit=None, after=after, oldest_first=True):
+                award = points.message_award(message)
+                if award:
+                    batch.append(award)
+                scanned = message.id
+
+                if len(batch) >= BACKFILL_BATCH_SIZE:
+                    await points.award_batch(batch)
+                    batch = []
+                    committed = scanned
+                    self.mark(channel.id, committed)
+
+                seen += 1
+                if seen % HISTORY_PAGE_SIZE == 0:
+                    await asyncio.sleep(HISTORY_PAGE_PAUSE_SECONDS)
+
+            if batch:
+                await points.award_batch(batch)
+        except Exception:
+            # message_award put the uncommitted batch in the dedup window; take
+            # it out so the next backfill awards those messages
+            for award in batch:
+                self.bot.cache.dedup.discard(int(award[3][4:]))
+            self.hold_back({channel.id: committed})
+            raise
+        if scanned is not None:
+            self.mark(channel.id, scanned)
+        return seen
+
+async def setup(bot):
+    await bot.add_cog(Backfill(bot))
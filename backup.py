@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Online backups of the SQLite database
+
+Copying p2e.db by hand while the bot writes can catch a half-applied
+transaction (or miss what is still in the -wal file). Backups instead use
+SQLite's online backup API from a background thread:
+
+* The source connection holds one read transaction for the whole copy, so
+  the backup is a consistent snapshot and writers keep committing to the
+  WAL meanwhile (it is checkpointed once the backup finishes).
+* Pages are copied BACKUP_PAGES_PER_STEP at a time with a pause after each
+  step, so the copy never holds a lock or the disk for long, however big
+  the database is.
+* The copy is checked with ``PRAGMA quick_check``, gzipped, and written as
+  ``p2e-<UTC time>.db.gz`` next to a ``.sha256`` file (sha256sum format).
+  Only the newest BACKUP_KEEP backups are kept.
+
+Restoring verifies the checksum and writes the backup into the target
+through the backup API as well, so an existing -wal file can't be replayed
+on top of it. With P2E_STORAGE=postgres the points ledger lives in Postgres
+and isn't part of these backups (use pg_dump for it). Stop the bot first:
+
+    python backup.py create
+    python backup.py list
+    python backup.py verify backups/p2e-20250806-173409.db.gz
+    python backup.py restore backups/p2e-20250806-173409.db.gz [--target p2e.db]
+"""
+
+import argparse
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import db
+from logconfig import logger
+
+BACKUP_DIR = os.getenv('P2E_BACKUP_DIR', 'backups')
+BACKUP_INTERVAL_SECONDS = 6 * 60 * 60
+BACKUP_KEEP = 14
+# 256 pages is 1 MiB at the default page size
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_PAUSE_SECONDS = 0.02
+COPY_CHUNK_BYTES = 1024 * 1024
+# Level 6 is much faster than gzip's default 9 for nearly the same size
+COMPRESS_LEVEL = 6
+
+Backup = namedtuple('Backup', ['path', 'size', 'db_size', 'sha256', 'seconds'])
+
+# Scheduled and manual backups never run at the same time
+_lock = threading.Lock()
+
+
+class BackupError(Exception):
+    """A backup file is missing, corrupt or doesn't match its checksum."""
+
+
+def _checksum_path(path):
+    return f'{path}.sha256'
+
+
+def _pause(status, remaining, total):
+    time.sleep(BACKUP_STEP_PAUSE_SECONDS)
+
+
+def _copy_database(source_path, target_path):
+    """Online copy of ``source_path`` into a new database at ``target_path``"""
+    source = sqlite3.connect(source_path, timeout=db.BUSY_TIMEOUT_SECONDS)
+    target = sqlite3.connect(target_path)
+    try:
+        # Pin one snapshot for every step; without it each write by another
+        # connection would restart the copy from page one
+        source.execute('BEGIN')
+        source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        source.backup(target, pages=BACKUP_PAGES_PER_STEP, progress=_pause)
+        source.rollback()
+        (result,) = target.execute('PRAGMA quick_check').fetchone()
+        if result != 'ok':
+            raise BackupError(f'backup copy failed quick_check: {result}')
+    finally:
+        target.close()
+        source.close()
+
+
+def _compress(source_path, target_path):
+    with open(source_path, 'rb') as src, open(target_path, 'wb') as raw:
+        with gzip.GzipFile(filename=os.path.basename(source_path), mode='wb', fileobj=raw,
+                           compresslevel=COMPRESS_LEVEL) as gz:
+            shutil.copyfileobj(src, gz, COPY_CHUNK_BYTES)
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def list_backups(directory=BACKUP_DIR):
+    """Backup files in ``directory``, newest first"""
+    if not os.path.isdir(directory):
+        return []
+    names = [name for name in os.listdir(directory) if name.startswith('p2e-') and name.endswith('.db.gz')]
+    return [os.path.join(directory, name) for name in sorted(names, reverse=True)]
+
+
+def rotate(directory=BACKUP_DIR, keep=BACKUP_KEEP):
+    """Delete all but the newest ``keep`` backups; returns the deleted paths"""
+    removed = list_backups(directory)[keep:]
+    for path in removed:
+        os.remove(path)
+        if os.path.exists(_checksum_path(path)):
+            os.remove(_checksum_path(path))
+    return removed
+
+
+def create(directory=BACKUP_DIR, source_path=None, keep=BACKUP_KEEP):
+    """Take a compressed, checksummed backup of the database and rotate old ones.
+
+    Blocking; run it in a worker thread. Returns a Backup.
+    """
+    source_path = source_path or db.DB_PATH
+    with _lock:
+        started = time.perf_counter()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"p2e-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.db.gz")
+
+        # Stage the raw copy on disk next to the backups, not in memory
+        fd, raw_path = tempfile.mkstemp(suffix='.db', dir=directory)
+        os.close(fd)
+        try:
+            _copy_database(source_path, raw_path)
+            db_size = os.path.getsize(raw_path)
+            _compress(raw_path, f'{path}.tmp')
+            checksum = _sha256(f'{path}.tmp')
+        finally:
+            os.remove(raw_path)
+        os.replace(f'{path}.tmp', path)
+        with open(_checksum_path(path), 'w') as f:
+            f.write(f'{checksum}  {os.path.basename(path)}\n')
+
+        removed = rotate(directory, keep)
+        result = Backup(path, os.path.getsize(path), db_size, checksum, time.perf_counter() - started)
+        logger.info(f"💾 Backed up database to {path} ({result.db_size / 2 ** 20:.1f} MiB -> "
+                    f"{result.size / 2 ** 20:.1f} MiB, {result.seconds:.1f}s, {len(removed)} rotated out)")
+        return result
+
+
+def verify(path):
+    """Check a backup against its .sha256 file; returns the checksum or raises BackupError"""
+    if not os.path.exists(path):
+        raise BackupError(f'{path} does not exist')
+    try:
+        with open(_checksum_path(path)) as f:
+            expected = f.read().split()[0]
+    except (OSError, IndexError):
+        raise BackupError(f'no checksum file for {path}')
+    actual = _sha256(path)
+    if actual != expected:
+        raise BackupError(f'{path} checksum mismatch (expected {expected}, got {actual})')
+    return actual
+
+
+def restore(path, target_path=None):
+    """Replace the database at ``target_path`` with a verified backup.
+
+    The bot must not be running. The backup is decompressed to a temporary
+    file, checked, and copied in with the backup API.
+    """
+    target_path = target_path or db.DB_PATH
+    verify(path)
+    directory = os.path.dirname(os.path.abspath(target_path))
+    fd, raw_path = tempfile.mkstemp(suffix='.db', dir=directory)
+    os.close(fd)
+    try:
+        with gzip.open(path, 'rb') as gz, open(raw_path, 'wb') as out:
+            shutil.copyfileobj(gz, out, COPY_CHUNK_BYTES)
+        source = sqlite3.connect(raw_path)
+        try:
+            (result,) = source.execute('PRAGMA quick_check').fetchone()
+            if result != 'ok':
+                raise BackupError(f'{path} failed quick_check: {result}')
+            target = sqlite3.connect(target_path, timeout=db.BUSY_TIMEOUT_SECONDS)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+        finally:
+            source.close()
+    finally:
+        os.remove(raw_path)
+    logger.info(f"♻️ Restored database {target_path} from {path}")
+
+
+def main(args):
+    try:
+        if args.command == 'create':
+            result = create(args.dir)
+            print(f"✅ {result.path} ({result.size:,} bytes, sha256 {result.sha256})")
+        elif args.command == 'list':
+            backups = list_backups(args.dir)
+            if not backups:
+                print(f"No backups in {args.dir}")
+            for path in backups:
+                print(f"{path}  {os.path.getsize(path):,} bytes")
+        elif args.command == 'verify':
+            print(f"✅ {args.path} sha256 {verify(args.path)}")
+        elif args.command == 'restore':
+            restore(args.path, args.target)
+            print(f"✅ Restored {args.target or db.DB_PATH} from {args.path}")
+    except BackupError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Back up and restore the points database')
+    parser.add_argument('--dir', default=BACKUP_DIR, help='Backup directory')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('create', help='Take a backup now')
+    subparsers.add_parser('list', help='List backups, newest first')
+    verify_parser = subparsers.add_parser('verify', help='Check a backup against its checksum')
+    verify_parser.add_argument('path')
+    restore_parser = subparsers.add_parser('restore', help='Restore a backup (stop the bot first)')
+    restore_parser.add_argument('path')
+    restore_parser.add_argument('--target', help='Database to overwrite (default: P2E_DB_PATH)')
+    main(parser.parse_args())
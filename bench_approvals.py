@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Resource approval lock benchmark
+
+Compares the old approveresource flow (an uncommitted UPDATE on one
+connection while add_points commits on a second connection) with the
+unit-of-work flow in db.transaction(), while a background thread keeps
+writing message awards like a busy server would. Runs against a throwaway
+database, never p2e.db.
+
+    python bench_approvals.py --approvals 200 --timeout 0.25
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import db
+import review_queue
+
+
+class LostAward(Exception):
+    """An approval committed but its points were never written."""
+
+
+def seed(count):
+    with db.transaction() as c:
+        c.executemany(
+            "INSERT INTO resource_submissions (user_id, resource_description) VALUES (?, ?)",
+            [(str(1000 + i % 50), f"Resource {i}") for i in range(count)],
+        )
+
+
+def legacy_approve(submission_id):
+    """The pre-unit-of-work approveresource: nested connections on one file.
+
+    Like the old add_points, a failed inner write is swallowed and the outer
+    approval still commits, so the submission is approved without points.
+    Raises LostAward in that case so the benchmark can count it.
+    """
+    conn = db.connect()
+    try:
+        c = conn.cursor()
+        c.execute(
+            "SELECT user_id FROM resource_submissions WHERE id = ? AND status = 'pending'",
+            (submission_id,),
+        )
+        (user_id,) = c.fetchone()
+        c.execute(
+            "UPDATE resource_submissions SET status = 'approved', points_awarded = 10 WHERE id = ?",
+            (submission_id,),
+        )
+        # add_points opened its own connection and committed while the UPDATE
+        # above still held the write lock
+        inner = db.connect()
+        lost = False
+        try:
+            ic = inner.cursor()
+            ic.execute("INSERT OR IGNORE INTO users (user_id, points) VALUES (?, 0)", (user_id,))
+            ic.execute("UPDATE users SET points = points + 10 WHERE user_id = ?", (user_id,))
+            ic.execute(
+                "INSERT INTO points_log(user_id, action, points) VALUES (?, 'Resource share', 10)",
+                (user_id,),
+            )
+            inner.commit()
+        except sqlite3.OperationalError:
+            lost = True
+        finally:
+            inner.close()
+        conn.commit()
+    finally:
+        conn.close()
+    if lost:
+        raise LostAward(submission_id)
+
+
+def unit_of_work_approve(submission_id):
+    review_queue.approve([submission_id], "0", 10, "", "Resource share")
+
+
+def message_writer(stop, stats):
+    """Background message awards competing for the write lock."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            with db.transaction() as c:
+                db.award_points(c, "42", 1, "Message sent")
+            stats["writes"] += 1
+        except sqlite3.OperationalError:
+            stats["errors"] += 1
+            stats["wait"] += time.perf_counter() - start
+        time.sleep(0.001)
+
+
+def run(name, approve, submission_ids):
+    stop = threading.Event()
+    writer_stats = {"writes": 0, "errors": 0, "wait": 0.0}
+    writer = threading.Thread(target=message_writer, args=(stop, writer_stats))
+    writer.start()
+
+    approved = lock_errors = lost_awards = 0
+    lock_wait = 0.0
+    start = time.perf_counter()
+    for submission_id in submission_ids:
+        attempt = time.perf_counter()
+        try:
+            approve(submission_id)
+            approved += 1
+        except LostAward:
+            lost_awards += 1
+            lock_errors += 1
+            lock_wait += time.perf_counter() - attempt
+        except sqlite3.OperationalError:
+            lock_errors += 1
+            lock_wait += time.perf_counter() - attempt
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    writer.join()
+
+    print(f"\n{name}")
+    print(f"   Approvals with points: {approved}/{len(submission_ids)}")
+    print(f"   Approved, points lost: {lost_awards}")
+    print(f"   'database is locked':  {lock_errors} (+{writer_stats['errors']} background)")
+    print(f"   Time lost to locks:    {lock_wait + writer_stats['wait']:.2f}s")
+    print(f"   Elapsed:               {elapsed:.2f}s ({approved / elapsed:,.0f} approvals/s)")
+    print(f"   Background awards:     {writer_stats['writes']}")
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.BUSY_TIMEOUT_SECONDS = args.timeout
+        db.setup()
+        seed(args.approvals * 2)
+
+        print("🔒 Approval Lock Benchmark")
+        print("=" * 50)
+        print(f"   Busy timeout: {args.timeout}s")
+        run("Legacy nested connections", legacy_approve, range(1, args.approvals + 1))
+        run(
+            "Unit of work (db.transaction)",
+            unit_of_work_approve,
+            range(args.approvals + 1, args.approvals * 2 + 1),
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark approval lock contention")
+    parser.add_argument("--approvals", type=int, default=100, help="Approvals per scenario")
+    parser.add_argument(
+        "--timeout", type=float, default=0.25, help="SQLite busy timeout in seconds"
+    )
+    main(parser.parse_args())
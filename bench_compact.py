@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Compact storage benchmark
+
+Builds a ledger in the old layout (snowflakes as TEXT, DATETIME strings),
+converts a copy with db.setup() and compares file size and the hot reads
+on both: a balance lookup, one user's history, today's activity count and
+a 7-day leaderboard. Runs against throwaway databases, never p2e.db.
+
+    python bench_compact.py --users 20000 --awards 1000000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import db
+
+LEGACY_SCHEMA = """
+CREATE TABLE users (user_id TEXT PRIMARY KEY, points INTEGER DEFAULT 0);
+CREATE TABLE points_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT,
+    action TEXT,
+    points INTEGER,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    source_key TEXT
+);
+CREATE INDEX idx_points_log_timestamp ON points_log(timestamp);
+CREATE INDEX idx_points_log_user ON points_log(user_id, timestamp);
+CREATE UNIQUE INDEX idx_points_log_source_key ON points_log(source_key) WHERE source_key IS NOT NULL;
+CREATE TABLE points_daily (user_id TEXT, day TEXT, points INTEGER DEFAULT 0, PRIMARY KEY (user_id, day));
+CREATE INDEX idx_points_daily_day ON points_daily(day, user_id, points);
+"""
+
+# (name, old layout query, compact layout query); ? is the user, the day or the since-timestamp
+QUERIES = [
+    ("Balance lookup",
+     "SELECT points FROM users WHERE user_id = ?",
+     "SELECT points FROM users WHERE user_id = ?"),
+    ("User history (10 newest)",
+     "SELECT action, points, timestamp FROM points_log WHERE user_id = ? ORDER BY timestamp DESC LIMIT 10",
+     "SELECT action, points, datetime(timestamp, 'unixepoch') FROM points_log WHERE user_id = ? "
+     "ORDER BY timestamp DESC LIMIT 10"),
+    ("Today's activity",
+     "SELECT COUNT(*) FROM points_log WHERE timestamp >= ?",
+     "SELECT COUNT(*) FROM points_log WHERE timestamp >= ?"),
+    ("7-day leaderboard",
+     "SELECT user_id, SUM(points) AS earned FROM points_daily WHERE day >= ? "
+     "GROUP BY user_id ORDER BY earned DESC LIMIT 10",
+     "SELECT CAST(user_id AS TEXT), SUM(points) AS earned FROM points_daily WHERE day >= ? "
+     "GROUP BY user_id ORDER BY earned DESC LIMIT 10"),
+]
+
+
+def build_legacy(path, users, awards, days):
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    rng = random.Random(7)
+    ids = [str(rng.randrange(10 ** 17, 10 ** 19)) for _ in range(users)]
+    start = datetime.utcnow() - timedelta(days=days)
+    span = days * 86400
+
+    def rows():
+        for i in range(awards):
+            when = start + timedelta(seconds=rng.randrange(span))
+            yield (rng.choice(ids), "Message sent", 1, when.strftime("%Y-%m-%d %H:%M:%S"), f"msg:{i}")
+
+    conn.executemany(
+        "INSERT INTO points_log (user_id, action, points, timestamp, source_key) VALUES (?, ?, ?, ?, ?)", rows()
+    )
+    conn.execute("INSERT INTO users SELECT user_id, SUM(points) FROM points_log GROUP BY user_id")
+    conn.execute("""INSERT INTO points_daily SELECT user_id, DATE(timestamp), SUM(points)
+                    FROM points_log GROUP BY user_id, DATE(timestamp)""")
+    conn.commit()
+    conn.close()
+    return ids
+
+
+def compact(path):
+    db.DB_PATH = path
+    started = time.perf_counter()
+    db.setup()
+    return time.perf_counter() - started
+
+
+def vacuum(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute("VACUUM")
+    conn.close()
+    return os.path.getsize(path)
+
+
+def time_query(path, query, params_for, repeat):
+    conn = sqlite3.connect(path)
+    started = time.perf_counter()
+    for i in range(repeat):
+        conn.execute(query, params_for(i)).fetchall()
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return elapsed / repeat
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = os.path.join(tmp, "legacy.db")
+        compacted = os.path.join(tmp, "compact.db")
+
+        print("🗜️ Compact Storage Benchmark")
+        print("=" * 50)
+        print(f"   {args.users:,} users, {args.awards:,} awards over {args.days} days")
+        started = time.perf_counter()
+        ids = build_legacy(legacy, args.users, args.awards, args.days)
+        print(f"   Built legacy ledger in {time.perf_counter() - started:.1f}s")
+        shutil.copy(legacy, compacted)
+        print(f"   Converted with db.setup() in {compact(compacted):.1f}s")
+
+        legacy_size, compact_size = vacuum(legacy), vacuum(compacted)
+        print(f"\n   File size: {legacy_size / 2 ** 20:,.1f} MiB -> {compact_size / 2 ** 20:,.1f} MiB "
+              f"({1 - compact_size / legacy_size:.0%} smaller)")
+
+        now = datetime.utcnow()
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        week_ago = (now - timedelta(days=7)).date()
+        legacy_params = [
+            lambda i: (ids[i % len(ids)],),
+            lambda i: (ids[i % len(ids)],),
+            lambda i: (midnight.strftime("%Y-%m-%d %H:%M:%S"),),
+            lambda i: (week_ago.isoformat(),),
+        ]
+        compact_params = [
+            lambda i: (ids[i % len(ids)],),
+            lambda i: (ids[i % len(ids)],),
+            lambda i: (int((midnight - datetime(1970, 1, 1)).total_seconds()),),
+            lambda i: (db.epoch_day(week_ago.isoformat()),),
+        ]
+
+        print(f"\n   {'Query':<26}{'legacy':>12}{'compact':>12}")
+        for (name, old_query, new_query), old_params, new_params in zip(QUERIES, legacy_params, compact_params):
+            repeat = args.repeat if "lookup" in name or "history" in name else max(args.repeat // 100, 3)
+            old = time_query(legacy, old_query, old_params, repeat)
+            new = time_query(compacted, new_query, new_params, repeat)
+            print(f"   {name:<26}{old * 1e6:>10,.0f}µs{new * 1e6:>10,.0f}µs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the compact ledger layout")
+    parser.add_argument("--users", type=int, default=20000, help="Distinct users")
+    parser.add_argument("--awards", type=int, default=500000, help="points_log rows")
+    parser.add_argument("--days", type=int, default=90, help="Days of history")
+    parser.add_argument("--repeat", type=int, default=2000, help="Runs of each point query")
+    main(parser.parse_args())
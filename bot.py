@@ -3,23 +3,24 @@ import discord
 from discord.ext import commands
 from dotenv import load_dotenv
 import db
+from cache import BotCache
+import rules
+import snapshot
+import backup
+import storage
+import anomaly
+import collusion
 import asyncio
-import logging
 import sys
-from datetime import datetime
+import time
+from datetime import datetime, timedelta, timezone
 import math
 import aiohttp
 import json
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-logger = logging.getLogger(__name__)
+from logconfig import logger, setup_logging
+
+# Set up logging (file and stdout writes happen on a background thread)
+setup_logging()
 
 # Load environment variables
 load_dotenv()
@@ -36,7 +37,45 @@ intents.message_content = True
 intents.reactions = True
 intents.members = True
 
-bot = commands.Bot(command_prefix='!', intents=intents, help_command=None)
+class P2EBot(commands.Bot):
+    """Bot with a one-time startup pipeline that runs before the gateway login"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.start_time = datetime.now(timezone.utc)
+        self.boot_started = time.perf_counter()
+        self.time_to_ready = None  # Seconds from process start to first on_ready
+        self.cache = BotCache()
+        self.rules = rules.RuleEngine()
+        self.storage = storage.from_config()  # Ledger backend (P2E_STORAGE)
+
+    async def setup_hook(self):
+        """Run migrations once, then load cogs and warm caches concurrently"""
+        started = time.perf_counter()
+        
+        db_success = await setup_database()
+        if not db_success:
+            logger.error("❌ Failed to setup database, bot may not function properly")
+        
+        await load_rules()
+        await self.storage.open()
+        await seed_daily_caps()
+        
+        loaded_cogs, _ = await asyncio.gather(load_cogs(), warm_caches())
+        logger.info(f"🎯 All cogs loaded successfully! ({len(loaded_cogs)} cogs)")
+        logger.info(f"⚙️ Startup pipeline finished in {time.perf_counter() - started:.2f}s")
+        
+        self.snapshot_task = asyncio.create_task(snapshot_loop())
+        self.rules_task = asyncio.create_task(rules_loop())
+        self.anomaly_task = asyncio.create_task(anomaly_loop())
+        self.backup_task = asyncio.create_task(backup_loop())
+
+    async def close(self):
+        # Cogs flush through storage while unloading, so close it last
+        await super().close()
+        await self.storage.close()
+
+bot = P2EBot(command_prefix='!', intents=intents, help_command=None)
 
 # Global variables
 cogs_loaded = False
@@ -90,7 +129,7 @@ async def update_user_points_in_backend(discord_id: str, points: int, action: st
                 headers={"Content-Type": "application/json"}
             ) as response:
                 if response.status == 200:
-                    logger.info(f"✅ Successfully updated points for user {discord_id} in backend")
+                    logger.info(f"✅ Successfully updated points for user {discord_id} in backend", extra={"sampled": True})
                     return True
                 else:
                     error_text = await response.text()
@@ -101,32 +140,71 @@ async def update_user_points_in_backend(discord_id: str, points: int, action: st
         logger.error(f"❌ Error updating points for user {discord_id} in backend: {e}")
         return False
 
+async def sync_points_batch_with_backend(rows):
+    """Push a batch of outbox rows (id, user_id, action, points, created_at) to the backend
+
+    Returns ``(status, detail)``: the HTTP status, or None if the backend
+    couldn't be reached, and the error text on failure.
+    """
+    try:
+        async with aiohttp.ClientSession() as session:
+            payload = {
+                "events": [
+                    {
+                        "discord_id": user_id,
+                        "points": points,
+                        "action": action,
+                        "timestamp": created_at.replace(' ', 'T'),
+                        # Retries after a lost response are recorded once
+                        "event_id": f"{bot.storage.name}:{outbox_id}"
+                    }
+                    for outbox_id, user_id, action, points, created_at in rows
+                ]
+            }
+            
+            async with session.post(
+                f"{BACKEND_API_URL}/api/points/bulk/",
+                json=payload,
+                headers={"Content-Type": "application/json"}
+            ) as response:
+                if response.status == 200:
+                    logger.info(f"✅ Synced {len(rows)} point events with backend", extra={"sampled": True})
+                    return response.status, None
+                else:
+                    error_text = await response.text()
+                    logger.error(f"❌ Failed to sync {len(rows)} point events with backend: {response.status} - {error_text}")
+                    return response.status, error_text
+                    
+    except Exception as e:
+        logger.error(f"❌ Error syncing point events with backend: {e}")
+        return None, str(e)
+
 async def load_cogs():
-    """Load all cogs with proper error handling"""
+    """Load all cogs concurrently with proper error handling"""
     global cogs_loaded
     if cogs_loaded:
         logger.info("Cogs already loaded, skipping...")
         return []
     
-    loaded_cogs = []
-    cog_files = [f for f in os.listdir('./cogs') if f.endswith('.py')]
+    cog_names = [f[:-3] for f in os.listdir('./cogs') if f.endswith('.py')]
     
-    for filename in cog_files:
-        cog_name = filename[:-3]
+    async def load(cog_name):
         try:
             # Check if cog is already loaded
             if cog_name in bot.cogs:
                 logger.info(f"✅ Cog '{cog_name}' already loaded")
-                loaded_cogs.append(cog_name)
-                continue
+                return cog_name
                 
             await bot.load_extension(f'cogs.{cog_name}')
-            loaded_cogs.append(cog_name)
             logger.info(f"✅ Successfully loaded cog: {cog_name}")
+            return cog_name
             
         except Exception as e:
             logger.error(f"❌ Failed to load cog '{cog_name}': {e}")
-            continue
+            return None
+    
+    results = await asyncio.gather(*(load(name) for name in cog_names))
+    loaded_cogs = [name for name in results if name]
     
     cogs_loaded = True
     return loaded_cogs
@@ -134,14 +212,100 @@ async def load_cogs():
 async def setup_database():
     """Setup database with error handling"""
     try:
-        db.setup()
-        db.initialize_rewards()
+        await asyncio.to_thread(db.setup)
+        await asyncio.to_thread(db.initialize_rewards)
         logger.info("✅ Database setup completed successfully")
         return True
     except Exception as e:
         logger.error(f"❌ Database setup failed: {e}")
         return False
 
+async def warm_caches():
+    """Preload user totals, the reward catalog, suspensions and streaks"""
+    try:
+        fingerprint = await bot.storage.fingerprint()
+        restored = await asyncio.to_thread(snapshot.restore, bot.cache, fingerprint=fingerprint)
+        if restored:
+            logger.info("💾 Restored user totals from snapshot")
+        else:
+            logger.info("💾 No usable snapshot, loading user totals from the database")
+            bot.cache.totals = await bot.storage.load_totals()
+        await bot.cache.warm(totals=False)
+        bot.cache.activity.load(await bot.storage.load_streaks())
+        logger.info(f"🔥 Caches warmed: {len(bot.cache.totals)} users, {len(bot.cache.rewards)} rewards, {len(bot.cache.suspensions)} suspensions")
+    except Exception as e:
+        logger.error(f"❌ Cache warm-up failed: {e}")
+
+async def load_rules():
+    """Compile the points rules file"""
+    try:
+        await asyncio.to_thread(bot.rules.load)
+        logger.info(f"📐 Loaded points rules from {bot.rules.path}")
+    except Exception as e:
+        logger.error(f"❌ Failed to load points rules, no points will be awarded: {e}")
+
+async def seed_daily_caps():
+    """Charge what the ledger credited today against the daily caps, so a restart doesn't reset them"""
+    try:
+        bot.rules.seed(await bot.storage.earned_today())
+        logger.info(f"📐 Seeded daily caps for {len(bot.rules.earned)} user actions")
+    except Exception as e:
+        logger.error(f"❌ Failed to seed daily caps from the ledger: {e}")
+
+async def rules_loop():
+    """Hot-reload the points rules when the file changes on disk"""
+    while True:
+        await asyncio.sleep(rules.RULES_RELOAD_SECONDS)
+        try:
+            if await asyncio.to_thread(bot.rules.reload_if_changed):
+                logger.info(f"📐 Reloaded points rules from {bot.rules.path}")
+        except Exception as e:
+            # Keep the last good rules until the file is fixed
+            logger.error(f"❌ Failed to reload points rules: {e}")
+
+async def save_snapshot():
+    """Capture in-memory state on the loop for a consistent copy, write it in a thread"""
+    # Read the ledger sequence before capturing: a write landing in between
+    # makes the snapshot look stale (a reload), never fresher than it is
+    _, _, ledger_seq = await bot.storage.fingerprint()
+    state = snapshot.capture(bot.cache)
+    state['ledger_seq'] = ledger_seq
+    await asyncio.to_thread(snapshot.write, state)
+
+async def snapshot_loop():
+    """Periodically persist in-memory state for fast warm restarts"""
+    while True:
+        await asyncio.sleep(snapshot.SNAPSHOT_INTERVAL_SECONDS)
+        try:
+            await save_snapshot()
+        except Exception as e:
+            logger.error(f"❌ Failed to write state snapshot: {e}")
+
+async def anomaly_loop():
+    """Periodically scan recent activity and flag anomalies and reaction rings in suspicious_activity"""
+    while True:
+        await asyncio.sleep(anomaly.ANALYSIS_INTERVAL_SECONDS)
+        try:
+            await anomaly.run(bot.storage)
+        except Exception as e:
+            logger.error(f"❌ Anomaly scan failed: {e}")
+        try:
+            await collusion.run(bot.storage)
+        except Exception as e:
+            logger.error(f"❌ Collusion scan failed: {e}")
+
+async def backup_loop():
+    """Periodically take an online backup of the database in a worker thread"""
+    if not isinstance(bot.storage, storage.SQLiteStorage):
+        # p2e.db still holds the review queue, catalog and bookkeeping, so keep backing it up
+        logger.warning("⚠️ Backups cover p2e.db only; back up the Postgres ledger (P2E_DATABASE_URL) with pg_dump")
+    while True:
+        await asyncio.sleep(backup.BACKUP_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(backup.create)
+        except Exception as e:
+            logger.error(f"❌ Database backup failed: {e}")
+
 @bot.event
 async def on_ready():
     """Bot ready event with comprehensive setup"""
@@ -154,14 +318,10 @@ async def on_ready():
     # Reset reconnect attempts on successful connection
     reconnect_attempts = 0
     
-    # Setup database
-    db_success = await setup_database()
-    if not db_success:
-        logger.error("❌ Failed to setup database, bot may not function properly")
-    
-    # Load cogs
-    loaded_cogs = await load_cogs()
-    logger.info(f"🎯 All cogs loaded successfully! ({len(loaded_cogs)} cogs)")
+    # on_ready fires again after every reconnect; one-time setup lives in setup_hook
+    if bot.time_to_ready is None:
+        bot.time_to_ready = time.perf_counter() - bot.boot_started
+        logger.info(f"⏱️ Time to ready: {bot.time_to_ready:.2f}s")
     
     # Set bot status
     await bot.change_presence(
@@ -189,6 +349,18 @@ async def on_disconnect():
     else:
         logger.error("❌ Max reconnection attempts reached. Bot will not reconnect automatically.")
 
+@bot.event
+async def on_member_update(before, after):
+    """Drop the cached admin set when a member's roles change"""
+    if before.roles != after.roles:
+        bot.cache.admins.pop(after.guild.id, None)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    """Drop the cached admin set when role permissions change"""
+    if before.permissions != after.permissions:
+        bot.cache.admins.pop(after.guild.id, None)
+
 @bot.event
 async def on_guild_join(guild):
     """Bot joined a new server"""
@@ -199,6 +371,53 @@ async def on_guild_remove(guild):
     """Bot left a server"""
     logger.info(f"👋 Bot left server: {guild.name} (ID: {guild.id})")
 
+def milestone_lines():
+    return "\n".join(f"**{pts} points** → {name}" for pts, name in sorted(db.MILESTONES.items()))
+
+def welcome_embed(member, description, quick_commands=False):
+    """Welcome embed for a member, with point values rendered from the rules table"""
+    guild_id = member.guild.id if getattr(member, 'guild', None) else None
+    embed = discord.Embed(
+        title=f"🎉 Welcome to Propel2Excel, {member.display_name}!",
+        description=description,
+        color=0x00ff00
+    )
+    
+    embed.add_field(
+        name="🏆 What is P2E?",
+        value="Propel2Excel is a student-powered professional growth platform where you can network, learn, and grow together!",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="💰 Points System",
+        value="Earn points for activities like:\n" + rules.earn_lines(bot.rules.table, guild_id),
+        inline=False
+    )
+    
+    embed.add_field(
+        name="🎯 Unlockable Incentives",
+        value=milestone_lines() + "\n\n*You'll receive a DM when you unlock each incentive!*",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="🚀 Getting Started",
+        value="• Use `!help` to see all commands\n• Use `!points` to check your points\n• Use `!milestones` to see available incentives\n• Use `!leaderboard` to see top performers",
+        inline=False
+    )
+    
+    if quick_commands:
+        embed.add_field(
+            name="📋 Quick Commands",
+            value=rules.command_lines(bot.rules.table, guild_id),
+            inline=False
+        )
+    
+    embed.set_footer(text="Welcome aboard! We're excited to see you grow with us! 🚀")
+    embed.set_thumbnail(url=member.display_avatar.url if member.display_avatar else None)
+    return embed
+
 @bot.event
 async def on_member_join(member):
     """Send personalized welcome DM to new members and register with backend"""
@@ -215,44 +434,7 @@ async def on_member_join(member):
             logger.warning(f"⚠️ Failed to register user {display_name} ({discord_id}) with backend, but continuing with local operations")
         
         # Create personalized welcome embed
-        embed = discord.Embed(
-            title=f"🎉 Welcome to Propel2Excel, {member.display_name}!",
-            description="You've joined an amazing community of students and professionals!",
-            color=0x00ff00
-        )
-        
-        embed.add_field(
-            name="🏆 What is P2E?",
-            value="Propel2Excel is a student-powered professional growth platform where you can network, learn, and grow together!",
-            inline=False
-        )
-        
-        embed.add_field(
-            name="💰 Points System",
-            value="Earn points for activities like:\n• Sending messages (+1 pt)\n• Reacting to posts (+2 pts)\n• Uploading resume (+20 pts)\n• Attending events (+15 pts)\n• Sharing resources (+10 pts)\n• LinkedIn updates (+5 pts)",
-            inline=False
-        )
-        
-        embed.add_field(
-            name="🎯 Unlockable Incentives",
-            value="**50 points** → Azure Certification\n**75 points** → Resume Review\n**100 points** → Hackathon\n\n*You'll receive a DM when you unlock each incentive!*",
-            inline=False
-        )
-        
-        embed.add_field(
-            name="🚀 Getting Started",
-            value="• Use `!help` to see all commands\n• Use `!points` to check your points\n• Use `!milestones` to see available incentives\n• Use `!leaderboard` to see top performers",
-            inline=False
-        )
-        
-        embed.add_field(
-            name="📋 Quick Commands",
-            value="`!resume` - Upload resume (+20 pts)\n`!event` - Mark attendance (+15 pts)\n`!resource <description>` - Submit resource for review (+10 pts if approved)\n`!linkedin` - Post update (+5 pts)",
-            inline=False
-        )
-        
-        embed.set_footer(text="Welcome aboard! We're excited to see you grow with us! 🚀")
-        embed.set_thumbnail(url=member.display_avatar.url if member.display_avatar else None)
+        embed = welcome_embed(member, "You've joined an amazing community of students and professionals!", quick_commands=True)
         
         # Send the personalized welcome DM
         await member.send(embed=embed)
@@ -263,13 +445,11 @@ async def on_member_join(member):
             "Welcome to the Propel2Excel Discord community!\n\n"
             "**You've just joined a community where every interaction helps you grow!**\n\n"
             "Start earning points right away by:\n"
-            "• Sending messages (+1 point each)\n"
-            "• Reacting to posts (+2 points each)\n"
+            f"• Sending messages (+{rules.plural(bot.rules.value('message', member.guild.id), 'point')} each)\n"
+            f"• Reacting to posts (+{rules.plural(bot.rules.value('reaction', member.guild.id), 'point')} each)\n"
             "• Using commands like `!resume`, `!event`, `!resource`, `!linkedin`\n\n"
             "**Unlock real incentives:**\n"
-            "• 50 points = Azure Certification\n"
-            "• 75 points = Resume Review\n"
-            "• 100 points = Hackathon\n\n"
+            + "".join(f"• {pts} points = {name}\n" for pts, name in sorted(db.MILESTONES.items())) + "\n"
             "Try `!help` to see all available commands!\n"
             "Welcome aboard! 🚀"
         )
@@ -300,7 +480,7 @@ async def ping(ctx):
         embed.add_field(name="Status", value="✅ Online", inline=True)
         
         await ctx.send(embed=embed)
-        logger.info(f"Ping command used by {ctx.author} in {ctx.guild.name}")
+        logger.info(f"Ping command used by {ctx.author} in {ctx.guild.name}", extra={"sampled": True})
         
     except Exception as e:
         logger.error(f"Error in ping command: {e}")
@@ -311,12 +491,7 @@ async def test(ctx):
     """Test command to verify points system"""
     try:
         user_id = str(ctx.author.id)
-        conn = db.connect()
-        c = conn.cursor()
-        c.execute('SELECT points FROM users WHERE user_id = ?', (user_id,))
-        data = c.fetchone()
-        pts = data[0] if data else 0
-        conn.close()
+        pts = await bot.storage.balance(user_id)
         
         embed = discord.Embed(
             title="🧪 Test Results",
@@ -329,7 +504,7 @@ async def test(ctx):
         embed.add_field(name="Database", value="✅ Connected", inline=True)
         
         await ctx.send(embed=embed)
-        logger.info(f"Test command used by {ctx.author} in {ctx.guild.name}")
+        logger.info(f"Test command used by {ctx.author} in {ctx.guild.name}", extra={"sampled": True})
         
     except Exception as e:
         logger.error(f"Error in test command: {e}")
@@ -350,9 +525,11 @@ async def status(ctx):
         embed.add_field(name="Loaded Cogs", value=len(bot.cogs), inline=True)
         embed.add_field(name="Commands", value=len(bot.commands), inline=True)
         embed.add_field(name="Uptime", value=f"<t:{int(bot.start_time.timestamp())}:R>", inline=True)
+        if bot.time_to_ready is not None:
+            embed.add_field(name="Time to Ready", value=f"{bot.time_to_ready:.2f}s", inline=True)
         
         await ctx.send(embed=embed)
-        logger.info(f"Status command used by {ctx.author} in {ctx.guild.name}")
+        logger.info(f"Status command used by {ctx.author} in {ctx.guild.name}", extra={"sampled": True})
         
     except Exception as e:
         logger.error(f"Error in status command: {e}")
@@ -362,41 +539,10 @@ async def status(ctx):
 async def welcome(ctx):
     """Send welcome message again"""
     try:
-        embed = discord.Embed(
-            title=f"🎉 Welcome to Propel2Excel, {ctx.author.display_name}!",
-            description="Here's your personalized welcome message!",
-            color=0x00ff00
-        )
-        
-        embed.add_field(
-            name="🏆 What is P2E?",
-            value="Propel2Excel is a student-powered professional growth platform where you can network, learn, and grow together!",
-            inline=False
-        )
-        
-        embed.add_field(
-            name="💰 Points System",
-            value="Earn points for activities like:\n• Sending messages (+1 pt)\n• Reacting to posts (+2 pts)\n• Uploading resume (+20 pts)\n• Attending events (+15 pts)\n• Sharing resources (+10 pts)\n• LinkedIn updates (+5 pts)",
-            inline=False
-        )
-        
-        embed.add_field(
-            name="🎯 Unlockable Incentives",
-            value="**50 points** → Azure Certification\n**75 points** → Resume Review\n**100 points** → Hackathon\n\n*You'll receive a DM when you unlock each incentive!*",
-            inline=False
-        )
-        
-        embed.add_field(
-            name="🚀 Getting Started",
-            value="• Use `!help` to see all commands\n• Use `!points` to check your points\n• Use `!milestones` to see available incentives\n• Use `!leaderboard` to see top performers",
-            inline=False
-        )
-        
-        embed.set_footer(text="Welcome aboard! We're excited to see you grow with us! 🚀")
-        embed.set_thumbnail(url=ctx.author.display_avatar.url if ctx.author.display_avatar else None)
+        embed = welcome_embed(ctx.author, "Here's your personalized welcome message!")
         
         await ctx.send(embed=embed)
-        logger.info(f"Welcome command used by {ctx.author} in {ctx.guild.name}")
+        logger.info(f"Welcome command used by {ctx.author} in {ctx.guild.name}", extra={"sampled": True})
         
     except Exception as e:
         logger.error(f"Error in welcome command: {e}")
@@ -408,38 +554,7 @@ async def sendwelcome(ctx, member: discord.Member):
     """Admin command to manually send welcome DM to a user"""
     try:
         # Create personalized welcome embed
-        embed = discord.Embed(
-            title=f"🎉 Welcome to Propel2Excel, {member.display_name}!",
-            description="You've joined an amazing community of students and professionals!",
-            color=0x00ff00
-        )
-        
-        embed.add_field(
-            name="🏆 What is P2E?",
-            value="Propel2Excel is a student-powered professional growth platform where you can network, learn, and grow together!",
-            inline=False
-        )
-        
-        embed.add_field(
-            name="💰 Points System",
-            value="Earn points for activities like:\n• Sending messages (+1 pt)\n• Reacting to posts (+2 pts)\n• Uploading resume (+20 pts)\n• Attending events (+15 pts)\n• Sharing resources (+10 pts)\n• LinkedIn updates (+5 pts)",
-            inline=False
-        )
-        
-        embed.add_field(
-            name="🎯 Unlockable Incentives",
-            value="**50 points** → Azure Certification\n**75 points** → Resume Review\n**100 points** → Hackathon\n\n*You'll receive a DM when you unlock each incentive!*",
-            inline=False
-        )
-        
-        embed.add_field(
-            name="🚀 Getting Started",
-            value="• Use `!help` to see all commands\n• Use `!points` to check your points\n• Use `!milestones` to see available incentives\n• Use `!leaderboard` to see top performers",
-            inline=False
-        )
-        
-        embed.set_footer(text="Welcome aboard! We're excited to see you grow with us! 🚀")
-        embed.set_thumbnail(url=member.display_avatar.url if member.display_avatar else None)
+        embed = welcome_embed(member, "You've joined an amazing community of students and professionals!")
         
         # Send the personalized welcome DM
         await member.send(embed=embed)
@@ -499,10 +614,8 @@ async def help(ctx):
             value="`!points` - Check your points\n"
                   "`!pointshistory` - View your point history\n"
                   "`!pointvalues` - Show all ways to earn points\n"
-                  "`!resume` - Claim points for resume upload\n"
-                  "`!event` - Claim points for event attendance\n"
-                  "`!resource` - Claim points for sharing resources\n"
-                  "`!linkedin` - Claim points for LinkedIn updates",
+                  "`!leaderboard [day|week|month|season]` - Top earners\n"
+                  + rules.command_lines(bot.rules.table, ctx.guild.id if ctx.guild else None),
             inline=False
         )
         
@@ -537,36 +650,67 @@ async def help(ctx):
         embed.set_footer(text="Use ! before each command. Example: !points")
         
         await ctx.send(embed=embed)
-        logger.info(f"Help command used by {ctx.author} in {ctx.guild.name}")
+        logger.info(f"Help command used by {ctx.author} in {ctx.guild.name}", extra={"sampled": True})
         
     except Exception as e:
         logger.error(f"Error in help command: {e}")
         await ctx.send("❌ An error occurred while processing the help command.")
 
 
+LEADERBOARD_WINDOWS = {
+    'day': "Today",
+    'week': "This Week",
+    'month': "This Month",
+    'season': "Season",
+    'all': "All Time",
+}
+
+def window_start(window, today=None):
+    """First UTC day (YYYY-MM-DD) counted by a day/week/month leaderboard"""
+    today = today or datetime.utcnow().date()
+    if window == 'week':
+        today = today - timedelta(days=today.weekday())
+    elif window == 'month':
+        today = today.replace(day=1)
+    return today.isoformat()
+
 @bot.command()
-async def leaderboard(ctx, page: int = 1):
-    """Show top users by points, paginated."""
+async def leaderboard(ctx, window: str = 'all', page: int = 1):
+    """Show top users by points, paginated. Window: day, week, month, season or all."""
     PAGE_SIZE = 10 # Number of users per page
-    conn = db.connect()
-    c = conn.cursor()
-    c.execute("SELECT user_id, points FROM users ORDER BY points DESC")
-    rows = c.fetchall()
-    conn.close()
-    total_users = len(rows)
+    # Keep `!leaderboard <page>` working for the all-time board
+    if window.isdigit():
+        window, page = 'all', int(window)
+    window = window.lower()
+    if window not in LEADERBOARD_WINDOWS:
+        await ctx.send(f"❌ Unknown leaderboard `{window}`. Use one of: {', '.join(LEADERBOARD_WINDOWS)}")
+        return
+
+    page = max(1, page)
+    offset = (page - 1) * PAGE_SIZE
+    title = LEADERBOARD_WINDOWS[window]
+    if window == 'all':
+        rows, total_users = await bot.storage.top_all(PAGE_SIZE, offset)
+    elif window == 'season':
+        season_name, rows, total_users = await bot.storage.top_season(PAGE_SIZE, offset)
+        title = season_name or title
+    else:
+        rows, total_users = await bot.storage.top_since(window_start(window), PAGE_SIZE, offset)
     total_pages = max(1, math.ceil(total_users / PAGE_SIZE))
 
-    page = max(1, min(page, total_pages))  # Clamp value
-    start = (page - 1) * PAGE_SIZE
-    end = start + PAGE_SIZE
-    msg = f"**🏆 Leaderboard (Page {page}/{total_pages})**\n"
-    for idx, (user_id, points) in enumerate(rows[start:end], start=start+1):
+    if page > total_pages:
+        await ctx.send(f"❌ The {title} leaderboard only has {total_pages} page(s).")
+        return
+    msg = f"**🏆 Leaderboard: {title} (Page {page}/{total_pages})**\n"
+    if not rows:
+        msg += "No points earned yet.\n"
+    for idx, (user_id, points) in enumerate(rows, start=offset+1):
         # Try to get Discord user for nice display name
         member = ctx.guild.get_member(int(user_id)) if user_id.isdigit() else None
         name = member.display_name if member else f"User {user_id}"
         msg += f"{idx}. {name}: {points} points\n"
     if total_pages > 1:
-        msg += f"\nType `!leaderboard <page>` to view other pages."
+        msg += f"\nType `!leaderboard {window} <page>` to view other pages."
     await ctx.send(msg)
 
 
@@ -576,25 +720,11 @@ async def rank(ctx, member: discord.Member = None):
     if member is None:
         member = ctx.author
 
-    user_id = str(member.id)
-
-    conn = db.connect()
-    c = conn.cursor()
-    c.execute("SELECT user_id, points FROM users ORDER BY points DESC")
-    rows = c.fetchall()
-    conn.close()
-
-    position = None
-    points = 0
-    for idx, (uid, pts) in enumerate(rows, start=1):
-        if uid == user_id:
-            position = idx
-            points = pts
-            break
-
-    if position is None:
+    ranked = await bot.storage.rank(str(member.id))
+    if ranked is None:
         await ctx.send(f"{member.display_name} has no points and is not on the leaderboard.")
     else:
+        position, points = ranked
         await ctx.send(f"🏅 {member.display_name} is ranked #{position} with {points} points.")
 
 
@@ -610,7 +740,7 @@ async def on_command_error(ctx, error):
         logger.warning(f"Permission denied for {ctx.author} in {ctx.guild.name}")
     elif isinstance(error, commands.CommandOnCooldown):
         await ctx.send(f"⏰ Please wait {error.retry_after:.1f} seconds before using this command again.")
-        logger.info(f"Cooldown triggered for {ctx.author} in {ctx.guild.name}")
+        logger.info(f"Cooldown triggered for {ctx.author} in {ctx.guild.name}", extra={"sampled": True})
     elif isinstance(error, commands.MissingRequiredArgument):
         await ctx.send(f"❌ Missing required argument: {error.param}")
         logger.warning(f"Missing argument for {ctx.author} in {ctx.guild.name}: {error.param}")
@@ -625,6 +755,11 @@ async def on_command_error(ctx, error):
 async def shutdown():
     """Graceful shutdown function"""
     logger.info("🛑 Shutting down bot...")
+    try:
+        await save_snapshot()
+        logger.info("💾 Saved state snapshot")
+    except Exception as e:
+        logger.error(f"❌ Failed to save state snapshot: {e}")
     await bot.close()
 
 # Signal handlers for graceful shutdown
@@ -0,0 +1,158 @@
+"""
+In-memory caches for hot bot reads
+
+Warmed once at startup (see P2EBot.setup_hook in bot.py) and kept current by
+the cogs as they write, so common lookups never touch SQLite.
+"""
+
+import asyncio
+from collections import deque
+from datetime import date, datetime, timedelta
+
+import db
+from pipeline import RateLimiter
+from quality import QualityGate
+
+# Number of recent message IDs remembered for duplicate detection
+DEDUP_WINDOW_SIZE = 5000
+
+
+class DedupWindow:
+    """Fixed-size window of recently seen IDs with O(1) membership checks"""
+
+    def __init__(self, size=DEDUP_WINDOW_SIZE):
+        self.size = size
+        self.order = deque()
+        self.seen = set()
+
+    def add(self, item):
+        """Remember ``item``; returns False if it was already in the window"""
+        if item in self.seen:
+            return False
+        self.seen.add(item)
+        self.order.append(item)
+        if len(self.order) > self.size:
+            self.seen.discard(self.order.popleft())
+        return True
+
+    def discard(self, item):
+        """Forget ``item`` so it can be processed again (e.g. after a failed write)"""
+        if item in self.seen:
+            self.seen.discard(item)
+            self.order.remove(item)
+
+    def extend(self, items):
+        for item in items:
+            self.add(int(item))
+
+    def __contains__(self, item):
+        return item in self.seen
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def __len__(self):
+        return len(self.order)
+
+
+class ActivityTracker:
+    """Last activity and daily streak per user, flushed to user_status in batches
+
+    ``touch`` is O(1) and never writes; however many messages a user sends
+    between flushes, ``take_pending`` yields one row for them.
+    """
+
+    def __init__(self):
+        self.streaks = {}  # user_id -> (last active day, consecutive days)
+        self.pending = {}  # user_id -> (last_activity, streak_day, streak_days) awaiting a flush
+
+    def load(self, rows):
+        self.streaks = {user_id: (date.fromisoformat(day), days) for user_id, day, days in rows}
+
+    def touch(self, user_id, when=None):
+        when = when or datetime.utcnow()
+        today = when.date()
+        day, days = self.streaks.get(user_id, (None, 0))
+        if day != today:
+            days = days + 1 if day == today - timedelta(days=1) else 1
+            self.streaks[user_id] = (today, days)
+        self.pending[user_id] = (when.strftime('%Y-%m-%d %H:%M:%S'), today.isoformat(), days)
+
+    def streak(self, user_id):
+        """Current streak in days; 0 once a full day has been missed"""
+        day, days = self.streaks.get(user_id, (None, 0))
+        if day is None or day < datetime.utcnow().date() - timedelta(days=1):
+            return 0
+        return days
+
+    def take_pending(self):
+        pending, self.pending = self.pending, {}
+        return [(user_id, *row) for user_id, row in pending.items()]
+
+
+class BotCache:
+    def __init__(self):
+        self.totals = {}       # user_id -> current points
+        self.rewards = []      # (id, name, cost) ordered by cost
+        self.suspensions = {}  # user_id -> suspension end (None = until lifted)
+        self.admins = {}       # guild_id -> set of administrator member IDs
+        self.dedup = DedupWindow()  # Recently processed message IDs
+        self.activity = ActivityTracker()
+        self.rate_limiter = RateLimiter()  # Per-user award token buckets
+        self.quality = QualityGate()  # Recent message fingerprints for the content filter
+
+    def load_totals(self):
+        conn = db.connect()
+        c = conn.cursor()
+        c.execute('SELECT CAST(user_id AS TEXT), points FROM users')
+        self.totals = dict(c.fetchall())
+        conn.close()
+
+    def load_rewards(self):
+        conn = db.connect()
+        c = conn.cursor()
+        c.execute('SELECT id, name, cost FROM rewards ORDER BY cost')
+        self.rewards = c.fetchall()
+        conn.close()
+
+    def load_suspensions(self):
+        conn = db.connect()
+        c = conn.cursor()
+        c.execute('SELECT user_id, suspension_end FROM user_status WHERE points_suspended')
+        self.suspensions = {
+            user_id: datetime.fromisoformat(end) if end else None
+            for user_id, end in c.fetchall()
+        }
+        conn.close()
+
+    async def warm(self, totals=True):
+        """Load every SQLite-backed cache in parallel worker threads
+
+        Pass ``totals=False`` when user totals were already restored from a
+        snapshot.
+        """
+        loaders = [self.load_rewards, self.load_suspensions]
+        if totals:
+            loaders.append(self.load_totals)
+        await asyncio.gather(*(asyncio.to_thread(loader) for loader in loaders))
+
+    def points(self, user_id):
+        return self.totals.get(user_id, 0)
+
+    def is_suspended(self, user_id):
+        """Whether the user is currently barred from earning points"""
+        if user_id not in self.suspensions:
+            return False
+        end = self.suspensions[user_id]
+        if end is not None and end <= datetime.utcnow():
+            del self.suspensions[user_id]
+            return False
+        return True
+
+    def guild_admins(self, guild):
+        """Administrator member IDs for a guild, computed on first use"""
+        if guild.id not in self.admins:
+            self.admins[guild.id] = {
+                member.id for member in guild.members if member.guild_permissions.administrator
+            }
+        return self.admins[guild.id]
@@ -0,0 +1,106 @@
+"""
+Reaction-ring (collusion) detection
+
+Reactions pay points, so a small group can farm by reacting to each other.
+The job builds a sparse user-by-user matrix A, where A[i, j] counts user i's
+reactions to user j's messages over the window. Only distinct pairs are
+loaded (the GROUP BY runs in the database), so memory is bounded by the number of
+reactor/author pairs however many reactions there were.
+
+    mutual = min(A, A.T)     reactions that were returned, per pair
+    rings  = connected components of the mutual graph, keeping only
+             pairs with at least MIN_MUTUAL_REACTIONS each way
+
+A component is flagged when it is small, densely connected and keeps most
+of its members' reactions inside the group. Every member gets a
+``collusion_ring`` row in suspicious_activity with the evidence.
+"""
+
+import asyncio
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+import anomaly
+from logconfig import logger
+
+COLLUSION_DAYS = 14
+MIN_MUTUAL_REACTIONS = 5  # Each way, for a pair to count as a ring edge
+MIN_RING_SIZE = 2
+MAX_RING_SIZE = 25        # Larger components are ordinary community, not a ring
+MIN_RING_DENSITY = 0.6    # Share of possible member pairs that are ring edges
+MIN_INSIDE_SHARE = 0.7    # Share of members' reactions that go to other members
+MIN_RING_REACTIONS = 20
+
+Ring = namedtuple('Ring', ['members', 'reactions', 'inside_share', 'density'])
+
+
+def find_rings(pairs):
+    """Rings in ``(reactor, author, count)`` rows, most reactions first"""
+    if not len(pairs):
+        return []
+    ids, codes = np.unique(pairs[:, :2], return_inverse=True)
+    codes = codes.reshape(-1, 2)
+    n = len(ids)
+    given = sparse.csr_matrix((pairs[:, 2].astype(np.float64), (codes[:, 0], codes[:, 1])), shape=(n, n))
+
+    mutual = given.minimum(given.T).tocsr()
+    mutual.data[mutual.data < MIN_MUTUAL_REACTIONS] = 0
+    mutual.eliminate_zeros()
+    _, labels = connected_components(mutual, directed=False)
+
+    # Per-component totals in one pass over the edges
+    size = np.bincount(labels)
+    ring_edges = sparse.triu(mutual, k=1).tocoo()
+    edges = np.bincount(labels[ring_edges.row], minlength=len(size))
+    edges_all = given.tocoo()
+    inside = labels[edges_all.row] == labels[edges_all.col]
+    total = np.bincount(labels[edges_all.row], weights=edges_all.data, minlength=len(size))
+    internal = np.bincount(labels[edges_all.row[inside]], weights=edges_all.data[inside], minlength=len(size))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        density = np.nan_to_num(edges / (size * (size - 1) / 2))
+        inside_share = np.nan_to_num(internal / total)
+    flagged = np.flatnonzero(
+        (size >= MIN_RING_SIZE) & (size <= MAX_RING_SIZE) & (density >= MIN_RING_DENSITY)
+        & (inside_share >= MIN_INSIDE_SHARE) & (internal >= MIN_RING_REACTIONS)
+    )
+    if not len(flagged):
+        return []
+
+    order = np.argsort(labels, kind='stable')
+    starts = np.r_[0, np.cumsum(size)]
+    rings = [
+        Ring([str(ids[i]) for i in order[starts[label]:starts[label + 1]]],
+             int(internal[label]), float(inside_share[label]), float(density[label]))
+        for label in flagged
+    ]
+    return sorted(rings, key=lambda ring: ring.reactions, reverse=True)
+
+
+async def run(storage, days=COLLUSION_DAYS):
+    """Find rings in the last ``days`` of reactions in ``storage`` and record new ones; returns every ring found"""
+    started = time.perf_counter()
+    pairs, skip = await asyncio.gather(
+        storage.scan_reactions(datetime.utcnow() - timedelta(days=days), grouped=True),
+        storage.recently_flagged(anomaly.REFLAG_DAYS))
+
+    rings = await asyncio.to_thread(find_rings, pairs)
+    now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    rows = []
+    for ring in rings:
+        if all((user_id, 'collusion_ring') in skip for user_id in ring.members):
+            continue
+        details = (f"ring of {len(ring.members)}: {', '.join(ring.members)}; {ring.reactions} reactions inside, "
+                   f"{ring.inside_share:.0%} of their reactions, density {ring.density:.2f}")
+        rows.extend((user_id, 'collusion_ring', details, now) for user_id in ring.members)
+    if rows:
+        await storage.log_suspicious(rows)
+
+    logger.info(f"Collusion scan: {len(pairs)} reaction pairs, {len(rings)} rings, {len(rows)} new flags "
+                f"({time.perf_counter() - started:.2f}s)")
+    return rings
@@ -1,3 +1,16 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import DiscordUser, PointEvent
+
+
+@admin.register(DiscordUser)
+class DiscordUserAdmin(admin.ModelAdmin):
+    list_display = ("discord_id", "display_name", "username", "joined_at")
+    search_fields = ("discord_id", "display_name", "username")
+
+
+@admin.register(PointEvent)
+class PointEventAdmin(admin.ModelAdmin):
+    list_display = ("user", "action", "points", "occurred_at")
+    list_filter = ("action",)
+    raw_id_fields = ("user",)
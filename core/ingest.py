@@ -0,0 +1,78 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, When
+
+from .models import DiscordUser, PointEvent
+
+# Bumped on every ingest; read responses are cached and ETagged per version
+POINTS_VERSION_KEY = "p2e:points-version"
+
+
+@transaction.atomic
+def record_events(events):
+    """Insert events and apply their deltas to the denormalized totals.
+
+    Each event is a dict with ``discord_id``, ``points``, ``action`` and
+    ``occurred_at``, and optionally the bot's ``event_id``: an event whose ID
+    is already recorded is skipped, so a batch retried after a lost response
+    is only counted once. Runs as one transaction so totals never disagree
+    with the event log. Returns the number of distinct users touched.
+    """
+    discord_ids = {e["discord_id"] for e in events}
+    DiscordUser.objects.bulk_create(
+        [DiscordUser(discord_id=d) for d in discord_ids], ignore_conflicts=True
+    )
+    # Lock the users in a fixed order: a concurrent retry of the same event
+    # (always for the same user) waits here, then finds it recorded
+    user_pks = dict(
+        DiscordUser.objects.select_for_update()
+        .filter(discord_id__in=discord_ids)
+        .order_by("pk")
+        .values_list("discord_id", "pk")
+    )
+
+    event_ids = {e["event_id"] for e in events if e.get("event_id")}
+    seen = set(
+        PointEvent.objects.filter(event_id__in=event_ids).values_list("event_id", flat=True)
+    )
+    fresh = []
+    for e in events:
+        event_id = e.get("event_id")
+        if event_id:
+            if event_id in seen:
+                continue
+            seen.add(event_id)
+        fresh.append(e)
+
+    PointEvent.objects.bulk_create(
+        [
+            PointEvent(
+                user_id=user_pks[e["discord_id"]],
+                points=e["points"],
+                action=e["action"],
+                occurred_at=e["occurred_at"],
+                event_id=e.get("event_id"),
+            )
+            for e in fresh
+        ],
+        ignore_conflicts=True,
+    )
+
+    deltas = {}
+    for e in fresh:
+        pk = user_pks[e["discord_id"]]
+        deltas[pk] = deltas.get(pk, 0) + e["points"]
+    if deltas:
+        DiscordUser.objects.filter(pk__in=deltas).update(
+            total_points=F("total_points")
+            + Case(*[When(pk=pk, then=delta) for pk, delta in deltas.items()], default=0)
+        )
+    return len(discord_ids)
+
+
+def invalidate_reads():
+    """Invalidate every cached read response (sync callers)."""
+    try:
+        cache.incr(POINTS_VERSION_KEY)
+    except ValueError:
+        cache.delete(POINTS_VERSION_KEY)
@@ -0,0 +1,276 @@
+import hashlib
+import sqlite3
+import zlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from core.ingest import invalidate_reads, record_events
+from core.models import DiscordUser
+
+RECONCILE_ACTION = "Reconciliation adjustment"
+
+
+def user_bucket(discord_id, buckets):
+    return zlib.crc32(str(discord_id).encode()) % buckets
+
+
+def entry_digest(discord_id, total):
+    """64-bit digest of one user's total; XOR-combined per bucket."""
+    digest = hashlib.blake2b(f"{discord_id}:{total}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def bucket_digests(rows, buckets):
+    """Fold ``(discord_id, total)`` rows into one order-independent digest per bucket.
+
+    Zero totals are skipped so a user missing on one side matches a user
+    with nothing earned on the other.
+    """
+    digests = [0] * buckets
+    for discord_id, total in rows:
+        if total:
+            digests[user_bucket(discord_id, buckets)] ^= entry_digest(discord_id, total)
+    return digests
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-user point totals between the bot's ledger (points_log, "
+        "in SQLite or Postgres) and the backend, and repair users that drifted. "
+        "Rows still queued in the bot's backend_outbox are not expected in the "
+        "backend yet; dead-lettered ones (backend_outbox_failed) are repaired "
+        "and reported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ledger",
+            default=settings.P2E_LEDGER_PATH,
+            help="Path to the bot's p2e.db (opened read-only)",
+        )
+        parser.add_argument(
+            "--ledger-database",
+            default="ledger" if "ledger" in settings.DATABASES else None,
+            help="Database alias of a Postgres ledger (P2E_STORAGE=postgres); "
+            "defaults to 'ledger' when P2E_LEDGER_DATABASE_URL is set, else --ledger is used",
+        )
+        parser.add_argument(
+            "--buckets",
+            type=int,
+            default=1024,
+            help="Number of hash buckets to compare before drilling into users",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Rows fetched per round trip on either side",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report divergent users without writing adjustments",
+        )
+
+    def handle(self, *args, **options):
+        buckets = options["buckets"]
+        chunk_size = options["chunk_size"]
+        if buckets < 1 or chunk_size < 1:
+            raise CommandError("--buckets and --chunk-size must be positive")
+
+        alias = options["ledger_database"]
+        if alias:
+            if alias not in settings.DATABASES:
+                raise CommandError(
+                    f"Unknown database alias {alias!r} (set P2E_LEDGER_DATABASE_URL)"
+                )
+            ledger = connections[alias]
+        else:
+            try:
+                ledger = sqlite3.connect(f"file:{options['ledger']}?mode=ro", uri=True)
+            except sqlite3.Error as e:
+                raise CommandError(f"Cannot open ledger {options['ledger']}: {e}")
+
+        try:
+            # Pass 1: one digest per bucket on each side. Queued outbox rows are
+            # read in the same snapshot as points_log and left out of its totals.
+            with self.snapshot(ledger, alias):
+                pending = self.outbox(ledger, chunk_size)
+                ledger_digests = bucket_digests(
+                    self.expected_totals(self.ledger_totals(ledger, chunk_size), pending),
+                    buckets,
+                )
+            backend_digests = bucket_digests(self.backend_totals(chunk_size), buckets)
+            divergent = [
+                b for b in range(buckets) if ledger_digests[b] != backend_digests[b]
+            ]
+            self.stdout.write(f"{len(divergent)}/{buckets} buckets diverge")
+            if not divergent:
+                self.stdout.write(self.style.SUCCESS("Ledger and backend are consistent"))
+                return
+
+            # Pass 2: per-user totals for divergent buckets only
+            wanted = set(divergent)
+
+            def in_divergent_bucket(discord_id):
+                return user_bucket(discord_id, buckets) in wanted
+
+            with self.snapshot(ledger, alias):
+                pending = self.outbox(ledger, chunk_size)
+                failed = self.outbox(ledger, chunk_size, table="backend_outbox_failed")
+                last_id = self.last_ledger_id(ledger)
+                if alias:
+                    ledger_rows = (
+                        row
+                        for row in self.ledger_totals(ledger, chunk_size)
+                        if in_divergent_bucket(row[0])
+                    )
+                else:
+                    # SQLite filters while grouping, so only divergent users are summed
+                    ledger.create_function(
+                        "p2e_divergent", 1, in_divergent_bucket, deterministic=True
+                    )
+                    ledger_rows = self.ledger_totals(ledger, chunk_size, only_divergent=True)
+                ledger_users = dict(self.expected_totals(ledger_rows, pending))
+            backend_users = dict(
+                row for row in self.backend_totals(chunk_size) if in_divergent_bucket(row[0])
+            )
+            # The bot keeps awarding and syncing meanwhile: users whose queued rows
+            # were synced or who earned more since the snapshot can't be compared
+            in_flight = self.changed_users(ledger, pending, last_id, chunk_size)
+        finally:
+            ledger.close()
+
+        adjustments = []
+        skipped = 0
+        for discord_id in ledger_users.keys() | backend_users.keys():
+            if discord_id in in_flight:
+                skipped += 1
+                continue
+            delta = ledger_users.get(discord_id, 0) - backend_users.get(discord_id, 0)
+            if delta:
+                adjustments.append((discord_id, delta))
+
+        for discord_id, delta in sorted(adjustments)[:20]:
+            self.stdout.write(f"  {discord_id}: {delta:+d}")
+        if len(adjustments) > 20:
+            self.stdout.write(f"  ... and {len(adjustments) - 20} more")
+        if skipped:
+            self.stdout.write(f"{skipped} users changed while comparing; run again to check them")
+        dead = {
+            discord_id: failed[discord_id]
+            for discord_id, _ in adjustments
+            if discord_id in failed
+        }
+        if dead:
+            rows = sum(len(ids) for _, ids in dead.values())
+            points = sum(total for total, _ in dead.values())
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{len(dead)} of these users have {rows} rows ({points:+d} points) in "
+                    "backend_outbox_failed; repairing them covers those rows, so don't replay them"
+                )
+            )
+
+        if options["dry_run"]:
+            self.stdout.write(f"{len(adjustments)} users would be repaired (dry run)")
+            return
+
+        now = timezone.now()
+        for start in range(0, len(adjustments), chunk_size):
+            record_events(
+                [
+                    {
+                        "discord_id": discord_id,
+                        "points": delta,
+                        "action": RECONCILE_ACTION,
+                        "occurred_at": now,
+                    }
+                    for discord_id, delta in adjustments[start : start + chunk_size]
+                ]
+            )
+        if adjustments:
+            invalidate_reads()
+        self.stdout.write(self.style.SUCCESS(f"Repaired {len(adjustments)} users"))
+
+    def ledger_totals(self, conn, chunk_size, only_divergent=False):
+        """Yield ``(user_id, total)`` from points_log, streamed in chunks.
+
+        ``conn`` is the SQLite ledger or a Django connection to a Postgres
+        one; ``only_divergent`` needs the SQLite ``p2e_divergent`` function.
+        """
+        sql = "SELECT user_id, SUM(points) FROM points_log"
+        if only_divergent:
+            sql += " WHERE p2e_divergent(user_id)"
+        sql += " GROUP BY user_id"
+
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for user_id, total in rows:
+                yield str(user_id), total or 0
+
+    @contextmanager
+    def snapshot(self, ledger, alias):
+        """Run the enclosed ledger reads against one consistent snapshot."""
+        if alias:
+            with transaction.atomic(using=alias):
+                with ledger.cursor() as cursor:
+                    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                yield
+        else:
+            # A WAL read transaction sees one snapshot until it ends
+            ledger.execute("BEGIN")
+            try:
+                yield
+            finally:
+                ledger.rollback()
+
+    def outbox(self, conn, chunk_size, table="backend_outbox"):
+        """``{user_id: (points, {row id})}`` for the rows queued in an outbox table."""
+        rows = {}
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT user_id, id, points FROM {table}")
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            for user_id, row_id, points in chunk:
+                total, ids = rows.get(str(user_id), (0, set()))
+                ids.add(row_id)
+                rows[str(user_id)] = (total + points, ids)
+        return rows
+
+    def expected_totals(self, ledger_rows, pending):
+        """``(user_id, total)`` the backend should have: ledger totals minus queued rows."""
+        for user_id, total in ledger_rows:
+            yield user_id, total - pending.get(user_id, (0, ()))[0]
+
+    def last_ledger_id(self, conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(id) FROM points_log")
+        return cursor.fetchone()[0] or 0
+
+    def changed_users(self, conn, pending, last_id, chunk_size):
+        """Users with queued rows that have since left the outbox, or ledger rows after ``last_id``."""
+        still_queued = set()
+        for _, ids in self.outbox(conn, chunk_size).values():
+            still_queued |= ids
+        changed = {user_id for user_id, (_, ids) in pending.items() if not ids <= still_queued}
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT DISTINCT user_id FROM points_log WHERE id > {int(last_id)}")
+        changed.update(str(user_id) for (user_id,) in cursor.fetchall())
+        return changed
+
+    def backend_totals(self, chunk_size):
+        """Yield ``(discord_id, total_points)`` from the backend, streamed in chunks."""
+        return DiscordUser.objects.values_list("discord_id", "total_points").iterator(
+            chunk_size=chunk_size
+        )
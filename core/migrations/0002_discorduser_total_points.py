@@ -0,0 +1,37 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    DiscordUser = apps.get_model("core", "DiscordUser")
+    PointEvent = apps.get_model("core", "PointEvent")
+    totals = (
+        PointEvent.objects.filter(user=OuterRef("pk"))
+        .values("user")
+        .annotate(total=Sum("points"))
+        .values("total")
+    )
+    DiscordUser.objects.update(total_points=Coalesce(Subquery(totals), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="discorduser",
+            name="total_points",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="discorduser",
+            index=models.Index(
+                fields=["-total_points", "id"], name="core_user_leaderboard_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
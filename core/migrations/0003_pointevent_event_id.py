@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_discorduser_total_points"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pointevent",
+            name="event_id",
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
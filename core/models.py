@@ -1,3 +1,43 @@
 from django.db import models
 
-# Create your models here.
+
+class DiscordUser(models.Model):
+    """A Discord member, keyed by their snowflake ID."""
+
+    discord_id = models.CharField(max_length=32, unique=True)
+    display_name = models.CharField(max_length=100, blank=True)
+    username = models.CharField(max_length=100, blank=True, null=True)
+    joined_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized sum of point_events, maintained on ingest
+    total_points = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-total_points", "id"], name="core_user_leaderboard_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.display_name or self.discord_id}"
+
+
+class PointEvent(models.Model):
+    """One point-earning action reported by the bot."""
+
+    user = models.ForeignKey(
+        DiscordUser, on_delete=models.CASCADE, related_name="point_events"
+    )
+    points = models.IntegerField()
+    action = models.CharField(max_length=255)
+    occurred_at = models.DateTimeField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    # The bot's outbox row ("<storage>:<id>"), so a retried sync is recorded once
+    event_id = models.CharField(max_length=64, unique=True, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "occurred_at"], name="core_event_user_time_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.action} ({self.points:+d})"
@@ -1,3 +1,136 @@
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from core.ingest import record_events
+from core.management.commands.reconcile import Command, bucket_digests
+from core.models import DiscordUser, PointEvent
+
+LEDGER_SCHEMA = """
+CREATE TABLE points_log (id INTEGER PRIMARY KEY, user_id INTEGER, action TEXT, points INTEGER);
+CREATE TABLE backend_outbox (id INTEGER PRIMARY KEY, user_id INTEGER, action TEXT, points INTEGER);
+CREATE TABLE backend_outbox_failed (id INTEGER PRIMARY KEY, user_id INTEGER, action TEXT, points INTEGER);
+"""
+
+
+def event(discord_id, points, event_id=None):
+    return {
+        "discord_id": discord_id,
+        "points": points,
+        "action": "Message sent",
+        "occurred_at": timezone.now(),
+        "event_id": event_id,
+    }
+
+
+class IngestTests(TestCase):
+    def total(self, discord_id):
+        return DiscordUser.objects.get(discord_id=discord_id).total_points
+
+    def test_retried_events_count_once(self):
+        batch = [event("1", 10, "sqlite:1"), event("1", 5, "sqlite:2"), event("2", 3, "sqlite:3")]
+        record_events(batch)
+        # A retry after a lost response, overlapping a new event and repeating one inside the batch
+        record_events(batch[1:] + [event("1", 7, "sqlite:4"), event("1", 7, "sqlite:4")])
+        self.assertEqual((self.total("1"), self.total("2")), (22, 3))
+        self.assertEqual(PointEvent.objects.count(), 4)
+
+    def test_events_without_ids_always_count(self):
+        record_events([event("1", 10), event("1", 10)])
+        record_events([event("1", 10)])
+        self.assertEqual(self.total("1"), 30)
+
+    def test_bulk_endpoint_dedupes_on_event_id(self):
+        payload = {"events": [{"discord_id": "1", "points": 4, "action": "Message sent", "event_id": "sqlite:9"}]}
+        for _ in range(2):
+            response = self.client.post("/api/points/bulk/", payload, content_type="application/json")
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.total("1"), 4)
+        payload["events"][0]["event_id"] = "x" * 65
+        response = self.client.post("/api/points/bulk/", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class BucketDigestTests(TestCase):
+    def test_digests_ignore_order_and_zero_totals(self):
+        rows = [("1", 10), ("2", 20), ("3", 30)]
+        self.assertEqual(bucket_digests(rows, 8), bucket_digests(rows[::-1] + [("4", 0)], 8))
+        self.assertNotEqual(bucket_digests(rows, 8), bucket_digests([("1", 10), ("2", 21), ("3", 30)], 8))
+
+
+class ReconcileTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.ledger = os.path.join(tmp.name, "p2e.db")
+        conn = sqlite3.connect(self.ledger)
+        conn.executescript(LEDGER_SCHEMA)
+        conn.executemany(
+            "INSERT INTO points_log (user_id, action, points) VALUES (?, 'Message sent', ?)",
+            [(1, 10), (2, 10), (2, 5), (3, 7)],
+        )
+        # User 2's last award is still queued; user 3's sync was dead-lettered
+        conn.execute("INSERT INTO backend_outbox (id, user_id, action, points) VALUES (3, 2, 'Message sent', 5)")
+        conn.execute(
+            "INSERT INTO backend_outbox_failed (id, user_id, action, points) VALUES (4, 3, 'Message sent', 7)"
+        )
+        conn.commit()
+        conn.close()
+        for discord_id, total in [("1", 10), ("2", 10), ("4", 20)]:
+            DiscordUser.objects.create(discord_id=discord_id, total_points=total)
+
+    def reconcile(self, *args):
+        out = StringIO()
+        call_command("reconcile", "--ledger", self.ledger, "--buckets", "4", *args, stdout=out)
+        return out.getvalue()
+
+    def totals(self):
+        return dict(DiscordUser.objects.values_list("discord_id", "total_points"))
+
+    def test_repairs_only_users_that_drifted(self):
+        out = self.reconcile("--dry-run")
+        self.assertIn("3: +7", out)
+        self.assertIn("4: -20", out)
+        self.assertNotIn("2: ", out)
+        self.assertIn("1 rows (+7 points) in backend_outbox_failed", out)
+        self.assertEqual(self.totals(), {"1": 10, "2": 10, "4": 20})
+
+        self.assertIn("Repaired 2 users", self.reconcile())
+        self.assertEqual(self.totals(), {"1": 10, "2": 10, "3": 7, "4": 0})
+        self.assertIn("Ledger and backend are consistent", self.reconcile())
+
+    def test_drained_queue_counts_in_full(self):
+        DiscordUser.objects.filter(discord_id="2").update(total_points=0)
+        conn = sqlite3.connect(self.ledger)
+        conn.execute("DELETE FROM backend_outbox")
+        conn.commit()
+        conn.close()
+        # With the queue drained, user 2 is owed the queued 5 as well
+        self.assertIn("2: +15", self.reconcile("--dry-run"))
+
+    def test_skips_users_synced_while_comparing(self):
+        read_backend = Command.backend_totals
+        calls = []
+
+        def sync_then_read(command, chunk_size):
+            calls.append(chunk_size)
+            if len(calls) == 2:
+                # The bot syncs user 2's queued row while pass 2 reads the backend
+                conn = sqlite3.connect(self.ledger)
+                conn.execute("DELETE FROM backend_outbox")
+                conn.commit()
+                conn.close()
+                DiscordUser.objects.filter(discord_id="2").update(total_points=15)
+            return read_backend(command, chunk_size)
 
-# Create your tests here.
+        with mock.patch.object(Command, "backend_totals", sync_then_read):
+            out = self.reconcile("--buckets", "1")
+        self.assertIn("1 users changed while comparing", out)
+        self.assertNotIn("2: ", out)
+        self.assertEqual(self.totals()["2"], 15)
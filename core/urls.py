@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path("users/register/", views.register_user, name="register-user"),
+    path("users/<str:discord_id>/add-points/", views.add_points, name="add-points"),
+    path("users/<str:discord_id>/points/", views.user_points, name="user-points"),
+    path("points/bulk/", views.bulk_add_points, name="bulk-add-points"),
+    path("leaderboard/", views.leaderboard, name="leaderboard"),
+]
@@ -1,3 +1,254 @@
-from django.shortcuts import render
+import json
+import time
+from datetime import timezone
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse
+from django.utils import timezone as dj_timezone
+from django.utils.dateparse import parse_datetime
+
+from .ingest import POINTS_VERSION_KEY, record_events
+from .models import DiscordUser
+
+# Upper bound on events accepted by a single bulk ingest request
+MAX_BULK_EVENTS = 1000
+
+# Leaderboard paging limits
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+READ_CACHE_TIMEOUT = 300
+
+
+class BadRequest(Exception):
+    """Raised while parsing a request body that cannot be ingested."""
+
+
+def api_endpoint(*methods):
+    """Mark an async view as a bot-facing JSON endpoint.
+
+    Django 4.2's ``require_http_methods``/``csrf_exempt`` wrap views in sync
+    functions, which would push our coroutines onto a thread, so the method
+    check and CSRF exemption are done here instead.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            try:
+                return await view(request, *args, **kwargs)
+            except BadRequest as e:
+                return JsonResponse({"error": str(e)}, status=400)
+
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
+
+
+def _read_json(request):
+    try:
+        payload = json.loads(request.body or b"{}")
+    except (ValueError, UnicodeDecodeError):
+        raise BadRequest("Request body must be valid JSON")
+    if not isinstance(payload, dict):
+        raise BadRequest("Request body must be a JSON object")
+    return payload
+
+
+def _parse_timestamp(value):
+    """Parse the bot's ISO timestamps, which are naive UTC."""
+    if not value:
+        return dj_timezone.now()
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        raise BadRequest(f"Invalid timestamp: {value}")
+    if dj_timezone.is_naive(parsed):
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _parse_event(data, discord_id=None):
+    discord_id = discord_id or str(data.get("discord_id") or "")
+    if not discord_id.isdigit():
+        raise BadRequest("discord_id must be a Discord snowflake")
+    try:
+        points = int(data["points"])
+    except (KeyError, TypeError, ValueError):
+        raise BadRequest("points must be an integer")
+    event_id = data.get("event_id")
+    if event_id is not None and (not isinstance(event_id, (str, int)) or len(str(event_id)) > 64):
+        raise BadRequest("event_id must be a string of at most 64 characters")
+    return {
+        "discord_id": discord_id,
+        "points": points,
+        "action": str(data.get("action") or "")[:255],
+        "occurred_at": _parse_timestamp(data.get("timestamp")),
+        "event_id": str(event_id) if event_id is not None else None,
+    }
+
+
+async def _points_version():
+    """Current points version, seeding it if the cache was cleared."""
+    version = await cache.aget(POINTS_VERSION_KEY)
+    if version is None:
+        await cache.aadd(POINTS_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = await cache.aget(POINTS_VERSION_KEY)
+    return version
+
+
+async def _invalidate_reads():
+    """Invalidate every cached read response after an ingest."""
+    try:
+        await cache.aincr(POINTS_VERSION_KEY)
+    except ValueError:
+        await cache.aset(POINTS_VERSION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get("If-None-Match", "")
+    return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+
+async def _cached_json(request, key, build):
+    """Serve ``build()`` from the cache with a version-based ETag.
+
+    The ETag depends only on the points version, so a dashboard revalidating
+    an unchanged board gets a 304 without touching the cache body or the DB.
+    ``build()`` returns None for a missing resource, which is not cached.
+    """
+    version = await _points_version()
+    etag = f'W/"{key}-{version}"'
+    if _etag_matches(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        cache_key = f"p2e:{key}:{version}"
+        payload = await cache.aget(cache_key)
+        if payload is None:
+            payload = await build()
+            if payload is None:
+                return JsonResponse({"error": "Not found"}, status=404)
+            await cache.aset(cache_key, payload, timeout=READ_CACHE_TIMEOUT)
+        response = JsonResponse(payload)
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+_record_events = sync_to_async(record_events)
+
+
+@api_endpoint("POST")
+async def register_user(request):
+    """Register a Discord member; 409 if they already exist."""
+    data = _read_json(request)
+    discord_id = str(data.get("discord_id") or "")
+    if not discord_id.isdigit():
+        raise BadRequest("discord_id must be a Discord snowflake")
+
+    user, created = await DiscordUser.objects.aget_or_create(
+        discord_id=discord_id,
+        defaults={
+            "display_name": str(data.get("display_name") or "")[:100],
+            "username": data.get("username"),
+            "joined_at": _parse_timestamp(data.get("joined_at")),
+        },
+    )
+    status = 201 if created else 409
+    return JsonResponse({"discord_id": user.discord_id, "created": created}, status=status)
+
+
+@api_endpoint("POST")
+async def add_points(request, discord_id):
+    """Record a single point event for a user, creating the user if needed."""
+    event = _parse_event(_read_json(request), discord_id=discord_id)
+    await _record_events([event])
+    await _invalidate_reads()
+    return JsonResponse({"discord_id": event["discord_id"], "points_added": event["points"]})
+
+
+@api_endpoint("POST")
+async def bulk_add_points(request):
+    """Ingest a batch of point events in a single transaction.
+
+    Bot shards flush bursts here instead of issuing one request per award.
+    """
+    data = _read_json(request)
+    raw_events = data.get("events")
+    if not isinstance(raw_events, list) or not raw_events:
+        raise BadRequest("events must be a non-empty list")
+    if len(raw_events) > MAX_BULK_EVENTS:
+        raise BadRequest(f"At most {MAX_BULK_EVENTS} events per request")
+
+    events = [_parse_event(e) for e in raw_events if isinstance(e, dict)]
+    if len(events) != len(raw_events):
+        raise BadRequest("Each event must be a JSON object")
+
+    users = await _record_events(events)
+    await _invalidate_reads()
+    return JsonResponse({"accepted": len(events), "users": users})
+
+
+@api_endpoint("GET")
+async def user_points(request, discord_id):
+    """Return a user's point total and leaderboard rank."""
+
+    async def build():
+        try:
+            user = await DiscordUser.objects.aget(discord_id=discord_id)
+        except DiscordUser.DoesNotExist:
+            return None
+        ahead = await DiscordUser.objects.filter(total_points__gt=user.total_points).acount()
+        return {
+            "discord_id": user.discord_id,
+            "display_name": user.display_name,
+            "total_points": user.total_points,
+            "rank": ahead + 1,
+        }
+
+    return await _cached_json(request, f"user-{discord_id}", build)
+
+
+@api_endpoint("GET")
+async def leaderboard(request):
+    """Ranked users by total points, paginated with ``?page=&page_size=``."""
+    try:
+        page = max(1, int(request.GET.get("page", 1)))
+        page_size = min(MAX_PAGE_SIZE, max(1, int(request.GET.get("page_size", DEFAULT_PAGE_SIZE))))
+    except ValueError:
+        raise BadRequest("page and page_size must be integers")
+
+    async def build():
+        offset = (page - 1) * page_size
+        total_users = await DiscordUser.objects.acount()
+        rows = DiscordUser.objects.order_by("-total_points", "id").values(
+            "discord_id", "display_name", "total_points"
+        )[offset : offset + page_size]
+        rows = [row async for row in rows]
+
+        # Competition ranking, as in user_points: 1 + users with strictly more
+        # points, so ties share a rank. Rows are ordered by points, so only the
+        # first row of the page needs a count; after it a row either ties the
+        # previous one or its rank is its position.
+        results = []
+        for position, row in enumerate(rows, start=offset + 1):
+            if not results:
+                rank = 1 + await DiscordUser.objects.filter(
+                    total_points__gt=row["total_points"]
+                ).acount()
+            elif row["total_points"] != results[-1]["total_points"]:
+                rank = position
+            results.append({"rank": rank, **row})
+        return {
+            "page": page,
+            "page_size": page_size,
+            "total_users": total_users,
+            "results": results,
+        }
+
+    return await _cached_json(request, f"leaderboard-{page}-{page_size}", build)
 
-# Create your views here.
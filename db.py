@@ -1,24 +1,429 @@
+import os
 import sqlite3
+import urllib.request
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date
+
+DB_PATH = os.getenv('P2E_DB_PATH', 'p2e.db')
+
+# How long a writer waits for the SQLite write lock before giving up
+BUSY_TIMEOUT_SECONDS = 10
+
+# Rows ANALYZE samples per index at startup (see setup)
+ANALYSIS_LIMIT = 1000
+
+# Milestone definitions for incentives
+MILESTONES = {
+    50: "Azure Certification",
+    75: "Resume Review",
+    100: "Hackathon"
+}
+
+# Result of a ledger write: the user's new balance, any milestones it unlocked
+# and the source keys it credited
+Award = namedtuple('Award', ['user_id', 'points', 'action', 'total_points', 'milestones', 'source_keys'],
+                   defaults=((),))
+
+# The high-volume tables store Discord snowflakes as INTEGER and times as
+# epoch seconds (points_daily.day as days since the epoch), so rows and
+# indexes are smaller and range filters compare integers. Callers still
+# pass IDs as strings: INTEGER affinity converts them on insert and in
+# comparisons, and non-numeric IDs (test data) are simply kept as TEXT.
+# Reads that hand IDs back to the bot cast them to TEXT.
+NOW_EPOCH = "CAST(strftime('%s', 'now') AS INTEGER)"
+EPOCH_DATE = date(1970, 1, 1)
+
+COMPACT_TABLES = {
+    'users': '''CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        points INTEGER DEFAULT 0
+    ) WITHOUT ROWID''',
+    'points_log': f'''CREATE TABLE IF NOT EXISTS points_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        action TEXT,
+        points INTEGER,
+        timestamp INTEGER DEFAULT ({NOW_EPOCH}),
+        source_key TEXT
+    )''',
+    'points_daily': '''CREATE TABLE IF NOT EXISTS points_daily (
+        user_id INTEGER,
+        day INTEGER,
+        points INTEGER DEFAULT 0,
+        PRIMARY KEY (user_id, day)
+    ) WITHOUT ROWID''',
+    'season_points': '''CREATE TABLE IF NOT EXISTS season_points (
+        user_id INTEGER PRIMARY KEY,
+        points INTEGER DEFAULT 0
+    ) WITHOUT ROWID''',
+    'reaction_events': f'''CREATE TABLE IF NOT EXISTS reaction_events (
+        message_id INTEGER,
+        reactor_id INTEGER,
+        author_id INTEGER,
+        created_at INTEGER DEFAULT ({NOW_EPOCH}),
+        PRIMARY KEY (message_id, reactor_id)
+    ) WITHOUT ROWID''',
+}
+
+# How each compact table is filled from its TEXT/DATETIME predecessor
+_LEGACY_COPIES = {
+    'users': ('user_id, points', 'user_id, points'),
+    'points_log': ('id, user_id, action, points, timestamp, source_key',
+                   "id, user_id, action, points, CAST(strftime('%s', timestamp) AS INTEGER), {source_key}"),
+    'points_daily': ('user_id, day, points', "user_id, CAST(julianday(day) - 2440587.5 AS INTEGER), points"),
+    'season_points': ('user_id, points', 'user_id, points'),
+    'reaction_events': ('message_id, reactor_id, author_id, created_at',
+                        "message_id, reactor_id, author_id, CAST(strftime('%s', created_at) AS INTEGER)"),
+}
+
+def epoch_day(day):
+    """Days since 1970-01-01 for a ``YYYY-MM-DD`` string"""
+    return (date.fromisoformat(day) - EPOCH_DATE).days
+
+def compact_legacy_tables(c):
+    """Rebuild tables created with TEXT IDs and DATETIME strings in the compact layout.
+
+    Each table is renamed, recreated from COMPACT_TABLES and copied across
+    with its IDs and timestamps converted; dropping the old table drops its
+    indexes, which setup() recreates. Returns the names of the tables rebuilt.
+    """
+    rebuilt = []
+    for table, ddl in COMPACT_TABLES.items():
+        c.execute(f'PRAGMA table_info({table})')
+        columns = {row[1]: row[2].upper() for row in c.fetchall()}
+        if not columns or columns.get('user_id', columns.get('reactor_id')) != 'TEXT':
+            continue  # Not created yet, or already compact
+        insert, select = _LEGACY_COPIES[table]
+        select = select.format(source_key='source_key' if 'source_key' in columns else 'NULL')
+        c.execute(f'ALTER TABLE {table} RENAME TO {table}_legacy')
+        c.execute(ddl)
+        c.execute(f'INSERT INTO {table} ({insert}) SELECT {select} FROM {table}_legacy')
+        c.execute(f'DROP TABLE {table}_legacy')
+        rebuilt.append(table)
+    return rebuilt
 
 def connect():
-    return sqlite3.connect('p2e.db')
+    return sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT_SECONDS)
+
+class ReadOnlyConnection(sqlite3.Connection):
+    """Connection for reports and inspection that can never write.
+
+    Opened with a ``mode=ro`` URI, so it never takes the write lock, and with
+    ``PRAGMA query_only`` as a second guard. Under WAL a long report reads
+    one snapshot while the bot keeps committing awards.
+    """
+
+    def __init__(self, path=None, timeout=BUSY_TIMEOUT_SECONDS):
+        uri = f'file:{urllib.request.pathname2url(os.path.abspath(path or DB_PATH))}?mode=ro'
+        super().__init__(uri, timeout=timeout, uri=True)
+        self.execute('PRAGMA query_only = ON')
+
+def connect_readonly(path=None):
+    return ReadOnlyConnection(path)
+
+@contextmanager
+def transaction():
+    """Unit of work: yields a cursor on one connection inside BEGIN IMMEDIATE.
+
+    Everything written through the cursor commits together when the block
+    exits, or rolls back if it raises. Taking the write lock up front means
+    a unit of work never deadlocks against another writer halfway through.
+    """
+    conn = connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        yield conn.cursor()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def award_points(c, user_id, pts, action, source_key=None):
+    """Write one award inside a unit of work.
+
+    Updates the user's balance, appends to points_log, queues the award for
+    backend sync in backend_outbox and records any milestones crossed by this
+    award. ``source_key`` identifies the Discord event behind the award
+    (e.g. ``msg:<message id>``); an award whose key is already in the ledger
+    is ignored and None is returned. Otherwise returns an Award; side effects
+    (DMs, HTTP) are left to the caller once the transaction has committed.
+    """
+    c.execute('INSERT OR IGNORE INTO points_log(user_id, action, points, source_key) VALUES (?, ?, ?, ?)',
+              (user_id, action, pts, source_key))
+    if not c.rowcount:
+        return None
+    c.execute('INSERT OR IGNORE INTO users (user_id, points) VALUES (?, 0)', (user_id,))
+    c.execute('UPDATE users SET points = points + ? WHERE user_id = ?', (pts, user_id))
+    c.execute('INSERT INTO backend_outbox(user_id, action, points) VALUES (?, ?, ?)', (user_id, action, pts))
+    add_to_buckets(c, [(user_id, pts)])
+    c.execute('SELECT points FROM users WHERE user_id = ?', (user_id,))
+    total_points = c.fetchone()[0]
+    milestones = unlock_milestones(c, user_id, total_points, total_points - pts)
+    return Award(user_id, pts, action, total_points, milestones, (source_key,) if source_key else ())
+
+def award_many(c, awards):
+    """Bulk-ingest ``(user_id, pts, action, source_key)`` tuples in a unit of work.
+
+    Awards whose source key is already in the ledger are skipped, so replays
+    and backfills are safe to repeat. Balance updates are applied once per
+    user. Returns one Award per credited user, carrying the summed points,
+    the user's last action and the source keys credited.
+    """
+    deltas = {}
+    actions = {}
+    keys = {}
+    outbox = []
+    for user_id, pts, action, source_key in awards:
+        c.execute('INSERT OR IGNORE INTO points_log(user_id, action, points, source_key) VALUES (?, ?, ?, ?)',
+                  (user_id, action, pts, source_key))
+        if c.rowcount:
+            deltas[user_id] = deltas.get(user_id, 0) + pts
+            actions[user_id] = action
+            keys.setdefault(user_id, []).append(source_key)
+            outbox.append((user_id, action, pts))
+    if not deltas:
+        return []
+
+    c.executemany('INSERT OR IGNORE INTO users (user_id, points) VALUES (?, 0)', [(u,) for u in deltas])
+    c.executemany('UPDATE users SET points = points + ? WHERE user_id = ?', [(d, u) for u, d in deltas.items()])
+    c.executemany('INSERT INTO backend_outbox(user_id, action, points) VALUES (?, ?, ?)', outbox)
+    add_to_buckets(c, deltas.items())
+
+    credited = []
+    for user_id, delta in deltas.items():
+        c.execute('SELECT points FROM users WHERE user_id = ?', (user_id,))
+        total_points = c.fetchone()[0]
+        milestones = unlock_milestones(c, user_id, total_points, total_points - delta)
+        credited.append(Award(user_id, delta, actions[user_id], total_points, milestones, tuple(keys[user_id])))
+    return credited
+
+def add_to_buckets(c, deltas):
+    """Add ``(user_id, points)`` deltas to today's and the season's counters."""
+    deltas = list(deltas)
+    c.executemany(f'''INSERT INTO points_daily (user_id, day, points) VALUES (?, {NOW_EPOCH} / 86400, ?)
+                      ON CONFLICT(user_id, day) DO UPDATE SET points = points + excluded.points''', deltas)
+    c.executemany('''INSERT INTO season_points (user_id, points) VALUES (?, ?)
+                     ON CONFLICT(user_id) DO UPDATE SET points = points + excluded.points''', deltas)
+
+def top_since(day, limit, offset=0):
+    """``(user_id, points)`` ranked by points earned on or after ``day`` (YYYY-MM-DD, UTC)."""
+    conn = connect_readonly()
+    c = conn.cursor()
+    day = epoch_day(day)
+    c.execute('''SELECT CAST(user_id AS TEXT), SUM(points) AS earned FROM points_daily WHERE day >= ?
+                 GROUP BY user_id HAVING earned > 0 ORDER BY earned DESC, user_id LIMIT ? OFFSET ?''',
+              (day, limit, offset))
+    rows = c.fetchall()
+    c.execute('''SELECT COUNT(*) FROM (SELECT 1 FROM points_daily WHERE day >= ?
+                 GROUP BY user_id HAVING SUM(points) > 0)''', (day,))
+    total = c.fetchone()[0]
+    conn.close()
+    return rows, total
+
+def top_season(limit, offset=0):
+    """The current season's name and ``(user_id, points)`` standings."""
+    conn = connect_readonly()
+    c = conn.cursor()
+    c.execute('SELECT name FROM seasons WHERE ended_at IS NULL ORDER BY id DESC LIMIT 1')
+    row = c.fetchone()
+    c.execute('''SELECT CAST(user_id AS TEXT), points FROM season_points WHERE points > 0
+                 ORDER BY points DESC, user_id LIMIT ? OFFSET ?''', (limit, offset))
+    rows = c.fetchall()
+    c.execute('SELECT COUNT(*) FROM season_points WHERE points > 0')
+    total = c.fetchone()[0]
+    conn.close()
+    return (row[0] if row else None), rows, total
+
+def rollover_season(name):
+    """Archive the current season's standings and start a new, empty season.
+
+    The archive and reset are single set-based statements, so the cost does
+    not depend on how the standings are read. Returns the archived season's
+    name and how many users it ranked.
+    """
+    with transaction() as c:
+        c.execute('SELECT id, name FROM seasons WHERE ended_at IS NULL ORDER BY id DESC LIMIT 1')
+        current = c.fetchone()
+        archived = 0
+        if current:
+            c.execute('''INSERT INTO season_standings (season_id, user_id, points)
+                         SELECT ?, user_id, points FROM season_points WHERE points != 0''', (current[0],))
+            archived = c.rowcount
+            c.execute("UPDATE seasons SET ended_at = datetime('now') WHERE id = ?", (current[0],))
+        c.execute('DELETE FROM season_points')
+        c.execute('INSERT INTO seasons (name) VALUES (?)', (name,))
+    return (current[1] if current else None), archived
+
+def unlock_milestones(c, user_id, total_points, previous_points=0):
+    """Record milestones reached between ``previous_points`` and ``total_points``.
+
+    Returns ``(points_required, milestone_name)`` for each newly unlocked one.
+    """
+    unlocked = []
+    for points_required, milestone_name in sorted(MILESTONES.items()):
+        if previous_points < points_required <= total_points:
+            c.execute('INSERT OR IGNORE INTO milestone_achievements (user_id, milestone_name, points_required) VALUES (?, ?, ?)',
+                      (user_id, milestone_name, points_required))
+            if c.rowcount:
+                unlocked.append((points_required, milestone_name))
+    return unlocked
+
+def fetch_outbox(limit):
+    """Oldest queued backend syncs as ``(id, user_id, action, points, created_at)``."""
+    conn = connect()
+    c = conn.cursor()
+    c.execute('SELECT id, user_id, action, points, created_at FROM backend_outbox ORDER BY id LIMIT ?', (limit,))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+def ack_outbox(outbox_ids):
+    """Remove synced rows from the outbox."""
+    with transaction() as c:
+        c.executemany('DELETE FROM backend_outbox WHERE id = ?', [(i,) for i in outbox_ids])
+
+def _fail_outbox(c, outbox_ids, error, min_attempts=0):
+    """Move outbox rows with at least ``min_attempts`` attempts to backend_outbox_failed"""
+    placeholders = ','.join('?' * len(outbox_ids))
+    where = f'id IN ({placeholders}) AND attempts >= ?'
+    params = (*outbox_ids, min_attempts)
+    c.execute(f'''INSERT OR REPLACE INTO backend_outbox_failed (id, user_id, action, points, created_at, attempts, error)
+                  SELECT id, user_id, action, points, created_at, attempts, ? FROM backend_outbox WHERE {where}''',
+              (error, *params))
+    c.execute(f'DELETE FROM backend_outbox WHERE {where}', params)
+    return c.rowcount
+
+def retry_outbox(outbox_ids, max_attempts):
+    """Count a failed sync attempt against queued rows.
+
+    Rows that have now failed ``max_attempts`` times are moved to
+    backend_outbox_failed; returns how many.
+    """
+    with transaction() as c:
+        c.executemany('UPDATE backend_outbox SET attempts = attempts + 1 WHERE id = ?', [(i,) for i in outbox_ids])
+        return _fail_outbox(c, outbox_ids, f'gave up after {max_attempts} attempts', max_attempts)
+
+def fail_outbox(outbox_ids, error):
+    """Move rows the backend rejected to backend_outbox_failed so the rest can sync."""
+    with transaction() as c:
+        return _fail_outbox(c, outbox_ids, error)
+
+def log_suspicious(rows):
+    """Batch-insert ``(user_id, activity_type, details, timestamp)`` rows."""
+    with transaction() as c:
+        c.executemany('INSERT INTO suspicious_activity (user_id, activity_type, details, timestamp) VALUES (?, ?, ?, ?)', rows)
+
+def record_reactions(c, rows):
+    """Insert ``(reactor_id, author_id, message_id)`` edges, one per reactor per message."""
+    c.executemany('''INSERT OR IGNORE INTO reaction_events (reactor_id, author_id, message_id)
+                     VALUES (?, ?, ?)''', rows)
+
+def save_activity(rows):
+    """Upsert ``(user_id, last_activity, streak_day, streak_days)`` rows into user_status."""
+    with transaction() as c:
+        c.executemany('''INSERT INTO user_status (user_id, last_activity, streak_day, streak_days) VALUES (?, ?, ?, ?)
+                         ON CONFLICT(user_id) DO UPDATE SET last_activity = excluded.last_activity,
+                         streak_day = excluded.streak_day, streak_days = excluded.streak_days''', rows)
+
+def inactive_users(days, limit):
+    """Users whose last activity is more than ``days`` days ago, longest idle first.
+
+    Returns ``(rows, total)``; both queries are range scans on
+    idx_user_status_last_activity.
+    """
+    conn = connect_readonly()
+    c = conn.cursor()
+    cutoff = f'-{int(days)} days'
+    c.execute('''SELECT user_id, last_activity FROM user_status
+                 WHERE last_activity < datetime('now', ?) ORDER BY last_activity LIMIT ?''', (cutoff, limit))
+    rows = c.fetchall()
+    c.execute("SELECT COUNT(*) FROM user_status WHERE last_activity < datetime('now', ?)", (cutoff,))
+    total = c.fetchone()[0]
+    conn.close()
+    return rows, total
+
+def record_resume(c, user_id, filename, doc):
+    """Record a parsed resume upload inside a unit of work.
+
+    Returns ``(owner, first)``: ``owner`` is the user ID that already
+    uploaded the same content (nothing is written in that case), else None;
+    ``first`` is whether this is the user's first recorded resume.
+    """
+    c.execute('SELECT user_id FROM resume_uploads WHERE content_hash = ?', (doc['content_hash'],))
+    row = c.fetchone()
+    if row:
+        return row[0], False
+    c.execute('SELECT 1 FROM resume_uploads WHERE user_id = ? LIMIT 1', (user_id,))
+    first = c.fetchone() is None
+    c.execute('''INSERT INTO resume_uploads (user_id, filename, file_hash, content_hash, pages, text_chars)
+                 VALUES (?, ?, ?, ?, ?, ?)''',
+              (user_id, filename, doc['file_hash'], doc['content_hash'], doc['pages'], doc['text_chars']))
+    return None, first
+
+def load_open_events():
+    """Open event sessions and their check-ins so far.
+
+    Returns ``[(id, code, name, guild_id, voice_channel_id, closes_at, {user_id: source})]``.
+    """
+    conn = connect()
+    c = conn.cursor()
+    c.execute('''SELECT id, code, name, guild_id, voice_channel_id, closes_at
+                 FROM event_sessions WHERE status = 'open' ORDER BY id''')
+    sessions = [list(row) + [{}] for row in c.fetchall()]
+    for session in sessions:
+        c.execute('SELECT user_id, source FROM event_attendance WHERE session_id = ?', (session[0],))
+        session[6] = dict(c.fetchall())
+    conn.close()
+    return sessions
+
+def save_attendance(c, session_id, rows):
+    """Insert ``(user_id, source, checked_in_at)`` check-ins, keeping the first per user."""
+    c.executemany('''INSERT OR IGNORE INTO event_attendance (session_id, user_id, source, checked_in_at)
+                     VALUES (?, ?, ?, ?)''', [(session_id, *row) for row in rows])
+
+def load_checkpoints():
+    """Last processed message ID per channel as ``{channel_id: message_id}``."""
+    conn = connect()
+    c = conn.cursor()
+    c.execute('SELECT channel_id, last_message_id FROM channel_checkpoints')
+    checkpoints = {int(channel_id): message_id for channel_id, message_id in c.fetchall()}
+    conn.close()
+    return checkpoints
+
+def save_checkpoints(checkpoints):
+    """Upsert channel checkpoints, never moving one backwards."""
+    with transaction() as c:
+        c.executemany('''INSERT INTO channel_checkpoints (channel_id, last_message_id) VALUES (?, ?)
+                         ON CONFLICT(channel_id) DO UPDATE
+                         SET last_message_id = MAX(last_message_id, excluded.last_message_id)''',
+                      [(str(channel_id), message_id) for channel_id, message_id in checkpoints.items()])
 
 def setup():
     conn = connect()
     c = conn.cursor()
+    # Readers never block the writer (and vice versa) in WAL mode
+    c.execute('PRAGMA journal_mode=WAL')
+    # Databases from before the compact layout are converted first, so every
+    # statement below sees integer IDs and epoch times
+    c.execute('BEGIN')
+    compact_legacy_tables(c)
     # Users points table
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-        user_id TEXT PRIMARY KEY,
-        points INTEGER DEFAULT 0
-    )''')
+    c.execute(COMPACT_TABLES['users'])
     # Log each point-earning action
-    c.execute('''CREATE TABLE IF NOT EXISTS points_log (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id TEXT,
-        action TEXT,
-        points INTEGER,
-        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    c.execute(COMPACT_TABLES['points_log'])
+    # Bumped by every write to a balance (awards, adjustments, resets,
+    # redemptions), so a snapshot of the totals can tell it is stale
+    c.execute('''CREATE TABLE IF NOT EXISTS ledger_seq (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        seq INTEGER NOT NULL
     )''')
+    c.execute('INSERT OR IGNORE INTO ledger_seq (id, seq) VALUES (1, 0)')
+    for name, event in (('insert', 'INSERT'), ('update', 'UPDATE OF points'), ('delete', 'DELETE')):
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS users_ledger_seq_{name} AFTER {event} ON users
+            BEGIN UPDATE ledger_seq SET seq = seq + 1; END''')
     # Rewards shop items
     c.execute('''CREATE TABLE IF NOT EXISTS rewards (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -40,14 +445,186 @@ def setup():
         details TEXT,
         timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
     )''')
+    # Who reacted to whose message, for anomaly detection
+    c.execute(COMPACT_TABLES['reaction_events'])
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_reaction_events_created
+        ON reaction_events(created_at)''')
     # User warnings and status
     c.execute('''CREATE TABLE IF NOT EXISTS user_status (
         user_id TEXT PRIMARY KEY,
         warnings INTEGER DEFAULT 0,
         points_suspended BOOLEAN DEFAULT FALSE,
         suspension_end DATETIME,
-        last_activity DATETIME DEFAULT CURRENT_TIMESTAMP
+        last_activity DATETIME DEFAULT CURRENT_TIMESTAMP,
+        streak_day TEXT,
+        streak_days INTEGER DEFAULT 0
+    )''')
+    # Streak columns were added later; seed last_activity from the ledger
+    # when they are, since it was never written before
+    c.execute('PRAGMA table_info(user_status)')
+    if 'streak_days' not in [row[1] for row in c.fetchall()]:
+        c.execute('ALTER TABLE user_status ADD COLUMN streak_day TEXT')
+        c.execute('ALTER TABLE user_status ADD COLUMN streak_days INTEGER DEFAULT 0')
+        c.execute('''INSERT INTO user_status (user_id, last_activity)
+                     SELECT CAST(user_id AS TEXT), datetime(MAX(timestamp), 'unixepoch') FROM points_log
+                     WHERE user_id IS NOT NULL GROUP BY user_id
+                     ON CONFLICT(user_id) DO UPDATE SET last_activity = excluded.last_activity''')
+    # Inactivity queries are range scans on last_activity
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_user_status_last_activity
+        ON user_status(last_activity)''')
+    # Milestones already unlocked per user
+    c.execute('''CREATE TABLE IF NOT EXISTS milestone_achievements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT,
+        milestone_name TEXT,
+        points_required INTEGER,
+        achieved_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, milestone_name)
     )''')
+    # Resource submissions awaiting admin review
+    c.execute('''CREATE TABLE IF NOT EXISTS resource_submissions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT,
+        resource_description TEXT,
+        status TEXT DEFAULT 'pending',
+        submitted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        reviewed_by TEXT,
+        reviewed_at DATETIME,
+        points_awarded INTEGER,
+        review_notes TEXT
+    )''')
+    # Review queue is read oldest-first by status, and per user by status
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_resource_submissions_queue
+        ON resource_submissions(status, submitted_at, id)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_resource_submissions_user
+        ON resource_submissions(user_id, status)''')
+    # Links picked up automatically in link channels, deduped by normalized URL
+    c.execute('PRAGMA table_info(resource_submissions)')
+    columns = [row[1] for row in c.fetchall()]
+    if 'url' not in columns:
+        c.execute('ALTER TABLE resource_submissions ADD COLUMN url TEXT')
+    if 'url_hash' not in columns:
+        c.execute('ALTER TABLE resource_submissions ADD COLUMN url_hash TEXT')
+    c.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_resource_submissions_url_hash
+        ON resource_submissions(url_hash) WHERE url_hash IS NOT NULL''')
+    # Link each award to the Discord event that caused it so replays are ignored
+    c.execute('PRAGMA table_info(points_log)')
+    if 'source_key' not in [row[1] for row in c.fetchall()]:
+        c.execute('ALTER TABLE points_log ADD COLUMN source_key TEXT')
+    # Time-window reads (activity log, anomaly scans) skip older history
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_points_log_timestamp
+        ON points_log(timestamp)''')
+    # A user's history (!pointshistory) is read newest-first
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_points_log_user
+        ON points_log(user_id, timestamp)''')
+    c.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_points_log_source_key
+        ON points_log(source_key) WHERE source_key IS NOT NULL''')
+    # Older databases created milestone_achievements without the UNIQUE
+    # constraint; dedupe and enforce it so unlocks can INSERT OR IGNORE
+    c.execute('''DELETE FROM milestone_achievements WHERE id NOT IN (
+        SELECT MIN(id) FROM milestone_achievements GROUP BY user_id, milestone_name
+    )''')
+    c.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_milestone_achievements_user
+        ON milestone_achievements(user_id, milestone_name)''')
+    # Last message seen per channel, used to backfill activity missed offline
+    c.execute('''CREATE TABLE IF NOT EXISTS channel_checkpoints (
+        channel_id TEXT PRIMARY KEY,
+        last_message_id INTEGER
+    )''')
+    # Awards waiting to be pushed to the backend API, written in the same
+    # transaction as the ledger entry
+    c.execute('''CREATE TABLE IF NOT EXISTS backend_outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT,
+        action TEXT,
+        points INTEGER,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        attempts INTEGER DEFAULT 0
+    )''')
+    # Outbox rows the backend rejected or that ran out of attempts, kept for
+    # inspection; `manage.py reconcile` repairs the backend totals
+    c.execute('''CREATE TABLE IF NOT EXISTS backend_outbox_failed (
+        id INTEGER PRIMARY KEY,
+        user_id TEXT,
+        action TEXT,
+        points INTEGER,
+        created_at DATETIME,
+        attempts INTEGER,
+        error TEXT,
+        failed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )''')
+    # Per-user daily rollup of points_log, written with each award, so
+    # windowed leaderboards sum at most one row per user per day
+    c.execute(COMPACT_TABLES['points_daily'])
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_points_daily_day
+        ON points_daily(day, user_id, points)''')
+    c.execute('SELECT EXISTS (SELECT 1 FROM points_daily)')
+    if not c.fetchone()[0]:
+        # First run on an existing ledger: roll up its history once
+        c.execute('''INSERT INTO points_daily (user_id, day, points)
+                     SELECT user_id, timestamp / 86400, SUM(points) FROM points_log
+                     WHERE user_id IS NOT NULL GROUP BY user_id, timestamp / 86400''')
+    # Verified resume uploads; the content hash catches the same resume
+    # being re-uploaded by anyone, and only a user's first upload earns points
+    c.execute('''CREATE TABLE IF NOT EXISTS resume_uploads (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT,
+        filename TEXT,
+        file_hash TEXT,
+        content_hash TEXT UNIQUE,
+        pages INTEGER,
+        text_chars INTEGER,
+        uploaded_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_resume_uploads_user
+        ON resume_uploads(user_id)''')
+    # Event check-in sessions opened by admins, and who attended each
+    c.execute('''CREATE TABLE IF NOT EXISTS event_sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        code TEXT,
+        name TEXT,
+        guild_id TEXT,
+        voice_channel_id TEXT,
+        opened_by TEXT,
+        opened_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        closes_at DATETIME,
+        closed_at DATETIME,
+        status TEXT DEFAULT 'open'
+    )''')
+    # A code can be reused once its previous session has closed
+    c.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_event_sessions_open_code
+        ON event_sessions(code) WHERE status = 'open'
+    ''')
+    c.execute('''CREATE TABLE IF NOT EXISTS event_attendance (
+        session_id INTEGER,
+        user_id TEXT,
+        source TEXT,
+        checked_in_at DATETIME,
+        PRIMARY KEY (session_id, user_id)
+    ) WITHOUT ROWID''')
+    # Seasons: running totals for the open season, standings archived at rollover
+    c.execute('''CREATE TABLE IF NOT EXISTS seasons (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        ended_at DATETIME
+    )''')
+    c.execute(COMPACT_TABLES['season_points'])
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_season_points_rank
+        ON season_points(points DESC, user_id)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS season_standings (
+        season_id INTEGER,
+        user_id TEXT,
+        points INTEGER,
+        PRIMARY KEY (season_id, user_id)
+    ) WITHOUT ROWID''')
+    c.execute('SELECT EXISTS (SELECT 1 FROM seasons)')
+    if not c.fetchone()[0]:
+        c.execute("INSERT INTO seasons (name) VALUES ('Season 1')")
+    # Refresh planner statistics; sqlite_stat1 also gives reports approximate
+    # row counts. The limit samples each index instead of scanning it.
+    c.execute(f'PRAGMA analysis_limit = {ANALYSIS_LIMIT}')
+    c.execute('ANALYZE')
     conn.commit()
     conn.close()
 
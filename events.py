@@ -0,0 +1,248 @@
+from discord.ext import commands
+from logconfig import logger
+import db
+import rules
+import discord
+import asyncio
+import typing
+from datetime import datetime, timedelta, timezone
+
+# How often check-ins are persisted (and expired sessions closed)
+ATTENDANCE_FLUSH_SECONDS = 15
+MAX_EVENT_MINUTES = 24 * 60
+
+class EventSession:
+    def __init__(self, session_id, code, name, guild_id, voice_channel_id, closes_at, attendees=None):
+        self.id = session_id
+        self.code = code
+        self.name = name
+        self.guild_id = int(guild_id)
+        self.voice_channel_id = int(voice_channel_id) if voice_channel_id else None
+        self.closes_at = closes_at if isinstance(closes_at, datetime) else datetime.fromisoformat(closes_at)
+        self.attendees = attendees or {}  # user_id -> source ('checkin' or 'voice')
+        self.pending = []  # (user_id, source, checked_in_at) not yet persisted
+
+    def check_in(self, user_id, source):
+        """Record attendance in memory; False if the user already checked in"""
+        if user_id in self.attendees:
+            return False
+        self.attendees[user_id] = source
+        self.pending.append((user_id, source, datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')))
+        return True
+
+class Events(commands.Cog):
+    """Event check-in sessions
+
+    Check-ins only touch an in-memory dict (and add a ✅ reaction), so
+    hundreds of attendees can check in within a minute. They are persisted
+    to event_attendance in small batches, and the whole session is credited
+    to the ledger in one transaction when it closes.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.sessions = {}  # code -> EventSession (open sessions only)
+        self.lock = asyncio.Lock()  # Serializes flushes and closes
+
+    async def cog_load(self):
+        for row in await asyncio.to_thread(db.load_open_events):
+            session = EventSession(*row)
+            self.sessions[session.code] = session
+        self.flush_task = asyncio.create_task(self.flush_loop())
+
+    async def cog_unload(self):
+        self.flush_task.cancel()
+        await self.flush_attendance()
+
+    async def flush_attendance(self):
+        async with self.lock:
+            batches = [(s.id, s.pending) for s in self.sessions.values() if s.pending]
+            if not batches:
+                return
+            for session in self.sessions.values():
+                session.pending = []
+
+            def write():
+                with db.transaction() as c:
+                    for session_id, rows in batches:
+                        db.save_attendance(c, session_id, rows)
+            try:
+                await asyncio.to_thread(write)
+            except Exception as e:
+                logger.error(f"Error saving event check-ins: {e}")
+                # Put them back for the next flush
+                by_id = {s.id: s for s in self.sessions.values()}
+                for session_id, rows in batches:
+                    if session_id in by_id:
+                        by_id[session_id].pending[:0] = rows
+
+    async def flush_loop(self):
+        while True:
+            await asyncio.sleep(ATTENDANCE_FLUSH_SECONDS)
+            await self.flush_attendance()
+            now = datetime.utcnow()
+            for session in [s for s in self.sessions.values() if s.closes_at <= now]:
+                try:
+                    await self.close_session(session)
+                except Exception as e:
+                    logger.error(f"Error closing event {session.code}: {e}")
+
+    def snapshot_roster(self, session):
+        """Check in everyone currently in the session's voice channel; returns how many were new"""
+        guild = self.bot.get_guild(session.guild_id)
+        channel = guild.get_channel(session.voice_channel_id) if guild and session.voice_channel_id else None
+        if channel is None:
+            return 0
+        return sum(
+            session.check_in(str(member.id), 'voice')
+            for member in channel.members if not member.bot
+        )
+
+    async def close_session(self, session):
+        """Snapshot the voice roster and credit every attendee in one transaction"""
+        async with self.lock:
+            if self.sessions.get(session.code) is not session:
+                return None
+            self.snapshot_roster(session)
+
+            guild = self.bot.get_guild(session.guild_id)
+            awards = []
+            for user_id in session.attendees:
+                if self.bot.cache.is_suspended(user_id):
+                    continue
+                member = guild.get_member(int(user_id)) if guild else None
+                role_ids = [role.id for role in member.roles] if member else ()
+                source_key = f"event:{session.id}:{user_id}"
+                pts, action = self.bot.rules.award('event', user_id, session.guild_id, None, role_ids,
+                                                   source_key=source_key)
+                if pts > 0:
+                    awards.append((user_id, pts, f"{action}: {session.name}", source_key))
+
+            # Awards are keyed per session and user, so if closing fails after
+            # this point a retry credits nobody twice
+            credited = ()
+            try:
+                credited = await self.bot.storage.award_many(awards)
+            finally:
+                self.bot.rules.settle([award[3] for award in awards],
+                                      {key for award in credited for key in award.source_keys})
+            rows = session.pending
+
+            def commit():
+                with db.transaction() as c:
+                    db.save_attendance(c, session.id, rows)
+                    c.execute("UPDATE event_sessions SET status = 'closed', closed_at = datetime('now') WHERE id = ?",
+                              (session.id,))
+
+            await asyncio.to_thread(commit)
+            del self.sessions[session.code]
+
+        points = self.bot.get_cog('Points')
+        if points:
+            for award in credited:
+                points.after_award(award)
+        logger.info(f"Closed event {session.code}: {len(session.attendees)} attendees, {len(credited)} credited")
+        return len(session.attendees), len(credited)
+
+    @commands.command(aliases=['checkin'])
+    @commands.cooldown(1, 10, commands.BucketType.user)  # 1 use per 10 seconds per user
+    async def event(self, ctx, code: str = None):
+        """Check in to an open event with its code"""
+        try:
+            if code is None:
+                await ctx.send("❌ Please include the event code.\n\n**Usage:** `!event <code>`")
+                return
+            session = self.sessions.get(code.upper())
+            if session is None or session.closes_at <= datetime.utcnow():
+                await ctx.send(f"❌ {ctx.author.mention}, there is no open event with code `{code}`.")
+                return
+            if ctx.guild and ctx.guild.id != session.guild_id:
+                await ctx.send(f"❌ {ctx.author.mention}, that event belongs to another server.")
+                return
+
+            if session.check_in(str(ctx.author.id), 'checkin'):
+                # A reaction is one cheap API call, which matters when hundreds check in at once
+                await ctx.message.add_reaction("✅")
+            else:
+                await ctx.message.add_reaction("👌")
+        except discord.HTTPException:
+            await ctx.send(f"✅ {ctx.author.mention}, you're checked in.")
+        except Exception as e:
+            await ctx.send("❌ An error occurred while checking you in.")
+            logger.error(f"Error in event command: {e}")
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def openevent(self, ctx, code: str, minutes: int, voice: typing.Optional[discord.VoiceChannel] = None, *, name: str = None):
+        """Open a check-in session: !openevent <code> <minutes> [voice channel] [name]"""
+        code = code.upper()
+        if not 1 <= minutes <= MAX_EVENT_MINUTES:
+            await ctx.send(f"❌ Sessions can last 1 to {MAX_EVENT_MINUTES} minutes.")
+            return
+        if code in self.sessions:
+            await ctx.send(f"❌ An event with code `{code}` is already open.")
+            return
+
+        name = name or code
+        closes_at = datetime.utcnow() + timedelta(minutes=minutes)
+
+        def insert():
+            with db.transaction() as c:
+                c.execute('''INSERT INTO event_sessions (code, name, guild_id, voice_channel_id, opened_by, closes_at)
+                             VALUES (?, ?, ?, ?, ?, ?)''',
+                          (code, name, str(ctx.guild.id), str(voice.id) if voice else None, str(ctx.author.id),
+                           closes_at.strftime('%Y-%m-%d %H:%M:%S')))
+                return c.lastrowid
+
+        session_id = await asyncio.to_thread(insert)
+        self.sessions[code] = EventSession(session_id, code, name, ctx.guild.id, voice.id if voice else None, closes_at)
+        logger.info(f"{ctx.author} opened event {code} for {minutes} minutes", extra={"admin_id": str(ctx.author.id)})
+
+        pts = self.bot.rules.value('event', ctx.guild.id)
+        embed = discord.Embed(
+            title=f"🎉 {name}: Check-In Open",
+            description=f"Type `!event {code}` to check in and earn **{rules.plural(pts, 'point')}**!",
+            color=0x00ff00
+        )
+        embed.add_field(name="Closes", value=f"<t:{int(closes_at.replace(tzinfo=timezone.utc).timestamp())}:R>", inline=True)
+        if voice:
+            embed.add_field(name="Voice Roster", value=f"Members in {voice.mention} are checked in automatically at close", inline=True)
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def eventroster(self, ctx, code: str):
+        """Check in everyone in the event's voice channel right now"""
+        session = self.sessions.get(code.upper())
+        if session is None:
+            await ctx.send(f"❌ There is no open event with code `{code}`.")
+            return
+        if session.voice_channel_id is None:
+            await ctx.send(f"❌ Event `{session.code}` has no voice channel.")
+            return
+        added = self.snapshot_roster(session)
+        await ctx.send(f"🎙️ Checked in {added} members from voice ({len(session.attendees)} total).")
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def closeevent(self, ctx, code: str):
+        """Close an event now and award everyone who attended"""
+        session = self.sessions.get(code.upper())
+        if session is None:
+            await ctx.send(f"❌ There is no open event with code `{code}`.")
+            return
+        result = await self.close_session(session)
+        if result is None:
+            await ctx.send(f"❌ Event `{session.code}` was already closed.")
+            return
+        attendees, credited = result
+
+        embed = discord.Embed(
+            title=f"🏁 {session.name}: Closed",
+            description=f"Awarded points to {credited} of {attendees} attendees",
+            color=0x00ff00
+        )
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(Events(bot))
@@ -1,76 +1,193 @@
 #!/usr/bin/env python3
 """
 Database inspection script
+
+Opens the database read-only (db.connect_readonly), so it is safe to run
+against the live file while the bot is writing. Row counts come from
+sqlite_stat1 (refreshed by db.setup) or, for tables it doesn't cover, the
+largest rowid; both are estimates that cost a few page reads however big
+the table is. ``--exact`` counts every row instead, and ``--sizes`` reads
+every page through the dbstat table to report bytes per table and its
+indexes.
+
+    python inspect_db.py                      human-readable report
+    python inspect_db.py --format json --sizes
+    python inspect_db.py --format csv --exact > tables.csv
 """
 
-import db
+import argparse
+import csv
+import json
+import os
 import sqlite3
+import sys
+
+import db
+
+TABLE_FIELDS = ['table', 'rows', 'rows_source', 'indexes', 'table_bytes', 'index_bytes', 'total_bytes']
+
+
+def _quote(name):
+    """Quote an identifier read from sqlite_master for use in SQL"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _stat1_counts(c):
+    """Row counts recorded by ANALYZE, per table"""
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+    if not c.fetchone():
+        return {}
+    # The first number of a stat row is the table's row count, except for
+    # partial indexes, which only count the rows they cover
+    c.execute('''SELECT tbl, stat FROM sqlite_stat1 WHERE idx IS NULL OR idx NOT IN (
+                     SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '% WHERE %')''')
+    counts = {}
+    for table, stat in c.fetchall():
+        counts[table] = max(counts.get(table, 0), int(stat.split()[0]))
+    return counts
+
+
+def _row_count(c, table, without_rowid, stat1, exact):
+    if not exact:
+        if table in stat1:
+            return stat1[table], 'stat1'
+        if not without_rowid:
+            c.execute(f'SELECT MAX(rowid) FROM {_quote(table)}')
+            return c.fetchone()[0] or 0, 'max_rowid'
+    c.execute(f'SELECT COUNT(*) FROM {_quote(table)}')
+    return c.fetchone()[0], 'exact'
+
+
+def _btree_sizes(c):
+    """Bytes used by each table and index b-tree (reads every page)"""
+    c.execute('SELECT name, pgsize FROM dbstat WHERE aggregate = TRUE')
+    return dict(c.fetchall())
+
+
+def table_stats(c, exact=False, sizes=False):
+    """Per-table rows, index count and (with ``sizes``) bytes, largest first"""
+    c.execute("""SELECT name, sql FROM sqlite_master
+                 WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name""")
+    tables = c.fetchall()
+    c.execute("SELECT name, tbl_name FROM sqlite_master WHERE type = 'index'")
+    indexes = {}
+    for index, table in c.fetchall():
+        indexes.setdefault(table, []).append(index)
+    stat1 = _stat1_counts(c)
+    btrees = _btree_sizes(c) if sizes else {}
 
-def inspect_database():
-    """Inspect the database and show its current state"""
+    stats = []
+    for table, sql in tables:
+        without_rowid = 'WITHOUT ROWID' in (sql or '').upper()
+        rows, source = _row_count(c, table, without_rowid, stat1, exact)
+        row = {'table': table, 'rows': rows, 'rows_source': source, 'indexes': len(indexes.get(table, []))}
+        if sizes:
+            row['table_bytes'] = btrees.get(table, 0)
+            row['index_bytes'] = sum(btrees.get(index, 0) for index in indexes.get(table, []))
+            row['total_bytes'] = row['table_bytes'] + row['index_bytes']
+        stats.append(row)
+    key = 'total_bytes' if sizes else 'rows'
+    return sorted(stats, key=lambda row: row[key], reverse=True)
+
+
+def database_stats(c, path):
+    pragmas = {}
+    for name in ('page_size', 'page_count', 'freelist_count', 'journal_mode'):
+        c.execute(f'PRAGMA {name}')
+        pragmas[name] = c.fetchone()[0]
+    wal_path = f'{path}-wal'
+    return {
+        'path': os.path.abspath(path),
+        'file_bytes': os.path.getsize(path),
+        'wal_bytes': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+        **pragmas,
+    }
+
+
+def activity_summary(c):
+    c.execute('SELECT CAST(user_id AS TEXT), points FROM users ORDER BY points DESC LIMIT 5')
+    top_users = [{'user_id': user_id, 'points': points} for user_id, points in c.fetchall()]
+    c.execute('SELECT name, cost FROM rewards')
+    rewards = [{'name': name, 'cost': cost} for name, cost in c.fetchall()]
+    c.execute("""SELECT CAST(user_id AS TEXT), action, points, datetime(timestamp, 'unixepoch')
+                 FROM points_log ORDER BY timestamp DESC LIMIT 5""")
+    recent = [{'user_id': user_id, 'action': action, 'points': points, 'timestamp': timestamp}
+              for user_id, action, points, timestamp in c.fetchall()]
+    c.execute('SELECT COUNT(*) FROM suspicious_activity')
+    return {'top_users': top_users, 'rewards': rewards, 'recent_activity': recent,
+            'suspicious_activity': c.fetchone()[0]}
+
+
+def print_report(database, tables, summary):
     print("🔍 Database Inspection Report\n")
     print("=" * 50)
-    
-    conn = db.connect()
-    c = conn.cursor()
-    
-    # Check all tables
-    c.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = c.fetchall()
-    
-    print("📋 Database Tables:")
-    for table in tables:
-        table_name = table[0]
-        c.execute(f"SELECT COUNT(*) FROM {table_name}")
-        count = c.fetchone()[0]
-        print(f"   ✅ {table_name}: {count} records")
-    
-    print("\n📊 Detailed Information:")
-    
-    # Users table
-    print("\n👥 Users Table:")
-    c.execute("SELECT user_id, points FROM users ORDER BY points DESC LIMIT 5")
-    users = c.fetchall()
-    if users:
-        for user_id, points in users:
-            print(f"   User {user_id}: {points} points")
-    else:
-        print("   No users found")
-    
-    # Rewards table
-    print("\n🎁 Rewards Table:")
-    c.execute("SELECT name, cost FROM rewards")
-    rewards = c.fetchall()
-    if rewards:
-        for name, cost in rewards:
-            print(f"   {name}: {cost} points")
-    else:
-        print("   No rewards found")
-    
-    # Recent activity
+    print(f"💾 {database['path']}: {database['file_bytes'] / 2 ** 20:,.1f} MiB "
+          f"(+{database['wal_bytes'] / 2 ** 20:,.1f} MiB WAL), {database['page_count']:,} pages of "
+          f"{database['page_size']}, {database['freelist_count']:,} free, {database['journal_mode']} mode")
+
+    print("\n📋 Database Tables:")
+    for row in tables:
+        approx = '' if row['rows_source'] == 'exact' else '~'
+        size = f", {row['total_bytes'] / 2 ** 20:,.2f} MiB ({row['index_bytes'] / 2 ** 20:,.2f} in indexes)" \
+            if 'total_bytes' in row else ''
+        print(f"   ✅ {row['table']}: {approx}{row['rows']:,} records, {row['indexes']} indexes{size}")
+
+    if summary is None:
+        return
+    print("\n👥 Top Users:")
+    for user in summary['top_users'] or [None]:
+        print(f"   User {user['user_id']}: {user['points']} points" if user else "   No users found")
+    print("\n🎁 Rewards:")
+    for reward in summary['rewards'] or [None]:
+        print(f"   {reward['name']}: {reward['cost']} points" if reward else "   No rewards found")
     print("\n📝 Recent Activity (Last 5):")
-    c.execute("SELECT user_id, action, points, timestamp FROM points_log ORDER BY timestamp DESC LIMIT 5")
-    activities = c.fetchall()
-    if activities:
-        for user_id, action, points, timestamp in activities:
-            print(f"   {timestamp[:19]} | User {user_id}: {action} (+{points} pts)")
+    for entry in summary['recent_activity'] or [None]:
+        print(f"   {entry['timestamp']} | User {entry['user_id']}: {entry['action']} (+{entry['points']} pts)"
+              if entry else "   No activity found")
+    print(f"\n🚨 Suspicious Activity: {summary['suspicious_activity']}")
+
+
+def inspect_database(args):
+    """Inspect the database and print its current state in the chosen format"""
+    path = args.db or db.DB_PATH
+    if not os.path.exists(path):
+        print(f"❌ {path} does not exist", file=sys.stderr)
+        return 1
+    conn = db.connect_readonly(path)
+    c = conn.cursor()
+    try:
+        # One read transaction, so every figure comes from the same snapshot
+        c.execute('BEGIN')
+        database = database_stats(c, path)
+        tables = table_stats(c, exact=args.exact, sizes=args.sizes)
+        try:
+            summary = activity_summary(c) if not args.tables_only else None
+        except sqlite3.OperationalError:
+            summary = None  # Not a bot database (or not set up yet)
+    except sqlite3.OperationalError as e:
+        print(f"❌ Could not inspect {path}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+    if args.format == 'json':
+        json.dump({'database': database, 'tables': tables, 'summary': summary}, sys.stdout, indent=2)
+        print()
+    elif args.format == 'csv':
+        writer = csv.DictWriter(sys.stdout, fieldnames=TABLE_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(tables)
     else:
-        print("   No activity found")
-    
-    # Suspicious activity
-    print("\n🚨 Suspicious Activity:")
-    c.execute("SELECT COUNT(*) FROM suspicious_activity")
-    suspicious_count = c.fetchone()[0]
-    print(f"   Total suspicious activities: {suspicious_count}")
-    
-    conn.close()
-    
-    print("\n" + "=" * 50)
-    print("✅ Database inspection complete!")
-    print("\n💡 Your database is ready and working!")
-    print("   - All tables are created")
-    print("   - Rewards are initialized")
-    print("   - Ready to track user activity")
+        print_report(database, tables, summary)
+    return 0
+
 
 if __name__ == "__main__":
-    inspect_database() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Inspect the points database (read-only)")
+    parser.add_argument("--db", help="Database file (default: P2E_DB_PATH)")
+    parser.add_argument("--format", choices=["text", "json", "csv"], default="text",
+                        help="Output format; csv lists the per-table stats only")
+    parser.add_argument("--exact", action="store_true", help="Count every row instead of estimating")
+    parser.add_argument("--sizes", action="store_true", help="Per-table and index bytes (reads every page)")
+    parser.add_argument("--tables-only", action="store_true", help="Skip the users/rewards/activity summary")
+    sys.exit(inspect_database(parser.parse_args()))
@@ -0,0 +1,148 @@
+from discord.ext import commands
+from logconfig import logger
+import review_queue
+import asyncio
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+MAX_LINKS_PER_MESSAGE = 5
+MAX_DESCRIPTION_CHARS = 500
+
+# Every URL in a message, with its host in group 1
+_URL = re.compile(r'(?:https?://|www\.)([^\s/?#<>()\[\]"\'`|]+)[^\s<>"\'`|]*', re.I)
+_TRAILING = '.,;:!?)]}*_~>'
+_OPENING = {')': '(', ']': '[', '}': '{'}
+# Query parameters that only track where a click came from
+_TRACKING = re.compile(r'utm_\w+|fbclid|gclid|mc_[ce]id|igshid|si|ref|ref_src|trk')
+
+
+def normalize_url(url):
+    """Canonical form used to dedupe links: https, lowercase host without
+    www. or default port, no fragment or tracking parameters, sorted query,
+    no trailing slash."""
+    if not re.match(r'https?://', url, re.I):
+        url = 'https://' + url
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if not _TRACKING.fullmatch(k.lower()))
+    return urlunsplit(('https', host, parts.path.rstrip('/'), urlencode(query), ''))
+
+
+def strip_trailing(url):
+    """Drop punctuation that ends the sentence rather than the URL; a closing
+    bracket stays if it pairs with one in the URL (``/wiki/Foo_(bar)``)"""
+    while url and url[-1] in _TRAILING:
+        opening = _OPENING.get(url[-1])
+        if opening and url.count(opening) >= url.count(url[-1]):
+            break
+        url = url[:-1]
+    return url
+
+
+def url_hash(normalized):
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class LinkMatcher:
+    """Finds and classifies links with precompiled patterns
+
+    The allow and deny lists are compiled into one regex anchored at the end
+    of the host. ``search`` tries the longest suffix first, so the most
+    specific entry wins (deny ``gist.github.com`` beats allow ``github.com``).
+    """
+
+    def __init__(self, channels=(), allow=(), deny=()):
+        self.channels = frozenset(channels)
+        self.allow_all = not allow
+        alternatives = []
+        if deny:
+            alternatives.append(f"(?P<deny>{'|'.join(map(re.escape, deny))})")
+        if allow:
+            alternatives.append(f"(?P<allow>{'|'.join(map(re.escape, allow))})")
+        self.domains = re.compile(rf"(?:^|\.)(?:{'|'.join(alternatives)})$") if alternatives else None
+
+    def allowed(self, host):
+        host = host.lower().rstrip('.')
+        match = self.domains.search(host) if self.domains else None
+        if match is None:
+            return self.allow_all
+        return match.lastgroup == 'allow'
+
+    def find(self, content):
+        """Allowed URLs in ``content`` as ``[(url, normalized)]``, first occurrence only"""
+        # Cheap substring test first: most messages have no links at all
+        if '://' not in content and 'www.' not in content:
+            return []
+        found = {}
+        for match in _URL.finditer(content):
+            host = match.group(1).split('@')[-1].split(':')[0]
+            if '.' not in host or not self.allowed(host):
+                continue
+            url = strip_trailing(match.group(0))
+            normalized = normalize_url(url)
+            found.setdefault(normalized, url)
+            if len(found) >= MAX_LINKS_PER_MESSAGE:
+                break
+        return [(url, normalized) for normalized, url in found.items()]
+
+
+class Links(commands.Cog):
+    """Queues links shared in designated channels for resource review
+
+    Which channels are watched, and the domain allow/deny lists, come from
+    the ``links`` section of the points rules and follow its hot reloads.
+    Each link is stored once by the hash of its normalized URL, so reposts
+    (with different tracking parameters, ``www.`` or fragments) are ignored.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.table = None
+        self.matcher = LinkMatcher()
+
+    def current_matcher(self):
+        """Recompile only when the rules table has been reloaded"""
+        table = self.bot.rules.table
+        if table is not self.table:
+            self.matcher = LinkMatcher(table.link_channels, table.link_allow, table.link_deny)
+            self.table = table
+        return self.matcher
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if message.author.bot:
+            return
+        matcher = self.current_matcher()
+        if message.channel.id not in matcher.channels:
+            return
+        links = matcher.find(message.content)
+        if not links:
+            return
+        user_id = str(message.author.id)
+        if self.bot.cache.is_suspended(user_id):
+            return
+
+        description = message.content[:MAX_DESCRIPTION_CHARS]
+        rows = [(user_id, description, url, url_hash(normalized)) for url, normalized in links]
+        try:
+            queued = await asyncio.to_thread(review_queue.enqueue_links, rows)
+        except Exception as e:
+            logger.error(f"Error queueing links from {user_id}: {e}")
+            return
+        if not queued:
+            return
+
+        logger.info(f"Queued {len(queued)} links from {message.author} for review", extra={"user_id": user_id})
+        try:
+            await message.add_reaction("📚")
+        except Exception:
+            pass  # Missing permissions; the submission is queued either way
+
+async def setup(bot):
+    await bot.add_cog(Links(bot))
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Backend ingest load test
+
+Simulates several bot shards pushing point events at the backend at once.
+Run the backend under an ASGI server first, e.g.:
+
+    DATABASE_URL=sqlite:///loadtest.db python manage.py migrate
+    DATABASE_URL=sqlite:///loadtest.db uvicorn backend.asgi:application --workers 1
+
+then:
+
+    python loadtest_backend.py --shards 4 --requests 2000 --concurrency 100
+    python loadtest_backend.py --shards 4 --requests 200 --bulk 50
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime
+
+import aiohttp
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_event(user_pool):
+    return {
+        "discord_id": str(random.choice(user_pool)),
+        "points": random.choice([1, 1, 1, 2, 5]),
+        "action": "Load test",
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
+async def run_shard(session, args, shard_id, user_pool, latencies, errors):
+    """Send this shard's share of requests with bounded concurrency."""
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one_request():
+        async with semaphore:
+            if args.bulk > 1:
+                url = f"{args.url}/api/points/bulk/"
+                payload = {"events": [make_event(user_pool) for _ in range(args.bulk)]}
+            else:
+                event = make_event(user_pool)
+                url = f"{args.url}/api/users/{event.pop('discord_id')}/add-points/"
+                payload = event
+            start = time.perf_counter()
+            try:
+                async with session.post(url, json=payload) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors.append(response.status)
+            except aiohttp.ClientError as e:
+                errors.append(type(e).__name__)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one_request() for _ in range(args.requests)))
+
+
+async def main(args):
+    user_pool = [10**17 + i for i in range(args.users)]
+    latencies, errors = [], []
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency * args.shards)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                run_shard(session, args, shard, user_pool, latencies, errors)
+                for shard in range(args.shards)
+            )
+        )
+        elapsed = time.perf_counter() - start
+
+    total_requests = args.requests * args.shards
+    total_events = total_requests * max(1, args.bulk)
+    print("📈 Backend Ingest Load Test")
+    print("=" * 50)
+    print(f"   Shards:        {args.shards}")
+    print(f"   Requests:      {total_requests} ({args.concurrency} in flight per shard)")
+    print(f"   Events:        {total_events}")
+    print(f"   Elapsed:       {elapsed:.2f}s")
+    print(f"   Requests/sec:  {total_requests / elapsed:,.0f}")
+    print(f"   Events/sec:    {total_events / elapsed:,.0f}")
+    print(f"   Latency mean:  {statistics.mean(latencies) * 1000:.1f}ms")
+    for pct in (50, 95, 99):
+        print(f"   Latency p{pct}:   {percentile(latencies, pct) * 1000:.1f}ms")
+    print(f"   Errors:        {len(errors)}")
+    if errors:
+        print(f"   First errors:  {errors[:5]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the backend ingest API")
+    parser.add_argument("--url", default="http://localhost:8000", help="Backend base URL")
+    parser.add_argument("--shards", type=int, default=4, help="Simulated bot shards")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per shard")
+    parser.add_argument("--concurrency", type=int, default=50, help="In-flight requests per shard")
+    parser.add_argument("--users", type=int, default=5000, help="Distinct users to award")
+    parser.add_argument("--bulk", type=int, default=0, help="Events per bulk request (0 = single-event endpoint)")
+    asyncio.run(main(parser.parse_args()))
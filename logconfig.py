@@ -0,0 +1,94 @@
+"""
+Logging pipeline
+
+Every module logs through the shared ``p2e`` logger. Records are only put on
+a queue by the calling thread (the event loop, usually); a QueueListener
+thread does the formatting and the blocking file and stdout writes. The file
+is JSON lines with size-based rotation.
+
+High-volume lines (one per award, sync or command) are sampled: pass
+``extra={'sampled': True}`` and only LOG_SAMPLE_RATE of them are kept.
+Warnings and errors are never sampled.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+LOG_FILE = os.getenv('P2E_LOG_FILE', 'bot.log')
+LOG_LEVEL = os.getenv('P2E_LOG_LEVEL', 'INFO')
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_SAMPLE_RATE = float(os.getenv('P2E_LOG_SAMPLE_RATE', '0.05'))
+
+logger = logging.getLogger('p2e')
+
+# Attributes every LogRecord has; anything else came in through ``extra=``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'sampled'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any ``extra=`` fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a random fraction of records marked ``sampled``"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if getattr(record, 'sampled', False) and record.levelno < logging.WARNING:
+            return random.random() < self.rate
+        return True
+
+
+def setup_logging():
+    """Route the root logger through a queue to background file/stdout handlers"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+    )
+    file_handler.setFormatter(JsonFormatter())
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Drop sampled records before they are even enqueued
+    queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
@@ -0,0 +1,171 @@
+"""
+Staged event pipeline
+
+Gateway handlers only ``submit`` an event and return. Each stage has a
+bounded asyncio.Queue and a small pool of workers; a worker hands its output
+to the next stage with ``await queue.put``, so a slow stage (usually the
+ledger) pushes back on the ones before it instead of piling up tasks.
+Backpressure ends at ingest, where a full queue sheds the event.
+
+Low-priority events are also shed at ingest while event-loop lag (measured
+by a sleeping probe task) is above LAG_SHED_SECONDS, so passive activity
+never delays commands.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+
+from logconfig import logger
+
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 1
+
+LAG_SAMPLE_SECONDS = 0.5
+LAG_SHED_SECONDS = 0.25
+
+# Per-user token buckets: burst size and sustained awards per second
+RATE_BURST = 5
+RATE_PER_SECOND = 0.2
+MAX_RATE_BUCKETS = 50000
+
+
+class Stage:
+    """One pipeline step: ``handler(items) -> outputs`` run by ``workers`` tasks
+
+    ``batch_size`` > 1 lets a worker take whatever is already queued (up to
+    that many) and handle it in one call.
+    """
+
+    def __init__(self, name, handler, workers=1, maxsize=1000, batch_size=1):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue = asyncio.Queue(maxsize)
+        self.processed = 0  # Items handled
+        self.emitted = 0    # Items passed to the next stage
+        self.shed = 0       # Items dropped because the stage was full or the loop lagging
+        self.errors = 0
+
+    def offer(self, item):
+        """Enqueue without waiting; returns False (and counts it) if full"""
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            self.shed += 1
+            return False
+
+
+class Pipeline:
+    def __init__(self, stages):
+        self.stages = OrderedDict((stage.name, stage) for stage in stages)
+        self.tasks = []
+        self.lag = 0.0
+        self.started = time.monotonic()
+
+    def submit(self, item, priority=PRIORITY_NORMAL):
+        """Hand an event to the first stage; returns False if it was shed"""
+        first = next(iter(self.stages.values()))
+        if priority == PRIORITY_LOW and self.lag > LAG_SHED_SECONDS:
+            first.shed += 1
+            return False
+        return first.offer(item)
+
+    def inject(self, name, item):
+        """Enqueue directly into a later stage (e.g. side effects of other writes)"""
+        return self.stages[name].offer(item)
+
+    async def start(self):
+        self.started = time.monotonic()
+        stages = list(self.stages.values())
+        for stage, next_stage in zip(stages, stages[1:] + [None]):
+            for _ in range(stage.workers):
+                self.tasks.append(asyncio.create_task(self.work(stage, next_stage)))
+        self.tasks.append(asyncio.create_task(self.monitor_lag()))
+
+    async def stop(self, timeout=5):
+        """Let queued events finish (up to ``timeout`` seconds), then stop the workers"""
+        try:
+            for stage in self.stages.values():
+                await asyncio.wait_for(stage.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Pipeline stopped with events still queued")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def work(self, stage, next_stage):
+        while True:
+            items = [await stage.queue.get()]
+            while len(items) < stage.batch_size:
+                try:
+                    items.append(stage.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            try:
+                outputs = await stage.handler(items)
+            except Exception as e:
+                stage.errors += len(items)
+                outputs = []
+                logger.error(f"Error in pipeline stage {stage.name}: {e}")
+            finally:
+                for _ in items:
+                    stage.queue.task_done()
+            stage.processed += len(items)
+
+            if next_stage is not None:
+                for output in outputs:
+                    # Blocks while the next stage is full: backpressure
+                    await next_stage.queue.put(output)
+                stage.emitted += len(outputs)
+
+    async def monitor_lag(self):
+        """Smoothed event-loop lag: how late a fixed sleep wakes up"""
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LAG_SAMPLE_SECONDS)
+            lag = max(0.0, loop.time() - start - LAG_SAMPLE_SECONDS)
+            self.lag = 0.7 * self.lag + 0.3 * lag
+
+    def stats(self):
+        """Per-stage counters, queue depth and throughput since start"""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return [
+            {
+                'stage': stage.name,
+                'queued': stage.queue.qsize(),
+                'processed': stage.processed,
+                'emitted': stage.emitted,
+                'shed': stage.shed,
+                'errors': stage.errors,
+                'per_second': stage.processed / elapsed,
+            }
+            for stage in self.stages.values()
+        ]
+
+
+class RateLimiter:
+    """Per-key token buckets, keeping only the most recently used keys"""
+
+    def __init__(self, burst=RATE_BURST, per_second=RATE_PER_SECOND, max_keys=MAX_RATE_BUCKETS):
+        self.burst = burst
+        self.per_second = per_second
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()  # key -> (tokens, last refill)
+
+    def allow(self, key):
+        now = time.monotonic()
+        tokens, last = self.buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.per_second)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.buckets[key] = (tokens, now)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return allowed
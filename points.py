@@ -1,81 +1,222 @@
 from discord.ext import commands
+from logconfig import logger
 import db  # your database module for connection and setup
+import review_queue
 import discord
 import asyncio
-from datetime import datetime, timedelta
+import aiohttp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
 import re
+from db import MILESTONES
+import rules
+from pipeline import Pipeline, Stage, PRIORITY_LOW, PRIORITY_NORMAL
+import resume_parser
 
-# Milestone definitions for incentives
-MILESTONES = {
-    50: "Azure Certification",
-    75: "Resume Review", 
-    100: "Hackathon"
-}
+# Backend sync outbox: rows pushed per request, idle poll and retry delays
+OUTBOX_BATCH_SIZE = 200
+OUTBOX_POLL_SECONDS = 30
+OUTBOX_RETRY_SECONDS = 15
+# Retries back off exponentially up to this delay; rows that fail this many
+# times (about 4 hours of outage) move to backend_outbox_failed
+OUTBOX_MAX_RETRY_SECONDS = 15 * 60
+OUTBOX_MAX_ATTEMPTS = 20
+# How often rejected low-quality messages are written to suspicious_activity
+REJECTION_FLUSH_SECONDS = 10
+# How often coalesced last-activity and streak updates are written
+ACTIVITY_FLUSH_SECONDS = 60
+# Activity pipeline: events queued per stage and awards written per ledger batch
+PIPELINE_QUEUE_SIZE = 2000
+LEDGER_BATCH_SIZE = 200
+# A ledger batch that fails to commit is parked and retried with a growing
+# delay; after the last attempt its messages are released for the backfill
+LEDGER_RETRY_SECONDS = 5
+LEDGER_MAX_ATTEMPTS = 4
+# Resume uploads: accepted types, download cap, parser processes and limits
+RESUME_TYPES = {'.pdf': 'pdf', '.docx': 'docx'}
+MAX_RESUME_BYTES = 5 * 1024 * 1024
+RESUME_PARSE_WORKERS = 2
+RESUME_MAX_IN_FLIGHT = 8
+RESUME_PARSE_TIMEOUT_SECONDS = 30
+
+class SubmissionIds(commands.Converter):
+    """Parse a submission ID or an inclusive ID range like `20-40`"""
+    async def convert(self, ctx, argument):
+        start, sep, end = argument.partition('-')
+        if not start.isdigit() or (sep and not end.isdigit()):
+            raise commands.BadArgument(f"Not a submission ID or range: {argument}")
+        if not sep:
+            return [int(start)]
+        start, end = int(start), int(end)
+        if end < start or end - start >= review_queue.MAX_BULK:
+            raise commands.BadArgument(f"Invalid submission ID range: {argument}")
+        return list(range(start, end + 1))
+
+# Separates submission IDs from the notes/reason in bulk review commands, so
+# text that starts with a number is never read as more IDs
+REVIEW_TEXT_SEPARATOR = '|'
+
+def review_text(text, default):
+    """The notes/reason after REVIEW_TEXT_SEPARATOR, or None if text follows the IDs without it"""
+    if not text:
+        return default
+    if not text.startswith(REVIEW_TEXT_SEPARATOR):
+        return None
+    return text[len(REVIEW_TEXT_SEPARATOR):].strip() or default
 
 class Points(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.processed_messages = set()  # Track processed messages to prevent duplicates
+        self.outbox_ready = asyncio.Event()  # Set when new awards are queued for the backend
+        # Owned by the cache so they survive cog reloads and restarts (see snapshot.py)
+        self.quality = bot.cache.quality
+        self.rate_limiter = bot.cache.rate_limiter
+        self.parked = set()  # Retry tasks for ledger batches that failed to commit
+        # ingest -> filter/dedup -> rate limit -> scoring -> ledger -> side effects
+        self.pipeline = Pipeline([
+            Stage('filter', self.filter_stage, workers=2, maxsize=PIPELINE_QUEUE_SIZE),
+            Stage('ratelimit', self.ratelimit_stage, maxsize=PIPELINE_QUEUE_SIZE),
+            Stage('score', self.score_stage, maxsize=PIPELINE_QUEUE_SIZE),
+            Stage('ledger', self.ledger_stage, maxsize=PIPELINE_QUEUE_SIZE, batch_size=LEDGER_BATCH_SIZE),
+            Stage('effects', self.effects_stage, workers=2, maxsize=PIPELINE_QUEUE_SIZE),
+        ])
+
+    async def cog_load(self):
+        # Resume parsing is CPU-bound; keep it in worker processes
+        self.parser_pool = ProcessPoolExecutor(max_workers=RESUME_PARSE_WORKERS)
+        self.resume_slots = asyncio.Semaphore(RESUME_MAX_IN_FLIGHT)
+        await self.pipeline.start()
+        self.outbox_task = asyncio.create_task(self.drain_outbox())
+        self.rejections_task = asyncio.create_task(self.flush_rejections_loop())
+        self.activity_task = asyncio.create_task(self.flush_activity_loop())
+
+    async def cog_unload(self):
+        await self.pipeline.stop()
+        for task in self.parked:
+            task.cancel()
+        self.parser_pool.shutdown(wait=False, cancel_futures=True)
+        self.outbox_task.cancel()
+        self.rejections_task.cancel()
+        self.activity_task.cancel()
+        await self.flush_rejections()
+        await self.flush_activity()
+
+    def after_award(self, award):
+        """Run the side effects of a committed award"""
+        self.bot.cache.totals[award.user_id] = award.total_points
+        
+        # Backend sync is already queued in the outbox; wake the drainer
+        self.outbox_ready.set()
+        
+        # Congratulate the user on any milestones the award unlocked; the
+        # milestone is already recorded, so a shed DM only loses the message
+        for points_required, milestone_name in award.milestones:
+            if not self.pipeline.inject('effects', (award.user_id, milestone_name, points_required)):
+                logger.warning(f"Dropped milestone DM to {award.user_id} for {milestone_name}: queue full")
+
+    async def drain_outbox(self):
+        """Push queued awards to the backend in batches"""
+        failures = 0  # Consecutive batches the backend couldn't take
+        while True:
+            try:
+                await asyncio.wait_for(self.outbox_ready.wait(), timeout=OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self.outbox_ready.clear()
+            
+            try:
+                while True:
+                    rows = await self.bot.storage.fetch_outbox(OUTBOX_BATCH_SIZE)
+                    if not rows:
+                        break
+                    if not await self.sync_outbox_rows(rows):
+                        failures += 1
+                        given_up = await self.bot.storage.retry_outbox([row[0] for row in rows], OUTBOX_MAX_ATTEMPTS)
+                        if given_up:
+                            logger.error(f"Moved {given_up} outbox rows to backend_outbox_failed after "
+                                         f"{OUTBOX_MAX_ATTEMPTS} attempts")
+                        await asyncio.sleep(min(OUTBOX_RETRY_SECONDS * 2 ** (failures - 1), OUTBOX_MAX_RETRY_SECONDS))
+                        break
+                    failures = 0
+            except Exception as e:
+                logger.error(f"Error syncing points with backend: {e}")
+
+    async def sync_outbox_rows(self, rows):
+        """Sync outbox rows, acking what the backend accepted.
+
+        A 4xx means the backend will never take the batch as sent, so it is
+        split in half until the bad events are isolated; those move to
+        backend_outbox_failed and the rest sync. Returns False if the
+        backend is unavailable (5xx, timeouts, 408/429) and rows are left
+        to retry.
+        """
+        from bot import sync_points_batch_with_backend
+
+        # The backend only accepts snowflake IDs; don't spend requests on test IDs
+        invalid = [row[0] for row in rows if not str(row[1]).isdigit()]
+        if invalid:
+            await self.bot.storage.fail_outbox(invalid, "discord_id is not a snowflake")
+            logger.warning(f"Moved {len(invalid)} outbox rows with non-snowflake IDs to backend_outbox_failed")
+            rows = [row for row in rows if str(row[1]).isdigit()]
+            if not rows:
+                return True
+
+        status, detail = await sync_points_batch_with_backend(rows)
+        if status == 200:
+            await self.bot.storage.ack_outbox([row[0] for row in rows])
+            return True
+        if status is None or status >= 500 or status in (408, 429):
+            return False
+        if len(rows) == 1:
+            await self.bot.storage.fail_outbox([rows[0][0]], f"HTTP {status}: {(detail or '')[:500]}")
+            logger.warning(f"Backend rejected outbox row {rows[0][0]} ({status}); moved to backend_outbox_failed")
+            return True
+        middle = len(rows) // 2
+        return await self.sync_outbox_rows(rows[:middle]) and await self.sync_outbox_rows(rows[middle:])
 
-    def add_points(self, user_id, pts, action):
+    async def flush_rejections(self):
+        """Write queued quality-gate rejections in one transaction"""
+        rows, dropped = self.quality.take_rejections()
+        if dropped:
+            logger.warning(f"Dropped {dropped} rejected messages from the full quality-gate queue")
+        if not rows:
+            return
         try:
-            conn = db.connect()
-            c = conn.cursor()
-            c.execute('INSERT OR IGNORE INTO users (user_id, points) VALUES (?, ?)', (user_id, 0))
-            c.execute('UPDATE users SET points = points + ? WHERE user_id = ?', (pts, user_id))
-            c.execute('INSERT INTO points_log(user_id, action, points) VALUES (?, ?, ?)', (user_id, action, pts))
-            
-            # Get updated total points
-            c.execute('SELECT points FROM users WHERE user_id = ?', (user_id,))
-            total_points = c.fetchone()[0]
-            
-            conn.commit()
-            conn.close()
-            
-            # Sync with backend API asynchronously
-            asyncio.create_task(self.sync_points_with_backend(user_id, pts, action))
-            
-            # Check for milestones asynchronously
-            asyncio.create_task(self.check_milestones(user_id, total_points))
-            
+            await self.bot.storage.log_suspicious(rows)
         except Exception as e:
-            print(f"Error adding points: {e}")
+            logger.error(f"Error logging {len(rows)} rejected messages: {e}")
+
+    async def flush_rejections_loop(self):
+        while True:
+            await asyncio.sleep(REJECTION_FLUSH_SECONDS)
+            await self.flush_rejections()
 
-    async def sync_points_with_backend(self, user_id, pts, action):
-        """Sync points with backend API"""
+    async def flush_activity(self):
+        """Write one user_status row per user active since the last flush"""
+        rows = self.bot.cache.activity.take_pending()
+        if not rows:
+            return
         try:
-            # Import the function from bot.py
-            from bot import update_user_points_in_backend
-            await update_user_points_in_backend(user_id, pts, action)
+            await self.bot.storage.save_activity(rows)
         except Exception as e:
-            print(f"Error syncing points with backend: {e}")
+            logger.error(f"Error saving activity for {len(rows)} users: {e}")
+
+    async def flush_activity_loop(self):
+        while True:
+            await asyncio.sleep(ACTIVITY_FLUSH_SECONDS)
+            await self.flush_activity()
 
     async def check_milestones(self, user_id, total_points):
         """Check if user has reached any new milestones and send congratulatory DMs"""
         try:
-            conn = db.connect()
-            c = conn.cursor()
-            
-            # Check each milestone threshold
-            for points_required, milestone_name in MILESTONES.items():
-                if total_points >= points_required:
-                    # Check if this milestone was already achieved
-                    c.execute('SELECT id FROM milestone_achievements WHERE user_id = ? AND milestone_name = ?', 
-                             (user_id, milestone_name))
-                    
-                    if not c.fetchone():
-                        # New milestone achieved!
-                        c.execute('INSERT INTO milestone_achievements (user_id, milestone_name, points_required) VALUES (?, ?, ?)',
-                                 (user_id, milestone_name, points_required))
-                        conn.commit()
-                        
-                        # Send congratulatory DM
-                        await self.send_milestone_dm(user_id, milestone_name, points_required)
+            unlocked = await self.bot.storage.unlock_milestones(user_id, total_points)
             
-            conn.close()
+            for points_required, milestone_name in unlocked:
+                await self.send_milestone_dm(user_id, milestone_name, points_required)
             
         except Exception as e:
-            print(f"Error checking milestones: {e}")
+            logger.error(f"Error checking milestones: {e}")
 
     async def send_milestone_dm(self, user_id, milestone_name, points_required):
         """Send a congratulatory DM to user for reaching a milestone"""
@@ -109,58 +250,211 @@ class Points(commands.Cog):
                 embed.set_footer(text="Keep earning points to unlock more incentives!")
                 
                 await user.send(embed=embed)
-                print(f"Sent milestone DM to {user.name} for {milestone_name}")
+                logger.info(f"Sent milestone DM to {user.name} for {milestone_name}")
             else:
-                print(f"Could not find user {user_id} to send milestone DM")
+                logger.warning(f"Could not find user {user_id} to send milestone DM")
                 
         except Exception as e:
-            print(f"Error sending milestone DM to {user_id}: {e}")
+            logger.error(f"Error sending milestone DM to {user_id}: {e}")
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
+    def resolve(self, action, member, channel=None, source_key=None):
+        """Points and ledger label for an action under the guild/channel/role rules
+
+        Pass the award's ``source_key`` when it goes through award_batch, so a
+        daily cap is only charged if the ledger credits it.
+        """
+        guild = getattr(channel, 'guild', None) or getattr(member, 'guild', None)
+        return self.bot.rules.award(
+            action, str(member.id),
+            guild.id if guild else None,
+            channel.id if channel is not None and guild else None,
+            [role.id for role in getattr(member, 'roles', ())],
+            source_key=source_key,
+        )
+
+    def accept_message(self, message):
+        """Whether a message is eligible for points at all"""
         # Prevent processing bot messages
         if message.author.bot:
-            return
+            return False
         
         # Prevent processing bot commands
         if message.content.startswith('!'):
-            return
-        
-        # Prevent duplicate processing
-        message_id = f"{message.id}_{message.author.id}"
-        if message_id in self.processed_messages:
-            return
-        
-        # Mark message as processed
-        self.processed_messages.add(message_id)
-        
-        # Clean up old processed messages (keep only last 1000)
-        if len(self.processed_messages) > 1000:
-            self.processed_messages.clear()
+            return False
         
         user_id = str(message.author.id)
+        if self.bot.cache.is_suspended(user_id):
+            return False
         
+        # Prevent short, repetitive or copy-pasted text from farming points
+        # (attachment-only posts have no text to judge)
+        if (message.content or not message.attachments) and \
+                not self.quality.check(user_id, message.content, message.id):
+            return False
+        return True
+
+    def score_message(self, message):
+        """The award an accepted message earns as ``(user_id, pts, action, source_key)``, or None"""
         # Award points for normal activity (only for non-command messages)
-        self.add_points(user_id, 1, "Message sent")
+        source_key = f"msg:{message.id}"
+        pts, action = self.resolve('message', message.author, message.channel, source_key)
+        if pts <= 0:
+            return None
+        return (str(message.author.id), pts, action, source_key)
+
+    def message_award(self, message):
+        """Filter and score a message in one step (used by the backfill)
+
+        Messages still in the dedup window were already handled live and are
+        skipped, so replaying them doesn't touch the quality gate's state.
+        """
+        if not self.bot.cache.dedup.add(message.id):
+            return None
+        return self.score_message(message) if self.accept_message(message) else None
+
+    def score_reaction(self, reaction, user):
+        source_key = f"react:{reaction.message.id}:{user.id}:{reaction.emoji}"
+        pts, action = self.resolve('reaction', user, reaction.message.channel, source_key)
+        if pts <= 0:
+            return None
+        return (str(user.id), pts, action, source_key)
+
+    async def award_batch(self, awards, reactions=(), release_on_failure=True):
+        """Ingest many keyed awards (and reaction edges) in one transaction through the storage backend
+
+        With ``release_on_failure=False`` a failed write keeps its daily-cap
+        holds for a retry (see retry_awards).
+        """
+        credited = None
+        try:
+            credited = await self.bot.storage.award_many(awards, reactions)
+        finally:
+            # Charge daily caps for what was credited; failed writes and replays release their holds
+            if credited is not None or release_on_failure:
+                self.bot.rules.settle([award[3] for award in awards],
+                                      {key for award in credited or () for key in award.source_keys})
+        for award in credited:
+            self.after_award(award)
+        return credited
+
+    # Pipeline stages. Items are ('message', message) or ('reaction', (reaction, user))
+    # until scoring turns them into ('award', award tuple) and ('edge', reaction edge).
+
+    async def filter_stage(self, items):
+        accepted = []
+        for kind, event in items:
+            if kind == 'message':
+                # Prevent duplicate processing (window survives restarts via snapshots)
+                if not self.bot.cache.dedup.add(event.id):
+                    continue
+                if self.accept_message(event):
+                    accepted.append((kind, event))
+            else:
+                reaction, user = event
+                if not self.bot.cache.is_suspended(str(user.id)):
+                    accepted.append((kind, event))
+        return accepted
+
+    async def ratelimit_stage(self, items):
+        allowed = []
+        for kind, event in items:
+            user = event.author if kind == 'message' else event[1]
+            if self.rate_limiter.allow(user.id):
+                allowed.append((kind, event))
+        return allowed
+
+    async def score_stage(self, items):
+        outputs = []
+        for kind, event in items:
+            if kind == 'message':
+                award = self.score_message(event)
+            else:
+                reaction, user = event
+                award = self.score_reaction(reaction, user)
+                # Who reacts to whom, for the reciprocity check in anomaly.py
+                outputs.append(('edge', (str(user.id), str(reaction.message.author.id), str(reaction.message.id))))
+            if award:
+                outputs.append(('award', award))
+        return outputs
+
+    async def ledger_stage(self, items):
+        # Side effects are queued by after_award
+        awards = [item for kind, item in items if kind == 'award']
+        reactions = [item for kind, item in items if kind == 'edge']
+        try:
+            await self.award_batch(awards, reactions, release_on_failure=False)
+        except Exception as e:
+            logger.error(f"Ledger write of {len(awards)} awards failed, retrying in the background: {e}")
+            self.park_awards(awards, reactions)
+        return []
+
+    def park_awards(self, awards, reactions):
+        task = asyncio.create_task(self.retry_awards(awards, reactions))
+        self.parked.add(task)
+        task.add_done_callback(self.parked.discard)
+
+    async def retry_awards(self, awards, reactions):
+        """Retry a failed ledger batch; if it never commits, release its cap
+        holds and drop its messages from the dedup window, so a backfill or
+        replay that reaches them can still award them"""
+        for attempt in range(1, LEDGER_MAX_ATTEMPTS):
+            await asyncio.sleep(LEDGER_RETRY_SECONDS * 2 ** (attempt - 1))
+            last = attempt == LEDGER_MAX_ATTEMPTS - 1
+            try:
+                await self.award_batch(awards, reactions, release_on_failure=last)
+                logger.info(f"Ledger batch of {len(awards)} awards committed on retry {attempt}")
+                return
+            except Exception as e:
+                logger.error(f"Ledger retry {attempt} of {len(awards)} awards failed: {e}")
+        for _, _, _, source_key in awards:
+            if source_key and source_key.startswith('msg:'):
+                self.bot.cache.dedup.discard(int(source_key[4:]))
+        logger.error(f"Gave up on {len(awards)} awards after {LEDGER_MAX_ATTEMPTS} attempts; "
+                     f"their messages can be awarded again")
+
+    async def effects_stage(self, items):
+        for user_id, milestone_name, points_required in items:
+            await self.send_milestone_dm(user_id, milestone_name, points_required)
+        return []
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if message.author.bot:
+            return
+        self.bot.cache.activity.touch(str(message.author.id))
+        self.pipeline.submit(('message', message), PRIORITY_NORMAL)
 
     @commands.Cog.listener()
     async def on_reaction_add(self, reaction, user):
         if user.bot:
             return
-        
-        user_id = str(user.id)
-        self.add_points(user_id, 2, "Liking/interacting")
+        self.bot.cache.activity.touch(str(user.id))
+        # Reactions are shed first when the event loop falls behind
+        self.pipeline.submit(('reaction', (reaction, user)), PRIORITY_LOW)
+
+    @commands.command(name='pipeline')
+    @commands.has_permissions(administrator=True)
+    async def pipeline_stats(self, ctx):
+        """Show per-stage throughput, queue depth and shed counts"""
+        embed = discord.Embed(
+            title="🛠️ Activity Pipeline",
+            description=f"Event-loop lag: {self.pipeline.lag * 1000:.0f} ms",
+            color=0x0099ff
+        )
+        for stage in self.pipeline.stats():
+            embed.add_field(
+                name=stage['stage'],
+                value=(f"{stage['processed']:,} processed ({stage['per_second']:.1f}/s)\n"
+                       f"{stage['queued']} queued · {stage['shed']} shed · {stage['errors']} errors"),
+                inline=True
+            )
+        await ctx.send(embed=embed)
 
     @commands.command()
     @commands.cooldown(1, 3, commands.BucketType.user)  # 1 use per 3 seconds per user
     async def points(self, ctx):
         try:
-            conn = db.connect()
-            c = conn.cursor()
-            c.execute('SELECT points FROM users WHERE user_id = ?', (str(ctx.author.id),))
-            data = c.fetchone()
-            pts = data[0] if data else 0
-            conn.close()
+            pts = self.bot.cache.points(str(ctx.author.id))
             
             embed = discord.Embed(
                 title="💰 Points Status",
@@ -169,22 +463,20 @@ class Points(commands.Cog):
             )
             embed.add_field(name="Current Points", value=f"**{pts}** points", inline=True)
             embed.add_field(name="Status", value="✅ Good standing", inline=True)
+            streak = self.bot.cache.activity.streak(str(ctx.author.id))
+            embed.add_field(name="Streak", value=f"🔥 {streak} day{'s' if streak != 1 else ''}", inline=True)
             
             await ctx.send(embed=embed)
             
         except Exception as e:
             await ctx.send("❌ An error occurred while fetching your points. Please try again later.")
-            print(f"Error in points command: {e}")
+            logger.error(f"Error in points command: {e}")
 
     @commands.command()
     @commands.cooldown(1, 5, commands.BucketType.user)  # 1 use per 5 seconds per user
     async def pointshistory(self, ctx):
         try:
-            conn = db.connect()
-            c = conn.cursor()
-            c.execute('SELECT action, points, timestamp FROM points_log WHERE user_id = ? ORDER BY timestamp DESC LIMIT 10', (str(ctx.author.id),))
-            rows = c.fetchall()
-            conn.close()
+            rows = await self.bot.storage.history(str(ctx.author.id), 10)
             
             if not rows:
                 await ctx.send(f"{ctx.author.mention}, you have no point activity yet.")
@@ -207,39 +499,95 @@ class Points(commands.Cog):
             
         except Exception as e:
             await ctx.send("❌ An error occurred while fetching your point history.")
-            print(f"Error in pointshistory command: {e}")
+            logger.error(f"Error in pointshistory command: {e}")
 
     @commands.command()
     @commands.cooldown(1, 10, commands.BucketType.user)  # 1 use per 10 seconds per user
     async def resume(self, ctx):
-        """Upload resume for +20 points"""
+        """Upload your resume (PDF or DOCX attached to the command) for points"""
         try:
-            self.add_points(str(ctx.author.id), 20, "Resume upload")
+            attachment = ctx.message.attachments[0] if ctx.message.attachments else None
+            kind = RESUME_TYPES.get(os.path.splitext(attachment.filename)[1].lower()) if attachment else None
+            if kind is None:
+                await ctx.send("❌ Please attach your resume as a PDF or DOCX file.\n\n**Usage:** `!resume` with the file attached")
+                return
+            if attachment.size > MAX_RESUME_BYTES:
+                await ctx.send(f"❌ Resume files must be under {MAX_RESUME_BYTES // (1024 * 1024)} MB.")
+                return
+            
+            pts, action = self.resolve('resume', ctx.author, ctx.channel)
+            if pts <= 0:
+                await ctx.send(f"❌ {ctx.author.mention}, there are no points available for this right now.")
+                return
+            
+            # Bound concurrent downloads and parses so a workshop rush can't exhaust memory
+            async with self.resume_slots, ctx.typing():
+                data = await self.download_capped(attachment.url, MAX_RESUME_BYTES)
+                if data is None:
+                    await ctx.send(f"❌ Resume files must be under {MAX_RESUME_BYTES // (1024 * 1024)} MB.")
+                    return
+                loop = asyncio.get_running_loop()
+                doc = await asyncio.wait_for(
+                    loop.run_in_executor(self.parser_pool, resume_parser.parse_document, data, kind),
+                    timeout=RESUME_PARSE_TIMEOUT_SECONDS,
+                )
+            
+            if not doc['ok']:
+                await ctx.send(f"❌ {ctx.author.mention}, that file doesn't look like a resume: {doc['reason']}.")
+                return
+            
+            user_id = str(ctx.author.id)
+            owner, award = await self.credit_resume(user_id, pts, action, attachment.filename, doc)
+            if owner is not None:
+                if owner != user_id:
+                    await self.bot.storage.log_suspicious([(
+                        user_id, 'duplicate_resume', f"Same content as a resume uploaded by {owner}",
+                        datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+                    )])
+                await ctx.send(f"❌ {ctx.author.mention}, this resume has already been submitted.")
+                return
+            if award is None:
+                await ctx.send(f"✅ {ctx.author.mention}, your updated resume was saved. "
+                               "Points are only awarded for your first resume upload.")
+                return
+            
             embed = discord.Embed(
                 title="📄 Resume Upload",
-                description=f"{ctx.author.mention}, you've earned **20 points** for uploading your resume!",
+                description=f"{ctx.author.mention}, you've earned **{rules.plural(pts, 'point')}** for uploading your resume!",
                 color=0x00ff00
             )
+            embed.add_field(name="Pages", value=str(doc['pages']), inline=True)
             await ctx.send(embed=embed)
+        except asyncio.TimeoutError:
+            await ctx.send("❌ Your resume took too long to process. Please try a smaller file.")
         except Exception as e:
             await ctx.send("❌ An error occurred while processing your resume upload.")
-            print(f"Error in resume command: {e}")
+            logger.error(f"Error in resume command: {e}")
 
-    @commands.command()
-    @commands.cooldown(1, 10, commands.BucketType.user)  # 1 use per 10 seconds per user
-    async def event(self, ctx):
-        """Mark event attendance for +15 points"""
-        try:
-            self.add_points(str(ctx.author.id), 15, "Event attendance")
-            embed = discord.Embed(
-                title="🎉 Event Attendance",
-                description=f"{ctx.author.mention}, you've earned **15 points** for attending the event!",
-                color=0x00ff00
-            )
-            await ctx.send(embed=embed)
-        except Exception as e:
-            await ctx.send("❌ An error occurred while processing your event attendance.")
-            print(f"Error in event command: {e}")
+    async def download_capped(self, url, max_bytes):
+        """Stream a file into memory; None if it turns out larger than ``max_bytes``"""
+        buffer = bytearray()
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    buffer += chunk
+                    if len(buffer) > max_bytes:
+                        return None
+        return bytes(buffer)
+
+    async def credit_resume(self, user_id, pts, action, filename, doc):
+        """Record the upload and award it in one unit of work
+
+        Returns ``(owner, award)``: ``owner`` is the user who already
+        uploaded this content, else None. Only a user's first resume earns
+        points (so editing a character doesn't earn them again); ``award``
+        is None for later uploads and duplicates.
+        """
+        owner, award = await self.bot.storage.credit_resume(user_id, pts, action, filename, doc)
+        if award:
+            self.after_award(award)
+        return owner, award
 
     @commands.command()
     @commands.cooldown(1, 10, commands.BucketType.user)  # 1 use per 10 seconds per user
@@ -258,6 +606,7 @@ class Points(commands.Cog):
                 INSERT INTO resource_submissions (user_id, resource_description, status)
                 VALUES (?, ?, 'pending')
             ''', (str(ctx.author.id), description.strip()))
+            submission_id = c.lastrowid
             conn.commit()
             conn.close()
             
@@ -282,7 +631,7 @@ class Points(commands.Cog):
             
             embed.add_field(
                 name="🎯 Potential Reward",
-                value="**10 points** (if approved)",
+                value=f"**{rules.plural(self.bot.rules.value('resource', ctx.guild.id if ctx.guild else None), 'point')}** (if approved)",
                 inline=True
             )
             
@@ -297,17 +646,18 @@ class Points(commands.Cog):
             await ctx.send(embed=embed)
             
             # Notify admins about the new submission
-            await self.notify_admins_of_submission(ctx, description)
+            await self.notify_admins_of_submission(ctx, description, submission_id)
             
         except Exception as e:
             await ctx.send("❌ An error occurred while submitting your resource. Please try again.")
-            print(f"Error in resource command: {e}")
+            logger.error(f"Error in resource command: {e}")
 
-    async def notify_admins_of_submission(self, ctx, description):
+    async def notify_admins_of_submission(self, ctx, description, submission_id):
         """Notify admins about a new resource submission"""
         try:
             # Get all admins in the server
-            admins = [member for member in ctx.guild.members if member.guild_permissions.administrator]
+            admins = [ctx.guild.get_member(admin_id) for admin_id in self.bot.cache.guild_admins(ctx.guild)]
+            admins = [admin for admin in admins if admin]
             
             if not admins:
                 return
@@ -339,7 +689,7 @@ class Points(commands.Cog):
             
             embed.add_field(
                 name="🔧 Admin Actions",
-                value="Use `!approveresource <user_id> <points> [notes]` to approve\nUse `!rejectresource <user_id> [reason]` to reject",
+                value=f"Use `!approveresource {submission_id} <points> [notes]` to approve\nUse `!rejectresource {submission_id} [reason]` to reject\nUse `!pendingresources` to review the whole queue",
                 inline=False
             )
             
@@ -352,23 +702,28 @@ class Points(commands.Cog):
                     continue
                     
         except Exception as e:
-            print(f"Error notifying admins: {e}")
+            logger.error(f"Error notifying admins: {e}")
 
     @commands.command()
     @commands.cooldown(1, 10, commands.BucketType.user)  # 1 use per 10 seconds per user
     async def linkedin(self, ctx):
         """Post LinkedIn update for +5 points"""
         try:
-            self.add_points(str(ctx.author.id), 5, "LinkedIn update")
+            source_key = f"cmd:{ctx.message.id}"
+            pts, action = self.resolve('linkedin', ctx.author, ctx.channel, source_key)
+            if pts <= 0:
+                await ctx.send(f"❌ {ctx.author.mention}, there are no points available for this right now.")
+                return
+            await self.award_batch([(str(ctx.author.id), pts, action, source_key)])
             embed = discord.Embed(
                 title="💼 LinkedIn Update",
-                description=f"{ctx.author.mention}, you've earned **5 points** for posting a LinkedIn update!",
+                description=f"{ctx.author.mention}, you've earned **{rules.plural(pts, 'point')}** for posting a LinkedIn update!",
                 color=0x00ff00
             )
             await ctx.send(embed=embed)
         except Exception as e:
             await ctx.send("❌ An error occurred while processing your LinkedIn update.")
-            print(f"Error in linkedin command: {e}")
+            logger.error(f"Error in linkedin command: {e}")
 
     @commands.command()
     @commands.cooldown(1, 5, commands.BucketType.user)  # 1 use per 5 seconds per user
@@ -380,37 +735,28 @@ class Points(commands.Cog):
                 description="Here are the points you can earn for different actions:",
                 color=0x00ff00
             )
-            embed.add_field(name="📄 Resume Upload", value="+20 points", inline=True)
-            embed.add_field(name="🎉 Event Attendance", value="+15 points", inline=True)
-            embed.add_field(name="📚 Resource Share", value="+10 points (after admin review)", inline=True)
-            embed.add_field(name="💼 LinkedIn Update", value="+5 points", inline=True)
-            embed.add_field(name="👍 Liking/Interacting", value="+2 points", inline=True)
-            embed.add_field(name="💬 Message Sent", value="+1 points", inline=True)
+            for rule in self.bot.rules.table.actions(ctx.guild.id if ctx.guild else None):
+                value = f"+{rules.plural(rule.points, 'point')}"
+                if rule.interval_minutes:
+                    value += f" per {rule.interval_minutes} min"
+                if rule.reviewed:
+                    value += " (after admin review)"
+                embed.add_field(name=f"{rule.emoji} {rule.name}", value=value, inline=True)
             
             embed.set_footer(text="Use the commands: !resume, !event, !resource <description>, !linkedin to claim points!")
             await ctx.send(embed=embed)
         except Exception as e:
             await ctx.send("❌ An error occurred while fetching point values.")
-            print(f"Error in pointvalues command: {e}")
+            logger.error(f"Error in pointvalues command: {e}")
 
     @commands.command()
     @commands.cooldown(1, 5, commands.BucketType.user)  # 1 use per 5 seconds per user
     async def milestones(self, ctx):
         """Show available milestones and user's progress"""
         try:
-            conn = db.connect()
-            c = conn.cursor()
-            
-            # Get user's current points
-            c.execute('SELECT points FROM users WHERE user_id = ?', (str(ctx.author.id),))
-            data = c.fetchone()
-            current_points = data[0] if data else 0
-            
-            # Get user's achieved milestones
-            c.execute('SELECT milestone_name FROM milestone_achievements WHERE user_id = ?', (str(ctx.author.id),))
-            achieved_milestones = [row[0] for row in c.fetchall()]
-            
-            conn.close()
+            # Get user's current points and achieved milestones
+            current_points = await self.bot.storage.balance(str(ctx.author.id))
+            achieved_milestones = await self.bot.storage.milestones(str(ctx.author.id))
             
             embed = discord.Embed(
                 title="🏆 Available Incentives & Milestones",
@@ -440,7 +786,7 @@ class Points(commands.Cog):
             
         except Exception as e:
             await ctx.send("❌ An error occurred while fetching milestone information.")
-            print(f"Error in milestones command: {e}")
+            logger.error(f"Error in milestones command: {e}")
 
     @commands.command()
     @commands.has_permissions(administrator=True)
@@ -450,12 +796,7 @@ class Points(commands.Cog):
             target_user = user or ctx.author
             user_id = str(target_user.id)
             
-            conn = db.connect()
-            c = conn.cursor()
-            c.execute('SELECT points FROM users WHERE user_id = ?', (user_id,))
-            data = c.fetchone()
-            current_points = data[0] if data else 0
-            conn.close()
+            current_points = await self.bot.storage.balance(user_id)
             
             await self.check_milestones(user_id, current_points)
             
@@ -470,215 +811,250 @@ class Points(commands.Cog):
             
         except Exception as e:
             await ctx.send("❌ An error occurred while checking milestones.")
-            print(f"Error in checkmilestones command: {e}")
+            logger.error(f"Error in checkmilestones command: {e}")
 
     @commands.command()
     @commands.has_permissions(administrator=True)
-    async def approveresource(self, ctx, user_id: str, points: int, *, notes: str = ""):
-        """Approve a resource submission and award points"""
+    async def approveresource(self, ctx, submission_id: int, points: int, *, notes: str = ""):
+        """Approve a resource submission by ID and award points"""
         try:
-            conn = db.connect()
-            c = conn.cursor()
-            
-            # Find the most recent pending submission for this user
-            c.execute('''
-                SELECT id, resource_description, submitted_at 
-                FROM resource_submissions 
-                WHERE user_id = ? AND status = 'pending' 
-                ORDER BY submitted_at DESC 
-                LIMIT 1
-            ''', (user_id,))
-            
-            submission = c.fetchone()
-            
-            if not submission:
-                await ctx.send(f"❌ No pending resource submissions found for user ID: {user_id}")
-                conn.close()
+            approved = await self.bot.storage.approve_resources(
+                [submission_id], str(ctx.author.id), points, notes,
+                f"Resource share approved by {ctx.author.display_name}"
+            )
+
+            if not approved:
+                await ctx.send(f"❌ No pending resource submission found with ID: {submission_id}")
                 return
-            
-            submission_id, description, submitted_at = submission
-            
-            # Update the submission status
-            c.execute('''
-                UPDATE resource_submissions 
-                SET status = 'approved', reviewed_by = ?, reviewed_at = CURRENT_TIMESTAMP, 
-                    points_awarded = ?, review_notes = ?
-                WHERE id = ?
-            ''', (str(ctx.author.id), points, notes, submission_id))
-            
-            # Award points to the user
-            self.add_points(user_id, points, f"Resource share approved by {ctx.author.display_name}")
-            
-            conn.commit()
-            conn.close()
-            
+
+            _, user_id, description, award = approved[0]
+            if award:
+                self.after_award(award)
+
             # Create approval embed
             embed = discord.Embed(
                 title="✅ Resource Approved!",
-                description=f"Resource submission has been approved and points awarded!",
+                description=f"Resource submission #{submission_id} has been approved and points awarded!",
                 color=0x00ff00
             )
-            
+
             embed.add_field(
                 name="👤 User",
                 value=f"<@{user_id}>",
                 inline=True
             )
-            
+
             embed.add_field(
                 name="🎯 Points Awarded",
                 value=f"**{points} points**",
                 inline=True
             )
-            
+
             embed.add_field(
                 name="👨‍⚖️ Reviewed By",
                 value=ctx.author.display_name,
                 inline=True
             )
-            
+
             embed.add_field(
                 name="📝 Description",
                 value=description[:500] + "..." if len(description) > 500 else description,
                 inline=False
             )
-            
+
             if notes:
                 embed.add_field(
                     name="📋 Review Notes",
                     value=notes,
                     inline=False
                 )
-            
+
             await ctx.send(embed=embed)
-            
+
             # Notify the user about the approval
             await self.notify_user_of_approval(user_id, points, notes)
-            
+
         except Exception as e:
             await ctx.send(f"❌ Error approving resource: {e}")
-            print(f"Error in approveresource command: {e}")
+            logger.error(f"Error in approveresource command: {e}")
 
     @commands.command()
     @commands.has_permissions(administrator=True)
-    async def rejectresource(self, ctx, user_id: str, *, reason: str = "No reason provided"):
-        """Reject a resource submission"""
+    async def rejectresource(self, ctx, submission_id: int, *, reason: str = "No reason provided"):
+        """Reject a resource submission by ID"""
         try:
-            conn = db.connect()
-            c = conn.cursor()
-            
-            # Find the most recent pending submission for this user
-            c.execute('''
-                SELECT id, resource_description, submitted_at 
-                FROM resource_submissions 
-                WHERE user_id = ? AND status = 'pending' 
-                ORDER BY submitted_at DESC 
-                LIMIT 1
-            ''', (user_id,))
-            
-            submission = c.fetchone()
-            
-            if not submission:
-                await ctx.send(f"❌ No pending resource submissions found for user_id: {user_id}")
-                conn.close()
+            rejected = await asyncio.to_thread(review_queue.reject, [submission_id], str(ctx.author.id), reason)
+
+            if not rejected:
+                await ctx.send(f"❌ No pending resource submission found with ID: {submission_id}")
                 return
-            
-            submission_id, description, submitted_at = submission
-            
-            # Update the submission status
-            c.execute('''
-                UPDATE resource_submissions 
-                SET status = 'rejected', reviewed_by = ?, reviewed_at = CURRENT_TIMESTAMP, 
-                    review_notes = ?
-                WHERE id = ?
-            ''', (str(ctx.author.id), reason, submission_id))
-            
-            conn.commit()
-            conn.close()
-            
+
+            _, user_id, description = rejected[0]
+
             # Create rejection embed
             embed = discord.Embed(
                 title="❌ Resource Rejected",
-                description=f"Resource submission has been rejected.",
+                description=f"Resource submission #{submission_id} has been rejected.",
                 color=0xff0000
             )
-            
+
             embed.add_field(
                 name="👤 User",
                 value=f"<@{user_id}>",
                 inline=True
             )
-            
+
             embed.add_field(
                 name="👨‍⚖️ Reviewed By",
                 value=ctx.author.display_name,
                 inline=True
             )
-            
+
             embed.add_field(
                 name="📝 Description",
                 value=description[:500] + "..." if len(description) > 500 else description,
                 inline=False
             )
-            
+
             embed.add_field(
                 name="❌ Rejection Reason",
                 value=reason,
                 inline=False
             )
-            
+
             await ctx.send(embed=embed)
-            
+
             # Notify the user about the rejection
             await self.notify_user_of_rejection(user_id, reason)
-            
+
         except Exception as e:
             await ctx.send(f"❌ Error rejecting resource: {e}")
-            print(f"Error in rejectresource command: {e}")
+            logger.error(f"Error in rejectresource command: {e}")
 
     @commands.command()
     @commands.has_permissions(administrator=True)
-    async def pendingresources(self, ctx):
-        """Show all pending resource submissions"""
+    async def bulkapprove(self, ctx, points: int, submission_ids: commands.Greedy[SubmissionIds], *, notes: str = ""):
+        """Approve many submissions at once, e.g. `!bulkapprove 10 12 15 20-40 | great links`"""
         try:
-            conn = db.connect()
-            c = conn.cursor()
-            
-            c.execute('''
-                SELECT rs.user_id, rs.resource_description, rs.submitted_at, rs.id
-                FROM resource_submissions rs
-                WHERE rs.status = 'pending'
-                ORDER BY rs.submitted_at DESC
-            ''')
-            
-            submissions = c.fetchall()
-            conn.close()
-            
+            ids = [sub_id for group in submission_ids for sub_id in group]
+            notes = review_text(notes, "")
+            if not ids or notes is None:
+                await ctx.send("❌ Provide submission IDs or ranges, then `|` before any notes, "
+                               "e.g. `!bulkapprove 10 12 15 20-40 | great links`")
+                return
+
+            action = f"Resource share approved by {ctx.author.display_name}"
+            approved = await self.bot.storage.approve_resources(ids, str(ctx.author.id), points, notes, action)
+
+            for _, _, _, award in approved:
+                if award:
+                    self.after_award(award)
+
+            pending = await asyncio.to_thread(review_queue.pending_count)
+            await ctx.send(embed=self.bulk_review_embed("✅ Bulk Approval", approved, ids, 0x00ff00, pending))
+
+            # DM authors in the background so large batches don't hold up the command
+            asyncio.create_task(self.notify_users(
+                [user_id for _, user_id, _, _ in approved],
+                lambda user_id: self.notify_user_of_approval(user_id, points, notes)
+            ))
+
+        except Exception as e:
+            await ctx.send(f"❌ Error approving resources: {e}")
+            logger.error(f"Error in bulkapprove command: {e}")
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def bulkreject(self, ctx, submission_ids: commands.Greedy[SubmissionIds], *, reason: str = ""):
+        """Reject many submissions at once, e.g. `!bulkreject 12 15 20-40 | spam`"""
+        try:
+            ids = [sub_id for group in submission_ids for sub_id in group]
+            reason = review_text(reason, "No reason provided")
+            if not ids or reason is None:
+                await ctx.send("❌ Provide submission IDs or ranges, then `|` before the reason, "
+                               "e.g. `!bulkreject 12 15 20-40 | spam`")
+                return
+
+            rejected = await asyncio.to_thread(review_queue.reject, ids, str(ctx.author.id), reason)
+            pending = await asyncio.to_thread(review_queue.pending_count)
+
+            await ctx.send(embed=self.bulk_review_embed("❌ Bulk Rejection", rejected, ids, 0xff0000, pending))
+
+            asyncio.create_task(self.notify_users(
+                [user_id for _, user_id, _ in rejected],
+                lambda user_id: self.notify_user_of_rejection(user_id, reason)
+            ))
+
+        except Exception as e:
+            await ctx.send(f"❌ Error rejecting resources: {e}")
+            logger.error(f"Error in bulkreject command: {e}")
+
+    def bulk_review_embed(self, title, reviewed, requested_ids, color, pending):
+        """Summarize a bulk review for the moderator, with ``pending`` submissions left"""
+        requested = len(set(requested_ids[:review_queue.MAX_BULK]))
+        embed = discord.Embed(
+            title=title,
+            description=f"Reviewed **{len(reviewed)}** of {requested} requested submissions.",
+            color=color
+        )
+        if len(reviewed) < requested:
+            embed.add_field(
+                name="⚠️ Skipped",
+                value=f"{requested - len(reviewed)} submissions were not pending or do not exist.",
+                inline=False
+            )
+        if len(requested_ids) > review_queue.MAX_BULK:
+            embed.add_field(
+                name="⚠️ Limit",
+                value=f"Only the first {review_queue.MAX_BULK} IDs were processed.",
+                inline=False
+            )
+        embed.set_footer(text=f"{pending} submissions still pending")
+        return embed
+
+    async def notify_users(self, user_ids, notify):
+        """Send per-user review notifications, one at a time"""
+        for user_id in user_ids:
+            await notify(user_id)
+            await asyncio.sleep(0.5)  # Stay well under Discord's DM rate limits
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def pendingresources(self, ctx, after_id: int = None):
+        """Show pending resource submissions, oldest first, a page at a time"""
+        try:
+            submissions = await asyncio.to_thread(review_queue.pending_page, after_id)
+            total_pending = await asyncio.to_thread(review_queue.pending_count)
+
             if not submissions:
-                await ctx.send("✅ No pending resource submissions!")
+                if after_id is None:
+                    await ctx.send("✅ No pending resource submissions!")
+                else:
+                    await ctx.send(f"✅ No pending submissions after ID {after_id}.")
                 return
-            
+
             embed = discord.Embed(
                 title="📚 Pending Resource Submissions",
-                description=f"Found **{len(submissions)}** pending submissions:",
+                description=f"Found **{total_pending}** pending submissions:",
                 color=0xff9900
             )
-            
-            for i, (user_id, description, submitted_at, submission_id) in enumerate(submissions[:10], 1):
+
+            for submission_id, user_id, description, submitted_at in submissions:
                 embed.add_field(
-                    name=f"#{i} - <@{user_id}>",
-                    value=f"**Submitted:** <t:{int(datetime.fromisoformat(submitted_at).timestamp())}:R>\n**Description:** {description[:200]}...\n**ID:** {submission_id}",
+                    name=f"ID {submission_id}",
+                    value=f"**User:** <@{user_id}>\n**Submitted:** <t:{int(datetime.fromisoformat(submitted_at).replace(tzinfo=timezone.utc).timestamp())}:R>\n**Description:** {description[:200]}...",
                     inline=False
                 )
-            
-            if len(submissions) > 10:
-                embed.set_footer(text=f"And {len(submissions) - 10} more submissions...")
-            
+
+            last_id = submissions[-1][0]
+            if len(submissions) == review_queue.PAGE_SIZE:
+                embed.set_footer(text=f"Next page: !pendingresources {last_id}")
+
             await ctx.send(embed=embed)
-            
+
         except Exception as e:
             await ctx.send(f"❌ Error fetching pending resources: {e}")
-            print(f"Error in pendingresources command: {e}")
+            logger.error(f"Error in pendingresources command: {e}")
 
     async def notify_user_of_approval(self, user_id: str, points: int, notes: str):
         """Notify user that their resource was approved"""
@@ -715,7 +1091,7 @@ class Points(commands.Cog):
                 await user.send(embed=embed)
                 
         except Exception as e:
-            print(f"Error notifying user of approval: {e}")
+            logger.error(f"Error notifying user of approval: {e}")
 
     async def notify_user_of_rejection(self, user_id: str, reason: str):
         """Notify user that their resource was rejected"""
@@ -745,7 +1121,7 @@ class Points(commands.Cog):
                 await user.send(embed=embed)
                 
         except Exception as e:
-            print(f"Error notifying user of rejection: {e}")
+            logger.error(f"Error notifying user of rejection: {e}")
 
 async def setup(bot):
     await bot.add_cog(Points(bot))
@@ -0,0 +1,114 @@
+"""
+Message quality gate
+
+Cheap checks run before a message earns points, to stop copy-paste and
+"a" / "b" / "c" farming:
+
+    short        fewer than MIN_MESSAGE_CHARS letters or digits
+    low entropy  character entropy under MIN_ENTROPY_BITS ("hahahahaha")
+    duplicate    SimHash within NEAR_DUPLICATE_BITS of one of the user's
+                 last RECENT_MESSAGES messages
+
+Text is truncated to MAX_CHECKED_CHARS, so every check is constant time per
+message. Fingerprints are kept in a fixed-size ring per user, and only the
+MAX_TRACKED_USERS most recently active users are tracked, so memory is
+bounded too. Fingerprints remember their message ID, so a message checked
+again (a backfill after a reconnect) isn't taken for a copy of itself.
+Rejections are queued, at most MAX_QUEUED_REJECTIONS of them, and written
+to suspicious_activity in batches (see Points.flush_rejections).
+"""
+
+import math
+import re
+from collections import Counter, OrderedDict, deque
+from datetime import datetime
+from hashlib import blake2b
+
+MIN_MESSAGE_CHARS = 5
+MIN_ENTROPY_BITS = 1.5
+MAX_CHECKED_CHARS = 512
+SHINGLE_SIZE = 4
+RECENT_MESSAGES = 8
+NEAR_DUPLICATE_BITS = 6
+MAX_TRACKED_USERS = 10000
+MAX_QUEUED_REJECTIONS = 5000
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(text):
+    """Lowercase, drop punctuation and collapse whitespace, so 'Hi!!' matches 'hi'"""
+    text = _PUNCTUATION.sub('', text[:MAX_CHECKED_CHARS].lower())
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def entropy(text):
+    """Shannon entropy of the text's characters, in bits per character"""
+    total = len(text)
+    return -sum(n / total * math.log2(n / total) for n in Counter(text).values())
+
+
+def simhash(text):
+    """64-bit SimHash over character shingles; similar texts differ in few bits"""
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(max(1, len(text) - SHINGLE_SIZE + 1))}
+    # Count set bits column-wise over the hashes' binary strings, which is
+    # much faster in CPython than shifting each hash 64 times
+    hashes = [format(int.from_bytes(blake2b(s.encode(), digest_size=8).digest(), 'little'), '064b')
+              for s in shingles]
+    half = len(hashes) / 2
+    fingerprint = 0
+    for column in zip(*hashes):
+        fingerprint = (fingerprint << 1) | (column.count('1') > half)
+    return fingerprint
+
+
+def distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class QualityGate:
+    def __init__(self):
+        self.recent = OrderedDict()  # user_id -> deque of recent (message_id, fingerprint), LRU order
+        # (user_id, activity_type, details, timestamp) awaiting a flush; the oldest go first when full
+        self.rejections = deque(maxlen=MAX_QUEUED_REJECTIONS)
+        self.dropped = 0
+
+    def check(self, user_id, content, message_id=None):
+        """Whether a message may earn points; queues a rejection if not"""
+        text = normalize(content)
+        if sum(ch.isalnum() for ch in text) < MIN_MESSAGE_CHARS:
+            return self.reject(user_id, 'short_message', text)
+        if entropy(text) < MIN_ENTROPY_BITS:
+            return self.reject(user_id, 'low_entropy_message', text)
+
+        fingerprint = simhash(text)
+        recent = self.recent.get(user_id)
+        if recent is None:
+            recent = self.recent[user_id] = deque(maxlen=RECENT_MESSAGES)
+            if len(self.recent) > MAX_TRACKED_USERS:
+                self.recent.popitem(last=False)
+        else:
+            self.recent.move_to_end(user_id)
+
+        for previous_id, previous in recent:
+            if message_id is not None and previous_id == message_id:
+                return True  # Already checked and accepted
+            if distance(fingerprint, previous) <= NEAR_DUPLICATE_BITS:
+                return self.reject(user_id, 'duplicate_message', text)
+        recent.append((message_id, fingerprint))
+        return True
+
+    def reject(self, user_id, activity_type, text):
+        timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        if len(self.rejections) == self.rejections.maxlen:
+            self.dropped += 1
+        self.rejections.append((user_id, activity_type, text[:200], timestamp))
+        return False
+
+    def take_rejections(self):
+        """``(rejections, dropped)``: the queued rows and how many were dropped since the last take"""
+        rejections, dropped = list(self.rejections), self.dropped
+        self.rejections.clear()
+        self.dropped = 0
+        return rejections, dropped
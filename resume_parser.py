@@ -0,0 +1,105 @@
+"""
+Resume document checks, run in a worker process
+
+``parse_document`` is a pure function of the file bytes so the bot can hand
+it to a ProcessPoolExecutor: PDF decompression and text extraction are CPU
+bound and would otherwise stall the event loop during busy workshops.
+
+PDFs are read with pypdf when it is installed. Without it, a small built-in
+reader counts page objects and pulls text operators out of the
+(Flate-compressed) content streams, which is enough to tell a real document
+from an empty or junk file. DOCX files are zip archives and only need the
+standard library.
+"""
+
+import hashlib
+import io
+import re
+import zipfile
+import zlib
+
+MIN_PAGES = 1
+MAX_PAGES = 5
+MIN_TEXT_CHARS = 200
+
+_PDF_PAGE = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+_PDF_STREAM = re.compile(rb'stream\r?\n(.*?)\r?\nendstream', re.S)
+_PDF_TEXT = re.compile(rb'\((?:\\.|[^\\)])*\)\s*(?:Tj|\'|")|\[(?:\\.|[^\]])*\]\s*TJ|<[0-9A-Fa-f\s]+>\s*Tj')
+# Operators and string delimiters around the text itself
+_PDF_OPERATOR = re.compile(rb'\s*(?:Tj|TJ|\'|")\s*$|[()\[\]<>]')
+_DOCX_TEXT = re.compile(r'<w:t(?:\s[^>]*)?>([^<]*)</w:t>')
+_DOCX_PAGES = re.compile(r'<Pages>(\d+)</Pages>')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _pdf_with_pypdf(data):
+    import pypdf
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    text = "\n".join(page.extract_text() or "" for page in reader.pages)
+    return len(reader.pages), text
+
+
+def _pdf_builtin(data):
+    pages = len(_PDF_PAGE.findall(data))
+    chunks = []
+    for stream in _PDF_STREAM.findall(data):
+        try:
+            stream = zlib.decompress(stream)
+        except zlib.error:
+            pass  # Uncompressed, or a filter we don't decode (images, fonts)
+        chunks.extend(_PDF_OPERATOR.sub(b'', match).decode('latin-1') for match in _PDF_TEXT.findall(stream))
+    return pages, "\n".join(chunks)
+
+
+def _docx(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        document = archive.read('word/document.xml').decode('utf-8', 'replace')
+        try:
+            app = archive.read('docProps/app.xml').decode('utf-8', 'replace')
+            match = _DOCX_PAGES.search(app)
+        except KeyError:
+            match = None
+    text = " ".join(_DOCX_TEXT.findall(document))
+    # Word records the page count it last rendered; assume one page if absent
+    pages = int(match.group(1)) if match else 1
+    return pages, text
+
+
+def parse_document(data, kind):
+    """Check a ``'pdf'`` or ``'docx'`` upload.
+
+    Returns a dict with ``ok``, ``reason`` (when not ok), ``pages``,
+    ``text_chars``, ``file_hash`` (sha256 of the bytes) and ``content_hash``
+    (sha256 of the normalized text, so a re-saved copy of the same resume
+    still matches).
+    """
+    result = {'ok': False, 'reason': None, 'pages': 0, 'text_chars': 0,
+              'file_hash': hashlib.sha256(data).hexdigest(), 'content_hash': None}
+    try:
+        if kind == 'pdf':
+            if not data.startswith(b'%PDF-'):
+                result['reason'] = "not a PDF file"
+                return result
+            try:
+                pages, text = _pdf_with_pypdf(data)
+            except ImportError:
+                pages, text = _pdf_builtin(data)
+        elif kind == 'docx':
+            pages, text = _docx(data)
+        else:
+            result['reason'] = "unsupported file type"
+            return result
+    except Exception as e:
+        result['reason'] = f"could not read the file ({type(e).__name__})"
+        return result
+
+    text = _WHITESPACE.sub(' ', text).strip().lower()
+    result.update(pages=pages, text_chars=len(text),
+                  content_hash=hashlib.sha256(text.encode('utf-8')).hexdigest())
+    if not MIN_PAGES <= pages <= MAX_PAGES:
+        result['reason'] = f"expected {MIN_PAGES}-{MAX_PAGES} pages, found {pages}"
+    elif len(text) < MIN_TEXT_CHARS:
+        result['reason'] = "the document has too little text to be a resume"
+    else:
+        result['ok'] = True
+    return result
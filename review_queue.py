@@ -0,0 +1,171 @@
+"""
+Resource submission review queue
+
+All lookups go through idx_resource_submissions_queue (status, submitted_at, id):
+pages are read oldest-first with keyset pagination, and approvals/rejections
+address submissions by ID so a review never scans a user's history.
+"""
+
+import db
+
+PAGE_SIZE = 10
+# Upper bound on submissions reviewed by a single bulk command
+MAX_BULK = 500
+
+
+def pending_count():
+    conn = db.connect()
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*) FROM resource_submissions WHERE status = 'pending'")
+    count = c.fetchone()[0]
+    conn.close()
+    return count
+
+
+def pending_page(after_id=None, limit=PAGE_SIZE):
+    """Return up to ``limit`` pending submissions queued after ``after_id``.
+
+    Rows are ``(id, user_id, resource_description, submitted_at)``, oldest first.
+    An ``after_id`` that doesn't exist gives an empty page rather than
+    silently restarting from the first one.
+    """
+    conn = db.connect()
+    c = conn.cursor()
+    cursor_key = None
+    if after_id is not None:
+        c.execute('SELECT submitted_at, id FROM resource_submissions WHERE id = ?', (after_id,))
+        cursor_key = c.fetchone()
+        if cursor_key is None:
+            conn.close()
+            return []
+
+    if cursor_key:
+        c.execute('''
+            SELECT id, user_id, resource_description, submitted_at
+            FROM resource_submissions
+            WHERE status = 'pending' AND (submitted_at, id) > (?, ?)
+            ORDER BY submitted_at, id
+            LIMIT ?
+        ''', (*cursor_key, limit))
+    else:
+        c.execute('''
+            SELECT id, user_id, resource_description, submitted_at
+            FROM resource_submissions
+            WHERE status = 'pending'
+            ORDER BY submitted_at, id
+            LIMIT ?
+        ''', (limit,))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+
+def enqueue_links(links):
+    """Queue ``(user_id, description, url, url_hash)`` links for review.
+
+    A link whose normalized URL was already submitted (by anyone) is skipped.
+    Returns ``(submission_id, url)`` for the rows that were queued.
+    """
+    queued = []
+    with db.transaction() as c:
+        for user_id, description, url, url_hash in links:
+            c.execute('''
+                INSERT OR IGNORE INTO resource_submissions (user_id, resource_description, status, url, url_hash)
+                VALUES (?, ?, 'pending', ?, ?)
+            ''', (user_id, description, url, url_hash))
+            if c.rowcount:
+                queued.append((c.lastrowid, url))
+    return queued
+
+
+def _claim_pending(c, submission_ids):
+    """Fetch the still-pending rows among ``submission_ids``."""
+    placeholders = ','.join('?' * len(submission_ids))
+    c.execute(f'''
+        SELECT id, user_id, resource_description
+        FROM resource_submissions
+        WHERE status = 'pending' AND id IN ({placeholders})
+        ORDER BY id
+    ''', tuple(submission_ids))
+    return c.fetchall()
+
+
+def _mark_approved(c, submission_ids, reviewer_id, points, notes):
+    rows = _claim_pending(c, submission_ids)
+    c.executemany('''
+        UPDATE resource_submissions
+        SET status = 'approved', reviewed_by = ?, reviewed_at = CURRENT_TIMESTAMP,
+            points_awarded = ?, review_notes = ?
+        WHERE id = ?
+    ''', [(reviewer_id, points, notes, sub_id) for sub_id, _, _ in rows])
+    return rows
+
+
+def approve(submission_ids, reviewer_id, points, notes, action):
+    """Approve pending submissions and credit their authors in one unit of work.
+
+    Submissions that are missing or already reviewed are skipped. Returns a
+    list of ``(submission_id, user_id, description, award)`` for the approved
+    rows, where ``award`` is the committed db.Award for the author.
+    """
+    submission_ids = list(submission_ids)[:MAX_BULK]
+    if not submission_ids:
+        return []
+
+    approved = []
+    with db.transaction() as c:
+        rows = _mark_approved(c, submission_ids, reviewer_id, points, notes)
+        for sub_id, user_id, description in rows:
+            award = db.award_points(c, user_id, points, action, f"resource:{sub_id}")
+            approved.append((sub_id, user_id, description, award))
+
+    return approved
+
+
+def mark_approved(submission_ids, reviewer_id, points, notes):
+    """Approve pending submissions without crediting anyone.
+
+    For ledgers outside SQLite (storage.PostgresStorage), which credit the
+    authors afterwards and reopen() the rows if that fails. Returns
+    ``(submission_id, user_id, description)`` for each approved row.
+    """
+    submission_ids = list(submission_ids)[:MAX_BULK]
+    if not submission_ids:
+        return []
+    with db.transaction() as c:
+        return _mark_approved(c, submission_ids, reviewer_id, points, notes)
+
+
+def reopen(submission_ids):
+    """Put approved submissions back in the queue (their points couldn't be credited)"""
+    if not submission_ids:
+        return
+    placeholders = ','.join('?' * len(submission_ids))
+    with db.transaction() as c:
+        c.execute(f'''
+            UPDATE resource_submissions
+            SET status = 'pending', reviewed_by = NULL, reviewed_at = NULL,
+                points_awarded = NULL, review_notes = NULL
+            WHERE status = 'approved' AND id IN ({placeholders})
+        ''', tuple(submission_ids))
+
+
+def reject(submission_ids, reviewer_id, reason):
+    """Reject pending submissions in one transaction.
+
+    Returns ``(submission_id, user_id, description)`` for each rejected row.
+    """
+    submission_ids = list(submission_ids)[:MAX_BULK]
+    if not submission_ids:
+        return []
+
+    with db.transaction() as c:
+        rows = _claim_pending(c, submission_ids)
+        c.executemany('''
+            UPDATE resource_submissions
+            SET status = 'rejected', reviewed_by = ?, reviewed_at = CURRENT_TIMESTAMP,
+                review_notes = ?
+            WHERE id = ?
+        ''', [(reviewer_id, reason, sub_id) for sub_id, _, _ in rows])
+
+    return rows
@@ -0,0 +1,293 @@
+"""
+Points rule engine
+
+Point values live in points_rules.json (P2E_RULES_PATH) instead of being
+hard-coded in the cogs:
+
+    {
+      "actions": {"message": {"points": 1, "label": "Message sent", ...}, ...},
+      "max_multiplier": 3.0,
+      "links": {"channels": ["<channel_id>"], "allow": ["github.com"], "deny": ["bit.ly"]},
+      "guilds": {
+        "<guild_id>": {
+          "multiplier": 1.0,
+          "actions": {"message": {"daily_cap": 100}},
+          "channels": {"<channel_id>": {"multiplier": 2.0, "actions": {...}}},
+          "roles": {"<role_id>": 1.5}
+        }
+      }
+    }
+
+Guild and channel entries override individual action fields. Multipliers
+stack guild x channel x best matching role and are clamped to
+max_multiplier; a daily_cap limits the points one user can earn from an
+action per day.
+
+``links`` configures automatic resource detection (links.py): messages in
+the listed channels are scanned for URLs on the allow list (any domain if
+it is empty) and not on the deny list.
+
+Everything is compiled once per load into a flat dict keyed
+(guild_id, channel_id, action), so resolving an award is at most three
+dict lookups however large the config grows. The file is re-read when its
+mtime changes (see rules_loop in bot.py and !reloadrules).
+"""
+
+import json
+import os
+from collections import namedtuple
+from datetime import datetime, timezone
+
+RULES_PATH = os.getenv('P2E_RULES_PATH', 'points_rules.json')
+RULES_RELOAD_SECONDS = 10
+
+# One action's settings after guild/channel overrides are applied
+Rule = namedtuple('Rule', ['action', 'points', 'label', 'name', 'emoji', 'summary',
+                           'command', 'help', 'reviewed', 'daily_cap', 'interval_minutes', 'multiplier'])
+
+RULE_FIELDS = {'points', 'label', 'name', 'emoji', 'summary', 'command', 'help', 'reviewed', 'daily_cap',
+               'interval_minutes'}
+LINK_FIELDS = {'channels', 'allow', 'deny'}
+
+
+class RuleError(ValueError):
+    """The rules file is malformed"""
+
+
+def _merge(base, overrides, where):
+    """Apply per-action field overrides to a {action: fields} mapping"""
+    merged = {action: dict(fields) for action, fields in base.items()}
+    for action, fields in (overrides or {}).items():
+        if action not in merged:
+            raise RuleError(f"{where}: unknown action '{action}'")
+        unknown = set(fields) - RULE_FIELDS
+        if unknown:
+            raise RuleError(f"{where}: unknown fields {sorted(unknown)} for '{action}'")
+        merged[action].update(fields)
+    return merged
+
+
+def _rules(actions, multiplier):
+    return {
+        action: Rule(
+            action=action,
+            points=int(fields.get('points', 0)),
+            label=fields.get('label', action),
+            name=fields.get('name', action.title()),
+            emoji=fields.get('emoji', ''),
+            summary=fields.get('summary', ''),
+            command=fields.get('command'),
+            help=fields.get('help', ''),
+            reviewed=bool(fields.get('reviewed', False)),
+            daily_cap=fields.get('daily_cap'),
+            interval_minutes=fields.get('interval_minutes'),
+            multiplier=multiplier,
+        )
+        for action, fields in actions.items()
+    }
+
+
+class RuleTable:
+    """Compiled, read-only view of a rules config"""
+
+    def __init__(self, config):
+        base = {action: dict(fields) for action, fields in config.get('actions', {}).items()}
+        for action, fields in base.items():
+            unknown = set(fields) - RULE_FIELDS
+            if unknown:
+                raise RuleError(f"actions: unknown fields {sorted(unknown)} for '{action}'")
+
+        self.order = list(base)
+        self.max_multiplier = float(config.get('max_multiplier', 1.0))
+        self.table = {}
+        self.roles = {}  # guild_id -> {role_id: multiplier}
+
+        for action, rule in _rules(base, 1.0).items():
+            self.table[(None, None, action)] = rule
+
+        for guild_key, guild in config.get('guilds', {}).items():
+            guild_id = int(guild_key)
+            guild_actions = _merge(base, guild.get('actions'), f"guild {guild_id}")
+            guild_multiplier = float(guild.get('multiplier', 1.0))
+            for action, rule in _rules(guild_actions, guild_multiplier).items():
+                self.table[(guild_id, None, action)] = rule
+
+            for channel_key, channel in guild.get('channels', {}).items():
+                channel_id = int(channel_key)
+                channel_actions = _merge(guild_actions, channel.get('actions'), f"channel {channel_id}")
+                multiplier = guild_multiplier * float(channel.get('multiplier', 1.0))
+                for action, rule in _rules(channel_actions, multiplier).items():
+                    self.table[(guild_id, channel_id, action)] = rule
+
+            self.roles[guild_id] = {int(role_id): float(m) for role_id, m in guild.get('roles', {}).items()}
+
+        links = config.get('links', {})
+        unknown = set(links) - LINK_FIELDS
+        if unknown:
+            raise RuleError(f"links: unknown fields {sorted(unknown)}")
+        self.link_channels = frozenset(int(channel_id) for channel_id in links.get('channels', ()))
+        self.link_allow = tuple(domain.lower() for domain in links.get('allow', ()))
+        self.link_deny = tuple(domain.lower() for domain in links.get('deny', ()))
+
+        # Ledger label -> action, for the actions that have a daily cap anywhere
+        self.capped_labels = {}
+        for rule in self.table.values():
+            if rule.daily_cap is not None:
+                self.capped_labels.setdefault(rule.label, rule.action)
+
+    def rule(self, action, guild_id=None, channel_id=None):
+        """The most specific rule for an action; KeyError if it is not configured"""
+        table = self.table
+        return (table.get((guild_id, channel_id, action))
+                or table.get((guild_id, None, action))
+                or table[(None, None, action)])
+
+    def points(self, action, guild_id=None, channel_id=None, role_ids=()):
+        """``(rule, points)`` for one award before daily caps"""
+        rule = self.rule(action, guild_id, channel_id)
+        multiplier = rule.multiplier
+        guild_roles = self.roles.get(guild_id)
+        if guild_roles:
+            multiplier *= max((guild_roles[r] for r in role_ids if r in guild_roles), default=1.0)
+        return rule, round(rule.points * min(multiplier, self.max_multiplier))
+
+    def actions(self, guild_id=None):
+        """Guild-level rules in config order, for rendering"""
+        return [self.rule(action, guild_id) for action in self.order]
+
+
+def _today():
+    return datetime.now(timezone.utc).date()
+
+
+class RuleEngine:
+    """Holds the current RuleTable, hot-reloads it and enforces daily caps
+
+    Capped points are only charged once the ledger has credited them: award()
+    holds them under the award's source key and settle() charges or releases
+    the hold after the write, so failed writes and replayed keys don't use up
+    a user's cap. Days are UTC days, like points_daily, and seed() charges
+    what the ledger already credited today after a restart.
+    """
+
+    def __init__(self, path=RULES_PATH):
+        self.path = path
+        self.mtime = None
+        self.table = RuleTable({})
+        self.day = _today()
+        self.earned = {}  # (user_id, action) -> points credited today
+        self.held = {}    # (user_id, action) -> points awarded but not yet written
+        self.holds = {}   # source_key -> ((user_id, action), points)
+
+    def load(self):
+        """(Re)compile the rules file; the current table stays if it is invalid"""
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, encoding='utf-8') as f:
+            try:
+                config = json.load(f)
+            except json.JSONDecodeError as e:
+                raise RuleError(f"{self.path}: {e}") from e
+        self.table = RuleTable(config)
+        self.mtime = mtime
+
+    def reload_if_changed(self):
+        """Reload when the file changed on disk; returns True if it did"""
+        if os.stat(self.path).st_mtime == self.mtime:
+            return False
+        self.load()
+        return True
+
+    def _roll_day(self):
+        today = _today()
+        if today != self.day:
+            self.day, self.earned, self.held, self.holds = today, {}, {}, {}
+
+    def seed(self, rows):
+        """Charge today's ledger, as ``(user_id, ledger label, points)`` rows, against the daily caps"""
+        self._roll_day()
+        labels = self.table.capped_labels
+        earned = {}
+        for user_id, label, points in rows:
+            # Event awards are logged as '<label>: <event name>'
+            action = labels.get(label) or labels.get(label.split(': ', 1)[0])
+            if action is not None:
+                key = (str(user_id), action)
+                earned[key] = earned.get(key, 0) + points
+        self.earned = earned
+
+    def award(self, action, user_id, guild_id=None, channel_id=None, role_ids=(), units=1, source_key=None):
+        """Resolve ``units`` awards to ``(points, ledger label)``; points is 0 if nothing is due
+
+        Capped points are held under ``source_key`` until settle() (charged
+        at once without a key). A key that is already held earns nothing, as
+        the ledger would ignore it.
+        """
+        try:
+            rule, pts = self.table.points(action, guild_id, channel_id, role_ids)
+        except KeyError:
+            return 0, action  # Not configured (or no rules loaded): nothing is due
+        pts *= units
+        if rule.daily_cap is None or pts <= 0:
+            return pts, rule.label
+
+        self._roll_day()
+        if source_key is not None and source_key in self.holds:
+            return 0, rule.label
+        key = (user_id, action)
+        used = self.earned.get(key, 0) + self.held.get(key, 0)
+        pts = max(0, min(pts, rule.daily_cap - used))
+        if pts:
+            if source_key is None:
+                self.earned[key] = self.earned.get(key, 0) + pts
+            else:
+                self.held[key] = self.held.get(key, 0) + pts
+                self.holds[source_key] = (key, pts)
+        return pts, rule.label
+
+    def settle(self, source_keys, credited_keys):
+        """Charge the holds of ``source_keys`` the ledger credited and release the rest"""
+        for source_key in source_keys:
+            hold = self.holds.pop(source_key, None)
+            if hold is None:
+                continue  # Uncapped, or held before the day rolled over
+            key, pts = hold
+            held = self.held.get(key, 0) - pts
+            if held > 0:
+                self.held[key] = held
+            else:
+                self.held.pop(key, None)
+            if source_key in credited_keys:
+                self.earned[key] = self.earned.get(key, 0) + pts
+
+    def value(self, action, guild_id=None):
+        """Base points for an action, for display"""
+        try:
+            return self.table.rule(action, guild_id).points
+        except KeyError:
+            return 0
+
+
+def plural(points, unit='pt'):
+    return f"{points} {unit}" if points == 1 else f"{points} {unit}s"
+
+
+def earn_lines(table, guild_id=None):
+    """Bullet list of every way to earn points, e.g. '• Sending messages (+1 pt)'"""
+    lines = []
+    for rule in table.actions(guild_id):
+        if rule.points <= 0:
+            continue
+        per = f" per {rule.interval_minutes} min" if rule.interval_minutes else ""
+        lines.append(f"• {rule.summary} (+{plural(rule.points)}{per})")
+    return "\n".join(lines)
+
+
+def command_lines(table, guild_id=None):
+    """One line per point-claiming command, e.g. '`!resume` - Upload resume (+20 pts)'"""
+    lines = []
+    for rule in table.actions(guild_id):
+        if not rule.command:
+            continue
+        value = f"+{plural(rule.points)} if approved" if rule.reviewed else f"+{plural(rule.points)}"
+        lines.append(f"`{rule.command}` - {rule.help} ({value})")
+    return "\n".join(lines)
@@ -1,5 +1,5 @@
 from discord.ext import commands
-import db
+from logconfig import logger
 
 class Shop(commands.Cog):
     def __init__(self, bot):
@@ -7,10 +7,7 @@ class Shop(commands.Cog):
 
     @commands.command()
     async def shop(self, ctx):
-        conn = db.connect()
-        c = conn.cursor()
-        c.execute('SELECT id, name, cost FROM rewards ORDER BY cost')
-        rewards = c.fetchall()
+        rewards = self.bot.cache.rewards
         if not rewards:
             await ctx.send("The shop is currently empty!")
             return
@@ -23,31 +20,21 @@ class Shop(commands.Cog):
     @commands.command()
     async def redeem(self, ctx, reward_id: int):
         user_id = str(ctx.author.id)
-        conn = db.connect()
-        c = conn.cursor()
 
         # Check reward existence
-        c.execute('SELECT name, cost FROM rewards WHERE id = ?', (reward_id,))
-        reward = c.fetchone()
+        reward = next(((name, cost) for r_id, name, cost in self.bot.cache.rewards if r_id == reward_id), None)
         if not reward:
             await ctx.send(f"Reward ID `{reward_id}` does not exist.")
             return
         reward_name, cost = reward
 
-        # Check user points
-        c.execute('SELECT points FROM users WHERE user_id = ?', (user_id,))
-        data = c.fetchone()
-        points = data[0] if data else 0
-
-        if points < cost:
+        # Deduct points and log redemption, only if the balance covers it
+        redeemed, points = await self.bot.storage.redeem(user_id, reward_id, cost)
+        if not redeemed:
             await ctx.send(f"Sorry {ctx.author.mention}, you don't have enough points to redeem **{reward_name}**. You have {points} points.")
             return
-
-        # Deduct points and log redemption
-        c.execute('UPDATE users SET points = points - ? WHERE user_id = ?', (cost, user_id))
-        c.execute('INSERT INTO redemptions(user_id, reward_id) VALUES (?, ?)', (user_id, reward_id))
-        conn.commit()
-        conn.close()
+        self.bot.cache.totals[user_id] = points
+        logger.info(f"{ctx.author} redeemed {reward_name} for {cost} points", extra={"user_id": user_id, "reward_id": reward_id})
 
         await ctx.send(f"{ctx.author.mention}, you have successfully redeemed **{reward_name}**! Our team will contact you shortly.")
 
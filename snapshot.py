@@ -0,0 +1,226 @@
+"""
+Warm-restart snapshots of in-memory bot state
+
+The bot's caches are periodically written to a compact binary file so a
+restart can map them back in instead of rebuilding from SQLite. Layout
+(little-endian):
+
+    header   magic(8) created_at(f64) ledger_seq(i64) users(i64)
+             points_sum(i64) section_count(u32) pad(u32)
+    sections name(8) offset(u64) count(u64)       one per section
+    data     int64 (or float64) arrays, 8-byte aligned
+
+Sections:
+    rank_ids / rank_pts   user totals ordered by points (the rank index)
+    dedup                 recently processed message IDs, oldest first
+    rl_ids / rl_tok /     rate-limiter buckets, least recently used first:
+    rl_at                 user ID, tokens (f64), last refill (f64 epoch)
+    q_users / q_msgs /    quality-gate fingerprints, least recently active
+    q_prints              user first: user ID, message ID (0 if none), SimHash
+
+The ledger stays the source of truth: a snapshot's totals are only used if
+its user count, points sum and ledger sequence (bumped by every balance
+write, adjustments and redemptions included) still match the storage
+backend's, otherwise totals are reloaded from the ledger. The dedup window,
+rate limits and quality gate don't depend on the ledger and are always
+restored.
+"""
+
+import mmap
+import os
+import struct
+import time
+from array import array
+from collections import OrderedDict, deque
+
+import db
+import quality
+
+SNAPSHOT_PATH = os.getenv('P2E_SNAPSHOT_PATH', 'p2e.snapshot')
+SNAPSHOT_INTERVAL_SECONDS = 60
+
+MAGIC = b'P2ESNAP\x02'
+# Sections holding float64 values; the rest are int64
+FLOAT_SECTIONS = {b'rl_tok', b'rl_at'}
+HEADER = struct.Struct('<8sdqqqII')
+SECTION = struct.Struct('<8sQQ')
+
+
+def _ledger_seq(c):
+    c.execute('SELECT seq FROM ledger_seq')
+    return c.fetchone()[0]
+
+
+def _signed(value):
+    """A 64-bit unsigned value (a SimHash) as the int64 with the same bits"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def capture(cache):
+    """Copy the state to persist; call on the event loop so it is consistent.
+
+    Only copies (dict and list copies are fast C-level passes); ``write``
+    does the sorting, array building and ledger read in a worker thread
+    while the loop keeps mutating the live caches.
+    """
+    return {
+        'totals': dict(cache.totals),
+        'dedup': array('q', cache.dedup),
+        'buckets': list(cache.rate_limiter.buckets.items()),
+        'clock': (time.time(), time.monotonic()),
+        'recent': [(user_id, list(entries)) for user_id, entries in cache.quality.recent.items()],
+    }
+
+
+def _build(state):
+    """Rank the captured totals and fingerprint them against the ledger"""
+    totals = state['totals']
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    rank_ids, rank_pts = array('q'), array('q')
+    for user_id, points in ranked:
+        if not str(user_id).isdigit():
+            continue  # Snapshot only covers snowflake IDs; fingerprint will force a reload
+        rank_ids.append(int(user_id))
+        rank_pts.append(points)
+
+    # Refill times are monotonic-clock readings; store them as wall-clock times
+    wall, mono = state['clock']
+    rl_ids, rl_tok, rl_at = array('q'), array('d'), array('d')
+    for key, (tokens, last) in state['buckets']:
+        if not isinstance(key, int):
+            continue
+        rl_ids.append(key)
+        rl_tok.append(tokens)
+        rl_at.append(wall - (mono - last))
+
+    q_users, q_msgs, q_prints = array('q'), array('q'), array('q')
+    for user_id, entries in state['recent']:
+        if not str(user_id).isdigit():
+            continue
+        for message_id, fingerprint in entries:
+            q_users.append(int(user_id))
+            q_msgs.append(message_id or 0)
+            q_prints.append(_signed(fingerprint))
+
+    ledger_seq = state.get('ledger_seq')
+    if ledger_seq is None:
+        conn = db.connect_readonly()
+        ledger_seq = _ledger_seq(conn.cursor())
+        conn.close()
+
+    return {
+        'ledger_seq': ledger_seq,
+        'users': len(totals),
+        'points_sum': sum(totals.values()),
+        'sections': {
+            b'rank_ids': rank_ids,
+            b'rank_pts': rank_pts,
+            b'dedup': state['dedup'],
+            b'rl_ids': rl_ids,
+            b'rl_tok': rl_tok,
+            b'rl_at': rl_at,
+            b'q_users': q_users,
+            b'q_msgs': q_msgs,
+            b'q_prints': q_prints,
+        },
+    }
+
+
+def _restore_limits(cache, sections):
+    ids, tokens, at = (sections.get(name, ()) for name in (b'rl_ids', b'rl_tok', b'rl_at'))
+    wall, mono = time.time(), time.monotonic()
+    buckets = OrderedDict((key, (tok, mono - (wall - last))) for key, tok, last in zip(ids, tokens, at))
+    # Buckets already touched in this process are newer than the snapshot's
+    buckets.update(cache.rate_limiter.buckets)
+    cache.rate_limiter.buckets = buckets
+
+
+def _restore_quality(cache, sections):
+    users, messages, prints = (sections.get(name, ()) for name in (b'q_users', b'q_msgs', b'q_prints'))
+    recent = OrderedDict()
+    for user_id, message_id, fingerprint in zip(users, messages, prints):
+        entries = recent.get(str(user_id))
+        if entries is None:
+            entries = recent[str(user_id)] = deque(maxlen=quality.RECENT_MESSAGES)
+        entries.append((message_id or None, fingerprint & (1 << 64) - 1))
+    recent.update(cache.quality.recent)
+    cache.quality.recent = recent
+
+
+def write(state, path=SNAPSHOT_PATH):
+    """Atomically write a captured state: temp file, fsync, rename"""
+    state = _build(state)
+    sections = state['sections']
+    offset = HEADER.size + SECTION.size * len(sections)
+    table = []
+    for name, data in sections.items():
+        table.append(SECTION.pack(name, offset, len(data)))
+        offset += len(data) * data.itemsize
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, time.time(), state['ledger_seq'], state['users'],
+                            state['points_sum'], len(sections), 0))
+        f.writelines(table)
+        for data in sections.values():
+            data.tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def save(cache, path=SNAPSHOT_PATH):
+    """Capture and write in one step (for shutdown, off the hot path)"""
+    write(capture(cache), path)
+
+
+def restore(cache, path=SNAPSHOT_PATH, fingerprint=None):
+    """Load a snapshot into ``cache`` via mmap.
+
+    The dedup window, rate limits and quality gate are always restored.
+    Totals are restored only if the snapshot still matches the ledger,
+    given as storage's ``fingerprint()`` (read from SQLite if omitted);
+    returns True in that case, False if the caller must load totals from
+    the ledger.
+    """
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, created_at, ledger_seq, users, points_sum, count, _ = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC:
+                return False
+
+            view = memoryview(mm)
+            sections = {}
+            try:
+                for i in range(count):
+                    name, offset, length = SECTION.unpack_from(mm, HEADER.size + i * SECTION.size)
+                    name = name.rstrip(b'\0')
+                    sections[name] = view[offset:offset + length * 8].cast('d' if name in FLOAT_SECTIONS else 'q')
+
+                cache.dedup.extend(sections.get(b'dedup', ()))
+                _restore_limits(cache, sections)
+                _restore_quality(cache, sections)
+
+                if fingerprint is None:
+                    conn = db.connect()
+                    c = conn.cursor()
+                    c.execute('SELECT COUNT(*), TOTAL(points) FROM users')
+                    db_users, db_points = c.fetchone()
+                    fingerprint = (db_users, int(db_points), _ledger_seq(c))
+                    conn.close()
+
+                if tuple(fingerprint) != (users, points_sum, ledger_seq):
+                    return False
+
+                rank_ids, rank_pts = sections[b'rank_ids'], sections[b'rank_pts']
+                if len(rank_ids) != users:
+                    return False
+                cache.totals = dict(zip(map(str, rank_ids), rank_pts))
+                return True
+            finally:
+                # Release exported buffers before the mmap closes
+                for section in sections.values():
+                    section.release()
+                view.release()
+    except (OSError, ValueError, struct.error, KeyError):
+        return False
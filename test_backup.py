@@ -0,0 +1,72 @@
+"""
+Backup tests: create, verify, rotate and restore on a throwaway database
+
+    python -m unittest test_backup
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import backup
+
+
+class BackupTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_path = os.path.join(tmp.name, 'p2e.db')
+        self.directory = os.path.join(tmp.name, 'backups')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE users (user_id INTEGER PRIMARY KEY, points INTEGER)')
+        conn.executemany('INSERT INTO users VALUES (?, ?)', [(i, i * 10) for i in range(1000)])
+        conn.commit()
+        conn.close()
+
+    def points(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute('SELECT COUNT(*), SUM(points) FROM users').fetchone()
+        finally:
+            conn.close()
+
+    def test_create_verify_restore(self):
+        before = self.points()
+        result = backup.create(self.directory, source_path=self.db_path)
+        self.assertEqual(backup.list_backups(self.directory), [result.path])
+        self.assertEqual(backup.verify(result.path), result.sha256)
+        self.assertLess(result.size, result.db_size)
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('UPDATE users SET points = 0')
+        conn.commit()
+        conn.close()
+        backup.restore(result.path, self.db_path)
+        self.assertEqual(self.points(), before)
+
+    def test_corrupt_backup_is_refused(self):
+        result = backup.create(self.directory, source_path=self.db_path)
+        with open(result.path, 'r+b') as f:
+            f.seek(result.size // 2)
+            f.write(b'\0' * 16)
+        with self.assertRaises(backup.BackupError):
+            backup.verify(result.path)
+        with self.assertRaises(backup.BackupError):
+            backup.restore(result.path, self.db_path)
+        self.assertEqual(self.points(), (1000, 4995000))
+
+    def test_rotate_keeps_newest(self):
+        os.makedirs(self.directory)
+        for stamp in ('20240101-000000', '20240102-000000', '20240103-000000'):
+            path = os.path.join(self.directory, f'p2e-{stamp}.db.gz')
+            for name in (path, f'{path}.sha256'):
+                open(name, 'w').close()
+        removed = backup.rotate(self.directory, keep=2)
+        self.assertEqual([os.path.basename(path) for path in removed], ['p2e-20240101-000000.db.gz'])
+        self.assertEqual(len(os.listdir(self.directory)), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
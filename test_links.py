@@ -0,0 +1,69 @@
+"""
+Resource link detection tests: URL normalization and allow/deny matching
+
+    python -m unittest test_links
+"""
+
+import unittest
+
+from links import MAX_LINKS_PER_MESSAGE, LinkMatcher, normalize_url, strip_trailing
+
+
+class NormalizeUrlTest(unittest.TestCase):
+    def test_equivalent_links_normalize_alike(self):
+        expected = 'https://github.com/org/repo?page=2&tab=readme'
+        for url in (
+            'https://github.com/org/repo?tab=readme&page=2',
+            'http://www.GitHub.com/org/repo/?page=2&tab=readme#install',
+            'www.github.com:443/org/repo?utm_source=x&page=2&fbclid=y&tab=readme',
+            'github.com/org/repo?page=2&tab=readme&ref=discord',
+        ):
+            self.assertEqual(normalize_url(url), expected, url)
+
+    def test_keeps_what_identifies_the_resource(self):
+        self.assertEqual(normalize_url('https://example.com:8080/a'), 'https://example.com:8080/a')
+        self.assertEqual(normalize_url('https://example.com/a?id=1'), 'https://example.com/a?id=1')
+        self.assertNotEqual(normalize_url('https://example.com/A'), normalize_url('https://example.com/a'))
+
+
+class StripTrailingTest(unittest.TestCase):
+    def test_drops_sentence_punctuation(self):
+        self.assertEqual(strip_trailing('https://example.com/a.'), 'https://example.com/a')
+        self.assertEqual(strip_trailing('https://example.com/a!?)'), 'https://example.com/a')
+        self.assertEqual(strip_trailing('https://example.com/a**'), 'https://example.com/a')
+
+    def test_keeps_paired_brackets(self):
+        url = 'https://en.wikipedia.org/wiki/Foo_(bar)'
+        self.assertEqual(strip_trailing(url), url)
+        self.assertEqual(strip_trailing(url + ').'), url)
+
+
+class LinkMatcherTest(unittest.TestCase):
+    def test_most_specific_entry_wins(self):
+        matcher = LinkMatcher(allow=['github.com', 'learn.microsoft.com'], deny=['gist.github.com'])
+        self.assertTrue(matcher.allowed('github.com'))
+        self.assertTrue(matcher.allowed('docs.GitHub.com.'))
+        self.assertFalse(matcher.allowed('gist.github.com'))
+        self.assertFalse(matcher.allowed('notgithub.com'))
+        self.assertFalse(matcher.allowed('example.com'))
+
+    def test_empty_allow_list_allows_anything_not_denied(self):
+        matcher = LinkMatcher(deny=['bit.ly'])
+        self.assertTrue(matcher.allowed('example.com'))
+        self.assertFalse(matcher.allowed('bit.ly'))
+        self.assertTrue(LinkMatcher().allowed('example.com'))
+
+    def test_find(self):
+        matcher = LinkMatcher(deny=['bit.ly'])
+        content = ('Read https://www.example.com/guide?utm_source=x, then (see https://example.com/guide/) '
+                   'and skip https://bit.ly/abc or localhost://nope')
+        self.assertEqual(matcher.find(content),
+                         [('https://www.example.com/guide?utm_source=x', 'https://example.com/guide')])
+        self.assertEqual(matcher.find('no links here'), [])
+
+        many = ' '.join(f'https://example.com/{i}' for i in range(MAX_LINKS_PER_MESSAGE + 3))
+        self.assertEqual(len(matcher.find(many)), MAX_LINKS_PER_MESSAGE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Activity pipeline tests: stage flow, rate limiting and failed ledger batches
+
+    python -m unittest test_pipeline
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+import db
+import points
+import rules
+import storage
+from cache import BotCache, DedupWindow
+from pipeline import Pipeline, RateLimiter, Stage
+
+
+class FlakyStorage(storage.SQLiteStorage):
+    """SQLite storage whose next ``failures`` award writes fail"""
+
+    def __init__(self, failures):
+        self.failures = failures
+
+    async def award_many(self, awards, reactions=()):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return await super().award_many(awards, reactions)
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_burst_then_refill(self):
+        limiter = RateLimiter(burst=2, per_second=0)
+        self.assertEqual([limiter.allow('a') for _ in range(3)], [True, True, False])
+        self.assertTrue(limiter.allow('b'))
+        limiter.per_second = 1e6
+        self.assertTrue(limiter.allow('a'))
+
+    def test_keeps_only_recent_keys(self):
+        limiter = RateLimiter(burst=1, per_second=0, max_keys=2)
+        for key in 'abc':
+            limiter.allow(key)
+        self.assertEqual(list(limiter.buckets), ['b', 'c'])
+        # An evicted key starts over with a full bucket
+        self.assertTrue(limiter.allow('a'))
+
+
+class DedupWindowTest(unittest.TestCase):
+    def test_window_and_discard(self):
+        window = DedupWindow(size=2)
+        self.assertTrue(window.add(1))
+        self.assertFalse(window.add(1))
+        window.add(2)
+        window.add(3)
+        self.assertEqual(list(window), [2, 3])
+        window.discard(2)
+        window.discard(9)
+        self.assertEqual(list(window), [3])
+        self.assertTrue(window.add(2))
+
+
+class PipelineTest(unittest.IsolatedAsyncioTestCase):
+    async def test_stages_hand_off_and_count_errors(self):
+        seen = []
+
+        async def double(items):
+            if 0 in items:
+                raise ValueError("bad item")
+            return [item * 2 for item in items]
+
+        async def collect(items):
+            seen.extend(items)
+            return []
+
+        pipeline = Pipeline([Stage('double', double), Stage('collect', collect, batch_size=10)])
+        await pipeline.start()
+        for item in (1, 0, 2):
+            self.assertTrue(pipeline.submit(item))
+        await pipeline.stop()
+        self.assertEqual(sorted(seen), [2, 4])
+        stats = {row['stage']: row for row in pipeline.stats()}
+        self.assertEqual((stats['double']['processed'], stats['double']['errors']), (3, 1))
+        self.assertEqual(stats['collect']['processed'], 2)
+
+
+class LedgerStageTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(setattr, db, 'DB_PATH', db.DB_PATH)
+        db.DB_PATH = os.path.join(tmp.name, 'test.db')
+        db.setup()
+        retry = mock.patch.object(points, 'LEDGER_RETRY_SECONDS', 0)
+        retry.start()
+        self.addCleanup(retry.stop)
+
+    def cog(self, failures):
+        bot = types.SimpleNamespace(storage=FlakyStorage(failures), rules=rules.RuleEngine(), cache=BotCache())
+        return points.Points(bot)
+
+    async def test_failed_batch_is_retried(self):
+        cog = self.cog(failures=2)
+        cog.bot.cache.dedup.add(1)
+        self.assertEqual(await cog.ledger_stage([('award', ('100', 5, 'Message sent', 'msg:1'))]), [])
+        await asyncio.gather(*cog.parked)
+        self.assertEqual(await cog.bot.storage.balance('100'), 5)
+        self.assertEqual(cog.bot.cache.totals['100'], 5)
+        self.assertIn(1, cog.bot.cache.dedup)
+
+    async def test_abandoned_batch_releases_its_messages_and_holds(self):
+        cog = self.cog(failures=points.LEDGER_MAX_ATTEMPTS)
+        cog.bot.cache.dedup.add(1)
+        cog.bot.rules.holds['msg:1'] = (('100', 'Message sent'), 5)
+        cog.bot.rules.held[('100', 'Message sent')] = 5
+        await cog.ledger_stage([('award', ('100', 5, 'Message sent', 'msg:1'))])
+        await asyncio.gather(*cog.parked)
+        self.assertEqual(await cog.bot.storage.balance('100'), 0)
+        self.assertNotIn(1, cog.bot.cache.dedup)
+        self.assertEqual((cog.bot.rules.holds, cog.bot.rules.held), ({}, {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+Message quality gate tests: short, low-entropy and near-duplicate messages
+
+    python -m unittest test_quality
+"""
+
+import unittest
+
+import quality
+from quality import QualityGate
+
+
+class QualityGateTest(unittest.TestCase):
+    def setUp(self):
+        self.gate = QualityGate()
+
+    def reasons(self):
+        rejections, _ = self.gate.take_rejections()
+        return [activity_type for _, activity_type, _, _ in rejections]
+
+    def test_rejects_low_effort_messages(self):
+        self.assertFalse(self.gate.check('1', 'ok!!'))
+        self.assertFalse(self.gate.check('1', 'aaaaaaaaaaaaaaaa'))
+        self.assertTrue(self.gate.check('1', 'Has anyone passed the AZ-104 exam recently?'))
+        self.assertEqual(self.reasons(), ['short_message', 'low_entropy_message'])
+        self.assertEqual(self.gate.take_rejections(), ([], 0))
+
+    def test_near_duplicates_per_user(self):
+        text = 'Here is my study plan for the AWS solutions architect exam'
+        self.assertTrue(self.gate.check('1', text, 10))
+        self.assertFalse(self.gate.check('1', text.upper() + '!!!', 11))
+        self.assertTrue(self.gate.check('2', text, 12))
+        self.assertTrue(self.gate.check('1', 'Completely different: anyone up for a Kubernetes study group?', 13))
+        # Re-checking an accepted message (a retry) still passes
+        self.assertTrue(self.gate.check('1', text, 10))
+        self.assertEqual(self.reasons(), ['duplicate_message'])
+
+    def test_simhash_distance(self):
+        a = quality.simhash(quality.normalize('The quick brown fox jumps over the lazy dog'))
+        b = quality.simhash(quality.normalize('The quick brown fox jumped over the lazy dog'))
+        c = quality.simhash(quality.normalize('Completely unrelated text about cloud certifications'))
+        self.assertLess(quality.distance(a, b), quality.distance(a, c))
+        self.assertEqual(quality.distance(a, a), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
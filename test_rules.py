@@ -0,0 +1,79 @@
+"""
+Points rule engine tests: rule resolution and daily cap holds
+
+    python -m unittest test_rules
+"""
+
+import unittest
+
+import rules
+
+CONFIG = {
+    'actions': {
+        'message': {'points': 2, 'label': 'Message sent', 'daily_cap': 10},
+        'resume': {'points': 20, 'label': 'Resume upload'},
+    },
+    'max_multiplier': 3.0,
+    'guilds': {
+        '1': {
+            'multiplier': 2.0,
+            'channels': {'5': {'multiplier': 2.0, 'actions': {'message': {'daily_cap': 50}}}},
+            'roles': {'9': 1.5},
+        },
+    },
+}
+
+
+class RuleTableTest(unittest.TestCase):
+    def setUp(self):
+        self.table = rules.RuleTable(CONFIG)
+
+    def test_most_specific_rule_and_clamped_multiplier(self):
+        self.assertEqual(self.table.points('message')[1], 2)
+        self.assertEqual(self.table.points('message', 1)[1], 4)
+        # Guild x channel x role would be 6x; it is clamped to max_multiplier
+        rule, pts = self.table.points('message', 1, 5, role_ids=(9,))
+        self.assertEqual((rule.daily_cap, pts), (50, 6))
+        with self.assertRaises(KeyError):
+            self.table.rule('unknown')
+        self.assertEqual(self.table.capped_labels, {'Message sent': 'message'})
+
+    def test_unknown_fields_are_rejected(self):
+        with self.assertRaises(rules.RuleError):
+            rules.RuleTable({'actions': {'message': {'points': 1, 'pionts': 2}}})
+
+
+class DailyCapTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = rules.RuleEngine()
+        self.engine.table = rules.RuleTable(CONFIG)
+
+    def award(self, source_key, user_id='100'):
+        return self.engine.award('message', user_id, source_key=source_key)[0]
+
+    def test_holds_count_against_the_cap_until_settled(self):
+        self.assertEqual([self.award(f'msg:{i}') for i in range(6)], [2, 2, 2, 2, 2, 0])
+        # A key that is already held earns nothing
+        self.assertEqual(self.award('msg:0'), 0)
+        self.assertEqual(self.engine.held, {('100', 'message'): 10})
+
+        # msg:3 and msg:4 were replays the ledger ignored: their holds are released
+        self.engine.settle(['msg:0', 'msg:1', 'msg:2', 'msg:3', 'msg:4'], {'msg:0', 'msg:1', 'msg:2'})
+        self.assertEqual((self.engine.earned, self.engine.held, self.engine.holds),
+                         ({('100', 'message'): 6}, {}, {}))
+        self.assertEqual([self.award(f'msg:{i}') for i in range(6, 9)], [2, 2, 0])
+
+    def test_caps_are_per_user_and_uncapped_actions_hold_nothing(self):
+        self.assertEqual(self.award('msg:1', '100'), 2)
+        self.assertEqual(self.award('msg:2', '200'), 2)
+        self.assertEqual(self.engine.award('resume', '100', source_key='resume:1'), (20, 'Resume upload'))
+        self.assertEqual(set(self.engine.holds), {'msg:1', 'msg:2'})
+
+    def test_seed_charges_todays_ledger(self):
+        self.engine.seed([('100', 'Message sent', 8), (100, 'Message sent', 1), ('100', 'Resume upload', 20)])
+        self.assertEqual(self.engine.earned, {('100', 'message'): 9})
+        self.assertEqual(self.award('msg:1'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Warm-restart snapshot tests: round trip and staleness checks
+
+    python -m unittest test_snapshot
+"""
+
+import os
+import tempfile
+import time
+import unittest
+
+import snapshot
+from cache import BotCache
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'state.snap')
+
+        self.cache = BotCache()
+        self.cache.totals = {'100': 50, '200': 10}
+        for message_id in (1, 2, 3):
+            self.cache.dedup.add(message_id)
+        self.cache.rate_limiter.allow(100)
+        self.cache.rate_limiter.allow(200)
+        self.cache.rate_limiter.allow(200)
+        self.cache.quality.check('100', 'a first message about azure certification', 11)
+        self.cache.quality.check('100', 'something else entirely, kubernetes networking', None)
+
+    def save(self, ledger_seq):
+        state = snapshot.capture(self.cache)
+        state['ledger_seq'] = ledger_seq
+        snapshot.write(state, self.path)
+
+    def test_round_trip(self):
+        self.save(7)
+        restored = BotCache()
+        self.assertTrue(snapshot.restore(restored, self.path, fingerprint=(2, 60, 7)))
+        self.assertEqual(restored.totals, self.cache.totals)
+        self.assertEqual(list(restored.dedup), [1, 2, 3])
+
+        buckets = restored.rate_limiter.buckets
+        self.assertEqual(list(buckets), [100, 200])
+        for key, (tokens, last) in self.cache.rate_limiter.buckets.items():
+            self.assertAlmostEqual(buckets[key][0], tokens)
+            self.assertAlmostEqual(buckets[key][1], last, delta=1)
+        self.assertLessEqual(buckets[200][1], time.monotonic())
+
+        self.assertEqual(restored.quality.recent, self.cache.quality.recent)
+        # The restored gate still recognizes the original messages
+        self.assertFalse(restored.quality.check('100', 'a first message about azure certification', 12))
+        self.assertTrue(restored.quality.check('100', 'a first message about azure certification', 11))
+
+    def test_stale_ledger_keeps_totals_out(self):
+        self.save(7)
+        restored = BotCache()
+        # Same users and points sum, but an adjustment or redemption moved the sequence
+        self.assertFalse(snapshot.restore(restored, self.path, fingerprint=(2, 60, 9)))
+        self.assertEqual(restored.totals, {})
+        # Nothing here depends on the ledger, so it is restored regardless
+        self.assertEqual(list(restored.dedup), [1, 2, 3])
+        self.assertEqual(list(restored.rate_limiter.buckets), [100, 200])
+        self.assertEqual(list(restored.quality.recent), ['100'])
+
+    def test_unreadable_snapshot(self):
+        self.assertFalse(snapshot.restore(BotCache(), self.path, fingerprint=(0, 0, 0)))
+        with open(self.path, 'wb') as f:
+            f.write(b'not a snapshot')
+        self.assertFalse(snapshot.restore(BotCache(), self.path, fingerprint=(0, 0, 0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
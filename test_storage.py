@@ -0,0 +1,189 @@
+"""
+Storage backend contract tests
+
+Runs the same ledger sequence (awards, replays, redemptions, balances,
+ranks and leaderboards) against every backend, so SQLite and Postgres
+can't drift apart. SQLite runs on a throwaway file; Postgres runs only
+when P2E_TEST_DATABASE_URL points at a database it may write to (the tests
+use their own schema there) and asyncpg is installed:
+
+    python -m unittest test_storage
+    P2E_TEST_DATABASE_URL=postgres://postgres@localhost/postgres python -m unittest test_storage
+"""
+
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import anomaly
+import collusion
+import db
+import storage
+
+TEST_DATABASE_URL = os.getenv('P2E_TEST_DATABASE_URL')
+TEST_SCHEMA = 'p2e_storage_test'
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+
+def _resume(content_hash):
+    return {'content_hash': content_hash, 'file_hash': content_hash, 'pages': 1, 'text_chars': 1200}
+
+
+class StorageContract:
+    """The ledger sequence every backend must agree on"""
+
+    async def open_storage(self):
+        raise NotImplementedError
+
+    async def asyncSetUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        # Review and resume bookkeeping stay in SQLite for every backend
+        self.addCleanup(setattr, db, 'DB_PATH', db.DB_PATH)
+        db.DB_PATH = os.path.join(tmp.name, 'test.db')
+        db.setup()
+        self.storage = await self.open_storage()
+
+    async def asyncTearDown(self):
+        await self.storage.close()
+
+    async def test_award_redeem_leaderboard(self):
+        s = self.storage
+        credited = await s.award_many([
+            ('100', 30, 'Message sent', 'msg:1'),
+            ('200', 60, 'Message sent', 'msg:2'),
+            ('100', 30, 'Message sent', 'msg:3'),
+        ])
+        awards = {award.user_id: award for award in credited}
+        self.assertEqual(awards['100'].points, 60)
+        self.assertEqual(awards['100'].total_points, 60)
+        self.assertEqual(sorted(awards['100'].source_keys), ['msg:1', 'msg:3'])
+        self.assertEqual(awards['200'].milestones, [(50, 'Azure Certification')])
+
+        # Replayed source keys credit nothing
+        self.assertEqual(await s.award_many([('100', 30, 'Message sent', 'msg:1')]), [])
+        await s.award_many([('300', 10, 'Reaction added', 'react:2:300:👍')])
+
+        self.assertEqual(await s.balance('100'), 60)
+        self.assertEqual(await s.balance('999'), 0)
+        self.assertEqual(await s.rank('100'), (1, 60))
+        self.assertEqual(await s.rank('200'), (1, 60))
+        self.assertEqual(await s.rank('300'), (3, 10))
+        self.assertIsNone(await s.rank('999'))
+
+        self.assertEqual(await s.redeem('100', 1, 500), (False, 60))
+        self.assertEqual(await s.redeem('100', 1, 50), (True, 10))
+        self.assertEqual(await s.redeem('999', 1, 50), (False, 0))
+        self.assertEqual(await s.balance('100'), 10)
+        self.assertEqual(await s.rank('100'), (2, 10))
+
+        rows, total = await s.top_all(10)
+        self.assertEqual(total, 3)
+        self.assertEqual(rows[0], ('200', 60))
+        self.assertEqual(sorted(rows[1:]), [('100', 10), ('300', 10)])
+        # Period and season standings count points earned, not spent
+        rows, total = await s.top_since(datetime.utcnow().date().isoformat(), 10)
+        self.assertEqual((sorted(rows), total), ([('100', 60), ('200', 60), ('300', 10)], 3))
+        _, rows, total = await s.top_season(10)
+        self.assertEqual((sorted(rows), total), ([('100', 60), ('200', 60), ('300', 10)], 3))
+
+        self.assertEqual([row[:2] for row in await s.history('100', 10)],
+                         [('Message sent', 30), ('Message sent', 30)])
+        self.assertEqual(await s.milestones('100'), ['Azure Certification'])
+        self.assertEqual(await s.ledger_stats(), (3, 130, 4))
+        users, points, max_id = await s.fingerprint()
+        self.assertEqual((users, points), (3, 80))
+        self.assertGreater(max_id, 0)
+        self.assertEqual(sorted(await s.earned_today()),
+                         [('100', 'Message sent', 60), ('200', 'Message sent', 60), ('300', 'Reaction added', 10)])
+
+    async def test_resume_credit(self):
+        s = self.storage
+        owner, award = await s.credit_resume('100', 20, 'Resume upload', 'cv.pdf', _resume('a'))
+        self.assertIsNone(owner)
+        self.assertEqual((award.points, award.total_points), (20, 20))
+        # Edited copies are recorded but only the first resume earns points
+        self.assertEqual(await s.credit_resume('100', 20, 'Resume upload', 'cv2.pdf', _resume('b')), (None, None))
+        self.assertEqual(await s.credit_resume('200', 20, 'Resume upload', 'cv.pdf', _resume('a')), ('100', None))
+        self.assertEqual(await s.balance('100'), 20)
+        self.assertEqual(await s.balance('200'), 0)
+
+
+    async def test_fingerprint_tracks_every_balance_write(self):
+        s = self.storage
+        await s.award_many([('100', 30, 'Message sent', 'msg:1'), ('200', 30, 'Message sent', 'msg:2')])
+        seen = [await s.fingerprint()]
+        # Moves that leave the user count and points sum unchanged still change the fingerprint
+        await s.adjust_points('100', -10)
+        await s.adjust_points('200', 10)
+        seen.append(await s.fingerprint())
+        await s.redeem('100', 1, 20)
+        await s.award_many([('200', 20, 'Message sent', 'msg:3')])
+        seen.append(await s.fingerprint())
+        await s.reset_points('200')
+        seen.append(await s.fingerprint())
+        self.assertEqual([fingerprint[:2] for fingerprint in seen[:3]], [(2, 60)] * 3)
+        self.assertEqual(len({fingerprint[2] for fingerprint in seen}), len(seen))
+        self.assertEqual(sorted(fingerprint[2] for fingerprint in seen), [fingerprint[2] for fingerprint in seen])
+
+    async def test_scans_and_activity(self):
+        s = self.storage
+        await s.award_many([('100', 10, 'Message sent', 'msg:1'), ('200', 5, 'Message sent', 'msg:2'),
+                            ('tester', 5, 'Message sent', 'msg:3')],
+                           reactions=[('100', '200', '1'), ('200', '100', '2'), ('100', '100', '3')])
+        since = datetime.utcnow() - timedelta(hours=1)
+        awards = await s.scan_awards(since)
+        # Non-numeric IDs are left out, as in SQLite's CAST
+        self.assertEqual(sorted(awards[:, 0].tolist()), [100, 200])
+        self.assertLessEqual(abs(int(awards[0, 1]) - anomaly._epoch(datetime.utcnow())), 60)
+        self.assertEqual(sorted(map(tuple, (await s.scan_reactions(since)).tolist())), [(100, 200), (200, 100)])
+        self.assertEqual(sorted(map(tuple, (await s.scan_reactions(since, grouped=True)).tolist())),
+                         [(100, 200, 1), (200, 100, 1)])
+        self.assertEqual(len(await s.scan_awards(datetime.utcnow() + timedelta(hours=1))), 0)
+        self.assertEqual(await anomaly.run(s), [])
+        self.assertEqual(await collusion.run(s), [])
+
+        now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        await s.log_suspicious([('100', 'rate_spike', 'test', now),
+                                ('200', 'rate_spike', 'old', '2000-01-01 00:00:00')])
+        self.assertEqual(await s.recently_flagged(7), {('100', 'rate_spike')})
+        self.assertEqual(await s.suspicious_counts(), (2, 1))
+
+        today = datetime.utcnow().date().isoformat()
+        await s.save_activity([('100', '2000-01-01 12:00:00', '2000-01-01', 3), ('200', now, today, 1)])
+        self.assertEqual(sorted(await s.load_streaks()), [('100', '2000-01-01', 3), ('200', today, 1)])
+        self.assertEqual(await s.inactive_users(14, 10), ([('100', '2000-01-01 12:00:00')], 1))
+
+        self.assertEqual(await s.rollover_season('Season 2'), ('Season 1', 3))
+        self.assertEqual(await s.top_season(10), ('Season 2', [], 0))
+        # All-time balances are untouched
+        self.assertEqual(await s.balance('100'), 10)
+
+
+class SQLiteStorageTest(StorageContract, unittest.IsolatedAsyncioTestCase):
+    async def open_storage(self):
+        s = storage.SQLiteStorage()
+        await s.open()
+        return s
+
+
+@unittest.skipUnless(TEST_DATABASE_URL and asyncpg, "set P2E_TEST_DATABASE_URL (and install asyncpg)")
+class PostgresStorageTest(StorageContract, unittest.IsolatedAsyncioTestCase):
+    async def open_storage(self):
+        conn = await asyncpg.connect(TEST_DATABASE_URL)
+        await conn.execute(f'DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE; CREATE SCHEMA {TEST_SCHEMA}')
+        await conn.close()
+        # asyncpg passes unknown DSN parameters on as server settings
+        separator = '&' if '?' in TEST_DATABASE_URL else '?'
+        s = storage.PostgresStorage(f'{TEST_DATABASE_URL}{separator}search_path={TEST_SCHEMA}')
+        await s.open()
+        return s
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Voice points tests: interval settling, carried-over time and daily cap holds
+
+    python -m unittest test_voice
+"""
+
+import time
+import types
+import unittest
+
+import rules
+import voice
+from cache import BotCache
+
+INTERVAL = 600
+
+
+class FakePoints:
+    """Stands in for the Points cog: credits every award and settles its cap hold"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.awards = []
+
+    async def award_batch(self, awards):
+        self.awards.extend(awards)
+        keys = [source_key for *_, source_key in awards]
+        self.bot.rules.settle(keys, set(keys))
+
+
+class VoiceTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        engine = rules.RuleEngine()
+        engine.table = rules.RuleTable({'actions': {'voice': {
+            'points': 1, 'label': 'Voice participation', 'interval_minutes': INTERVAL // 60, 'daily_cap': 12,
+        }}})
+        self.points = None
+        self.bot = types.SimpleNamespace(rules=engine, cache=BotCache(), get_cog=lambda name: self.points)
+        self.cog = voice.Voice(self.bot)
+
+    def join(self, user_id, seconds_ago):
+        self.cog.sessions[user_id] = voice.VoiceSession(time.monotonic() - seconds_ago, 1, 2, ())
+
+    def credited(self):
+        return [(user_id, pts) for user_id, pts, _, _ in self.points.awards]
+
+    async def test_no_points_cog_keeps_time_owed(self):
+        self.join('100', 2.5 * INTERVAL)
+        await self.cog.flush()
+        self.assertEqual((self.bot.rules.holds, self.bot.rules.held), ({}, {}))
+        self.assertAlmostEqual(self.cog.accrued['100'][0], 2.5 * INTERVAL, delta=5)
+
+        self.points = FakePoints(self.bot)
+        await self.cog.flush()
+        self.assertEqual(self.credited(), [('100', 2)])
+        self.assertEqual(self.bot.rules.earned, {('100', 'voice'): 2})
+        self.assertEqual(self.bot.rules.holds, {})
+
+    async def test_partial_interval_carries_to_next_session(self):
+        self.points = FakePoints(self.bot)
+        self.join('100', 1.5 * INTERVAL)
+        self.cog.close('100')
+        await self.cog.flush()
+        self.assertEqual(self.credited(), [('100', 1)])
+        self.assertAlmostEqual(self.cog.accrued['100'][0], 0.5 * INTERVAL, delta=5)
+
+        # Back for another half interval: together they make a whole one
+        self.join('100', 0.5 * INTERVAL)
+        await self.cog.flush()
+        self.assertEqual(self.credited(), [('100', 1), ('100', 1)])
+
+    async def test_carried_time_expires(self):
+        self.points = FakePoints(self.bot)
+        left = voice.VOICE_CARRY_SECONDS + 1
+        self.join('100', left + 0.5 * INTERVAL)
+        self.cog.close('100', time.monotonic() - left)
+        await self.cog.flush()
+        self.assertEqual(self.cog.accrued, {})
+        self.assertEqual(self.points.awards, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+from discord.ext import commands
+from logconfig import logger
+import discord
+import asyncio
+import time
+from collections import namedtuple
+
+# How often accrued voice time is settled into the ledger
+VOICE_FLUSH_SECONDS = 300
+# How long the partial interval of a member who left voice is kept for their return
+VOICE_CARRY_SECONDS = 24 * 60 * 60
+
+# A member's current stretch in one voice channel
+VoiceSession = namedtuple('VoiceSession', ['started', 'guild_id', 'channel_id', 'role_ids'])
+
+class Voice(commands.Cog):
+    """Points for time spent in voice channels
+
+    Joins and leaves only open and close intervals in memory; nothing is
+    polled per second. Every VOICE_FLUSH_SECONDS the open intervals are cut
+    at "now", whole reward intervals (see the ``voice`` rule) are written in
+    one batch and the remainder carries over to the next flush, or to the
+    member's next session if they left (for up to VOICE_CARRY_SECONDS).
+    Daily caps come from the rules engine.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.sessions = {}  # user_id -> VoiceSession
+        self.accrued = {}  # user_id -> [seconds not yet settled, guild_id, channel_id, role_ids, closed at]
+        self.flush_count = 0
+
+    async def cog_load(self):
+        self.flush_task = asyncio.create_task(self.flush_loop())
+
+    async def cog_unload(self):
+        self.flush_task.cancel()
+        await self.flush()
+
+    def eligible(self, member, state):
+        """Whether a voice state earns points: a real, listening member outside AFK"""
+        if member.bot or state.channel is None:
+            return False
+        if state.deaf or state.self_deaf:
+            return False
+        return state.channel != member.guild.afk_channel
+
+    def open(self, member, channel):
+        self.bot.cache.activity.touch(str(member.id))
+        self.sessions[str(member.id)] = VoiceSession(
+            time.monotonic(), member.guild.id, channel.id, tuple(role.id for role in member.roles)
+        )
+
+    def close(self, user_id, now=None):
+        """End an open interval and add its length to the user's unsettled time"""
+        session = self.sessions.pop(user_id, None)
+        if session is None:
+            return
+        now = now or time.monotonic()
+        elapsed = now - session.started
+        entry = self.accrued.get(user_id)
+        if entry is None:
+            self.accrued[user_id] = [elapsed, session.guild_id, session.channel_id, session.role_ids, now]
+        else:
+            entry[0] += elapsed
+            entry[1:] = session.guild_id, session.channel_id, session.role_ids, now
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Re-sync with who is in voice now (after a restart or reconnect): updates
+        # missed while disconnected would otherwise leave sessions open forever
+        present = {}
+        for guild in self.bot.guilds:
+            for channel in guild.voice_channels + guild.stage_channels:
+                for member in channel.members:
+                    if member.voice and self.eligible(member, member.voice):
+                        present[str(member.id)] = (member, channel)
+
+        for user_id, session in list(self.sessions.items()):
+            member, channel = present.get(user_id, (None, None))
+            if channel is None or channel.id != session.channel_id:
+                self.close(user_id)
+        for user_id, (member, channel) in present.items():
+            if user_id not in self.sessions:
+                self.open(member, channel)
+
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member, before, after):
+        user_id = str(member.id)
+        was_eligible = user_id in self.sessions
+        is_eligible = self.eligible(member, after)
+
+        # Moving channels or toggling deafen settles the old interval first
+        if was_eligible and (not is_eligible or before.channel != after.channel):
+            self.close(user_id)
+        if is_eligible and user_id not in self.sessions:
+            self.open(member, after.channel)
+
+    def interval_seconds(self, guild_id, channel_id):
+        """Length of one voice reward interval, or 0 if voice earns nothing"""
+        try:
+            minutes = self.bot.rules.table.rule('voice', guild_id, channel_id).interval_minutes
+        except KeyError:
+            return 0
+        return 60 * (minutes or 0)
+
+    async def flush(self):
+        """Settle whole reward intervals for everyone in (or recently in) voice"""
+        now = time.monotonic()
+        for user_id in list(self.sessions):
+            session = self.sessions[user_id]
+            self.close(user_id, now)
+            self.sessions[user_id] = session._replace(started=now)
+
+        points = self.bot.get_cog('Points')
+        if points is None:
+            # Nothing can be credited, so take no cap holds; the time stays owed
+            return
+
+        self.flush_count += 1
+        batch = f"{int(time.time())}:{self.flush_count}"
+        awards = []
+        settled = {}  # user_id -> (seconds, entry) taken from accrued, put back if the write fails
+        for user_id, entry in list(self.accrued.items()):
+            seconds, guild_id, channel_id, role_ids, closed_at = entry
+            interval = self.interval_seconds(guild_id, channel_id)
+            if not interval:
+                del self.accrued[user_id]
+                continue
+            units, remainder = divmod(seconds, interval)
+            entry[0] = remainder
+            if user_id not in self.sessions and (not remainder or now - closed_at > VOICE_CARRY_SECONDS):
+                # Left voice: a partial interval waits for the next session, but not forever
+                del self.accrued[user_id]
+            if units < 1 or self.bot.cache.is_suspended(user_id):
+                continue
+
+            source_key = f"voice:{user_id}:{batch}"
+            pts, action = self.bot.rules.award('voice', user_id, guild_id, channel_id, role_ids, units=int(units),
+                                               source_key=source_key)
+            if pts > 0:
+                awards.append((user_id, pts, action, source_key))
+                settled[user_id] = (units * interval, entry)
+
+        if awards:
+            try:
+                await points.award_batch(awards)
+            except Exception as e:
+                # Nothing was credited (and award_batch released the daily cap),
+                # so the time is owed again at the next flush
+                for user_id, (seconds, entry) in settled.items():
+                    current = self.accrued.get(user_id)
+                    if current is None:
+                        self.accrued[user_id] = [seconds, *entry[1:]]
+                    else:
+                        current[0] += seconds
+                logger.error(f"Error settling voice points for {len(awards)} users: {e}")
+            else:
+                logger.info(f"Settled voice points for {len(awards)} users", extra={"sampled": True})
+
+    async def flush_loop(self):
+        while True:
+            await asyncio.sleep(VOICE_FLUSH_SECONDS)
+            await self.flush()
+
+async def setup(bot):
+    await bot.add_cog(Voice(bot))